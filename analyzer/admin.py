@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ConfirmedMatch
+
+
+@admin.register(ConfirmedMatch)
+class ConfirmedMatchAdmin(admin.ModelAdmin):
+    list_display = ("canon", "catalog", "flag", "unit", "row_ids", "valid", "confirmed_by", "updated_at")
+    list_filter = ("valid", "catalog", "flag")
+    search_fields = ("canon", "query")
+    readonly_fields = ("fingerprint", "vocab_version", "confirmed_by", "invalidated_at", "created_at", "updated_at")
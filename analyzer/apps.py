@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AnalyzerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analyzer'
+
+    def ready(self):
+        # find_matches təsdiqlənmiş matçları əvvəlcə ConfirmedMatch cədvəlindən yoxlasın
+        from azcon_match import confirmed as hook
+        from .confirmed import lookup
+        hook.register(lookup)
@@ -0,0 +1,198 @@
+# analyzer/confirmed.py
+# ConfirmedMatch ↔ azcon_match.confirmed: lookup provider + yazma/idxal/ixrac köməkçiləri.
+from __future__ import annotations
+
+import csv
+import json
+import operator
+import threading
+import time
+import weakref
+from functools import reduce
+from typing import Iterable, Iterator, Optional, Sequence
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from azcon_match import confirmed as hook
+from azcon_match.query import compile_query
+
+from .models import ConfirmedMatch
+
+EXPORT_FIELDS = ["catalog", "query", "canon", "flag", "unit", "row_ids", "fingerprint", "vocab_version", "valid", "confirmed_by"]
+
+# ---------------------------------------------------------
+# Lookup: kataloq üzrə bir dəfə oxunan snapshot (matç yolunda DB sorğusu yoxdur)
+# ---------------------------------------------------------
+class _Snapshot:
+    """Kataloqun etibarlı qeydləri, bir master obyektinə bağlı; fingerprint yoxlaması pk üzrə bir dəfə."""
+
+    def __init__(self, master_df, entries: dict):
+        self.master = _ref(master_df)
+        self.entries = entries          # (canon, flag, unit) → (pk, row_ids, fingerprint)
+        self.checked: dict[int, bool] = {}
+        self.built = time.monotonic()
+
+    def serves(self, master_df, max_age: float) -> bool:
+        return self.master() is master_df and time.monotonic() - self.built < max_age
+
+def _ref(obj):
+    try:
+        return weakref.ref(obj)
+    except TypeError:
+        return lambda: obj
+
+_lock = threading.Lock()
+_snapshots: dict[str, _Snapshot] = {}
+_epoch = 0  # _drop() artırır: köhnə məlumatla qurulan snapshot yerinə yazılmır
+_stale: set[tuple[int, str]] = set()  # (pk, fingerprint) uyğun gəlməyənlər – flush_invalid() yazır
+
+def _max_age() -> float:
+    # başqa worker-in təsdiqləri bu müddətdən gec görünmür
+    return float(getattr(settings, "AZCON_CONFIRMED_REFRESH", 30.0))
+
+def prefetch(master_df) -> _Snapshot:
+    """Kataloqun etibarlı qeydlərini bir sorğu ilə oxu (upload-un əvvəlində; köhnə snapshot əvəz olunur)."""
+    catalog = hook.catalog_of(master_df)
+    epoch = _epoch
+    rows = (
+        ConfirmedMatch.objects
+        .filter(catalog=catalog, valid=True)
+        .values_list("canon", "flag", "unit", "pk", "row_ids", "fingerprint")
+    )
+    snap = _Snapshot(master_df, {(c, f, u): (pk, ids, fp) for c, f, u, pk, ids, fp in rows})
+    with _lock:
+        if epoch == _epoch:
+            _snapshots[catalog] = snap
+    return snap
+
+def _drop(catalog: Optional[str] = None) -> None:
+    global _epoch
+    with _lock:
+        _epoch += 1
+        if catalog is None:
+            _snapshots.clear()
+        else:
+            _snapshots.pop(catalog, None)
+
+def lookup(cq, master_df) -> Optional[list[int]]:
+    """
+    Provider: (canon, flag, unit) kataloq snapshot-ında dict lookup-dur; snapshot
+    yoxdursa, başqa master-ə aiddirsə və ya köhnəlibsə yenidən oxunur.
+    İstinad olunan master sətirləri dəyişibsə (fingerprint uyğun deyil) None
+    qaytarılır və qeyd flush_invalid() üçün yadda saxlanılır – bu yolda yazı yoxdur.
+    """
+    catalog = hook.catalog_of(master_df)
+    snap = _snapshots.get(catalog)
+    if snap is None or not snap.serves(master_df, _max_age()):
+        snap = prefetch(master_df)
+    hit = snap.entries.get((cq.canon, cq.flag, cq.unit))
+    if hit is None:
+        return None
+    pk, row_ids, fp = hit
+    ok = snap.checked.get(pk)
+    if ok is None:
+        ok = bool(row_ids) and hook.fingerprint(master_df, row_ids) == fp
+        snap.checked[pk] = ok
+        if not ok:
+            with _lock:
+                _stale.add((pk, fp))
+    return row_ids if ok else None
+
+def flush_invalid() -> int:
+    """
+    lookup-un tapdığı köhnəlmiş qeydləri bir UPDATE ilə etibarsız et (upload / sorğu
+    bitəndən sonra çağırılır). Etibarsız edilən qeydlərin sayı.
+    """
+    with _lock:
+        stale = list(_stale)
+        _stale.clear()
+    if not stale:
+        return 0
+    # fingerprint də şərtdir: arada yenidən təsdiqlənmiş qeyd etibarsız edilmir
+    match = reduce(operator.or_, (Q(pk=pk, fingerprint=fp) for pk, fp in stale))
+    n = ConfirmedMatch.objects.filter(match, valid=True).update(valid=False, invalidated_at=timezone.now())
+    _drop()
+    return n
+
+def confirm(q_raw: str, q_flag: str, q_unit: str, row_ids: Sequence[int], master_df, catalog: str = "",
+            confirmed_by: str = "") -> ConfirmedMatch:
+    """Sorğunu bu master sətirlərinə bağla (varsa yenilə). Naməlum sətir id-si → ValueError."""
+    cq = compile_query(q_raw, q_flag, q_unit)
+    if not cq.canon:
+        raise ValueError("Boş sorğu təsdiqlənə bilməz")
+    row_ids = [int(r) for r in row_ids]
+    fp = hook.fingerprint(master_df, row_ids)
+    if fp is None or not row_ids:
+        raise ValueError(f"Master-də olmayan sətir id-ləri: {row_ids}")
+    obj, _ = ConfirmedMatch.objects.update_or_create(
+        catalog=catalog or hook.catalog_of(master_df), canon=cq.canon, flag=cq.flag, unit=cq.unit,
+        defaults={
+            "query": q_raw, "row_ids": row_ids, "fingerprint": fp,
+            "vocab_version": cq.vocab_version, "valid": True, "invalidated_at": None,
+            "confirmed_by": confirmed_by,
+        },
+    )
+    _drop(obj.catalog)
+    transaction.on_commit(lambda: _drop(obj.catalog))  # import_rows: tranzaksiya bitəndə də
+    return obj
+
+# ---------------------------------------------------------
+# Bulk import / export (CSV və ya JSON Lines)
+# ---------------------------------------------------------
+def export_rows(catalog: Optional[str] = None, include_invalid: bool = False) -> Iterator[dict]:
+    qs = ConfirmedMatch.objects.order_by("catalog", "canon", "flag", "unit")
+    if catalog is not None:
+        qs = qs.filter(catalog=catalog)
+    if not include_invalid:
+        qs = qs.filter(valid=True)
+    yield from qs.values(*EXPORT_FIELDS).iterator()
+
+def write_export(fh, rows: Iterable[dict], fmt: str) -> int:
+    n = 0
+    if fmt == "jsonl":
+        for r in rows:
+            fh.write(json.dumps(r, ensure_ascii=False) + "\n"); n += 1
+        return n
+    w = csv.DictWriter(fh, fieldnames=EXPORT_FIELDS)
+    w.writeheader()
+    for r in rows:
+        w.writerow({**r, "row_ids": ";".join(map(str, r["row_ids"]))}); n += 1
+    return n
+
+def read_import(fh, fmt: str) -> Iterator[dict]:
+    """Sətir: query, flag, unit, row_ids (CSV-də "1;2;3"), istəyə görə catalog."""
+    if fmt == "jsonl":
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+        return
+    for r in csv.DictReader(fh):
+        ids = r.get("row_ids") or ""
+        r["row_ids"] = [int(x) for x in str(ids).replace(",", ";").split(";") if x.strip()]
+        yield r
+
+def import_rows(rows: Iterable[dict], master_for, default_catalog: str = "") -> dict:
+    """
+    Hər sətir cari vocab ilə kanonikləşdirilir və cari master-ə qarşı fingerprint alır
+    (ixrac edilmiş canon/fingerprint-ə güvənmirik). master_for(catalog) → DataFrame.
+    """
+    out = {"imported": 0, "skipped": 0, "errors": []}
+    masters: dict[str, object] = {}
+    with transaction.atomic():
+        for i, r in enumerate(rows, 1):
+            catalog = (r.get("catalog") or default_catalog or "").strip()
+            try:
+                if catalog not in masters:
+                    masters[catalog] = master_for(catalog)
+                with transaction.atomic():  # savepoint: bir pis sətir bütün idxalı pozmasın
+                    confirm(r.get("query") or "", r.get("flag") or "", r.get("unit") or "",
+                            r.get("row_ids") or [], masters[catalog], catalog=catalog,
+                            confirmed_by=r.get("confirmed_by") or "import")
+                out["imported"] += 1
+            except Exception as e:
+                out["skipped"] += 1
+                out["errors"].append(f"sətir {i}: {e}")
+    return out
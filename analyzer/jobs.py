@@ -0,0 +1,120 @@
+# analyzer/jobs.py
+# Async view-lar üçün məhdud executor-lar (backpressure ilə).
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+
+from azcon_match import metrics
+
+
+class Busy(Exception):
+    """Lane dolub – sorğunu növbəyə salmırıq, 503 qaytarırıq."""
+
+
+class Lane:
+    """
+    Bir ThreadPoolExecutor + eyni anda qəbul edilən iş sayına limit.
+    `workers` paralel işləyir, `queue` qədəri gözləyə bilər; artığı Busy alır.
+    """
+
+    def __init__(self, name: str, workers: int, queue: int):
+        self.name = name
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"azcon-{name}")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def reserve(self) -> None:
+        if not self._slots.acquire(blocking=False):
+            raise Busy(self.name)
+
+    def release(self) -> None:
+        self._slots.release()
+
+    def submit(self, fn, *args, reserved: bool = False, **kwargs) -> Future:
+        """
+        fn-i pool-a göndər (event loop-dan asılı deyil – WSGI-də də işləyir).
+        reserved=False olduqda slotu özü alır; slot iş bitəndə buraxılır.
+        """
+        if not reserved:
+            self.reserve()
+        try:
+            fut = self._pool.submit(partial(self._call, fn, *args, **kwargs))
+        except BaseException:
+            self.release()
+            raise
+        fut.add_done_callback(lambda _: self.release())
+        return fut
+
+    async def run(self, fn, *args, reserved: bool = False, **kwargs):
+        """submit() + nəticəni gözlə."""
+        return await asyncio.wrap_future(self.submit(fn, *args, reserved=reserved, **kwargs))
+
+    def _call(self, fn, *args, **kwargs):
+        with self._lock:
+            self._active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+
+# Ağır işlər (Excel parse + bütün vərəqin matçı) prosesdə məhdud sayda;
+# tək sorğular ayrıca lane-də – böyük upload-lar onları bloklamır.
+heavy = Lane(
+    "heavy",
+    workers=getattr(settings, "AZCON_MAX_HEAVY_JOBS", 2),
+    queue=getattr(settings, "AZCON_HEAVY_QUEUE", 4),
+)
+light = Lane(
+    "light",
+    workers=getattr(settings, "AZCON_LIGHT_WORKERS", 4),
+    queue=getattr(settings, "AZCON_LIGHT_QUEUE", 64),
+)
+for _lane in (heavy, light):
+    metrics.ACTIVE_JOBS.set_function(lambda lane=_lane: lane.active, lane=_lane.name)
+
+
+class Progress:
+    """
+    Worker thread-dən stream-ə thread-safe hadisə ötürücü (queue.Queue – heç bir
+    event loop-a bağlı deyil). push() istənilən thread-dən çağırıla bilər;
+    WSGI-də sync iterator (iter(progress)), ASGI-də events() async iterator-dur.
+    """
+
+    _END = object()
+
+    def __init__(self):
+        self._q: queue.Queue = queue.Queue()
+
+    def push(self, event: str, data) -> None:
+        self._q.put((event, data))
+
+    def close(self) -> None:
+        self._q.put(self._END)
+
+    def __iter__(self):
+        while True:
+            item = self._q.get()
+            if item is self._END:
+                return
+            yield item
+
+    async def events(self):
+        while True:
+            item = await asyncio.to_thread(self._q.get)
+            if item is self._END:
+                return
+            yield item
@@ -0,0 +1,25 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from analyzer.confirmed import export_rows, write_export
+
+
+class Command(BaseCommand):
+    help = "Təsdiqlənmiş matçları CSV və ya JSON Lines kimi ixrac edir."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="Çıxış faylı (default: stdout)")
+        parser.add_argument("--format", choices=["csv", "jsonl"], default=None, help="Default: fayl uzantısından, yoxsa csv")
+        parser.add_argument("--catalog", default=None, help="Yalnız bu kataloq ('' – default master)")
+        parser.add_argument("--include-invalid", action="store_true", help="Etibarsız edilmiş qeydləri də yaz")
+
+    def handle(self, path, format, catalog, include_invalid, **opts):
+        fmt = format or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+        rows = export_rows(catalog=catalog, include_invalid=include_invalid)
+        if path == "-":
+            n = write_export(sys.stdout, rows, fmt)
+        else:
+            with open(path, "w", encoding="utf-8", newline="") as fh:
+                n = write_export(fh, rows, fmt)
+        self.stderr.write(f"{n} qeyd ixrac edildi")
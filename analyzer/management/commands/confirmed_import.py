@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer import masters
+from analyzer.confirmed import import_rows, read_import
+
+
+def _master_for(catalog: str):
+    try:
+        return masters.load(catalog)
+    except masters.MasterUnavailable as e:
+        raise CommandError(str(e)) from e
+
+
+class Command(BaseCommand):
+    help = (
+        "Təsdiqlənmiş matçları CSV / JSON Lines-dan idxal edir "
+        "(sütunlar: query, flag, unit, row_ids, [catalog]). "
+        "canon və fingerprint cari vocab və master-ə görə yenidən hesablanır."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Giriş faylı ('-' – stdin)")
+        parser.add_argument("--format", choices=["csv", "jsonl"], default=None)
+        parser.add_argument("--catalog", default="", help="Sətirdə catalog yoxdursa istifadə olunur")
+
+    def handle(self, path, format, catalog, **opts):
+        fmt = format or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+        if path == "-":
+            res = import_rows(read_import(sys.stdin, fmt), _master_for, default_catalog=catalog)
+        else:
+            with open(path, encoding="utf-8-sig", newline="") as fh:
+                res = import_rows(read_import(fh, fmt), _master_for, default_catalog=catalog)
+        for err in res["errors"][:20]:
+            self.stderr.write(err)
+        self.stdout.write(f"İdxal: {res['imported']}, ötürüldü: {res['skipped']}")
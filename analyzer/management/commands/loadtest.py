@@ -0,0 +1,489 @@
+"""
+Upload yolu üçün yük testi + yaddaş profili.
+
+    python manage.py loadtest --rows 100,1000 --concurrency 1,4 --workers 1,2 --requests 20 --out report.json
+
+Hər ssenari (rows × concurrency × workers) üçün N worker prosesi config.wsgi
+tətbiqini lokal (threaded wsgiref) serverdə qaldırır, generasiya olunmuş sorğu
+workbook-ları upload_file-a (--stream ilə upload_stream-ə) göndərilir. Nəticə:
+throughput, gecikmə quantile-ları, worker-lərin pik RSS-i (/proc) və --tracemalloc
+ilə mərhələlər üzrə ayrılma nöqtələri.
+--baseline köhnə hesabatla müqayisə edir.
+"""
+from __future__ import annotations
+
+import http.client
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from azcon_match import config
+
+def _ints(value: str) -> list[int]:
+    return [int(x) for x in str(value).split(",") if x.strip()]
+
+def _quantile(sorted_vals: list[float], q: float) -> float | None:
+    if not sorted_vals:
+        return None
+    i = min(len(sorted_vals) - 1, max(0, round(q * (len(sorted_vals) - 1))))
+    return sorted_vals[i]
+
+# ---------------------------------------------------------
+# RSS (/proc) – Linux; başqa yerdə None
+# ---------------------------------------------------------
+def _proc_status(pid: int, field: str) -> int | None:
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+class RssSampler(threading.Thread):
+    def __init__(self, pids: list[int], interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.pids, self.interval = pids, interval
+        self.peak = {pid: 0 for pid in pids}
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.is_set():
+            for pid in self.pids:
+                rss = _proc_status(pid, "VmRSS") or 0
+                if rss > self.peak[pid]:
+                    self.peak[pid] = rss
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+# ---------------------------------------------------------
+# Workbook generasiyası
+# ---------------------------------------------------------
+class Workbooks:
+    """Master sətirlərindən (bir token atılmış variantlarla) sorğu workbook-ları."""
+
+    def __init__(self, master_path: Path | None, pool_path: Path | None, seed: int):
+        import pandas as pd
+
+        self.rng = random.Random(seed)
+        src = pool_path or master_path
+        if src is None:
+            raise CommandError("Master faylı tapılmadı (data/master_db.xlsx) – --pool verin.")
+        df = pd.read_excel(src)
+        cols = [config.QUERY_TEXT_COL, config.QUERY_FLAG_COL, config.UNIT_COL]
+        missing = [c for c in cols if c not in df.columns]
+        if missing:
+            raise CommandError(f"{src}: sütunlar yoxdur: {missing}")
+        df = df[cols].dropna(subset=[config.QUERY_TEXT_COL])
+        self.pool = list(df.astype(str).itertuples(index=False, name=None))
+        self._seen: set[int] = set()
+
+    def make(self, n_rows: int, unique: bool = True) -> bytes:
+        """
+        unique=True: eyni sətir dəsti iki dəfə verilmir – upload keşi (məzmun hash-i)
+        nəticəni təkrar istifadə etməsin. Fərq yalnız mövcud sütunlardadır (seçilən
+        sətirlər + atılan tokenlər), ona görə parse/write real upload formasını ölçür.
+        """
+        import pandas as pd
+
+        for _ in range(100):
+            rows = []
+            for text, flag, unit in self.rng.choices(self.pool, k=n_rows):
+                words = text.split()
+                if len(words) > 2 and self.rng.random() < 0.5:
+                    words.pop(self.rng.randrange(len(words)))
+                rows.append((" ".join(words), flag, unit))
+            digest = hash(tuple(rows))
+            if not unique or digest not in self._seen:
+                self._seen.add(digest)
+                break
+        else:
+            raise CommandError("Sorğu hovuzu unikal workbook üçün çox kiçikdir – --pool və ya --reuse-cache verin.")
+        df = pd.DataFrame(rows, columns=[config.QUERY_TEXT_COL, config.QUERY_FLAG_COL, config.UNIT_COL])
+        buf = io.BytesIO()
+        df.to_excel(buf, index=False)
+        return buf.getvalue()
+
+# ---------------------------------------------------------
+# HTTP klient (CSRF cookie + multipart)
+# ---------------------------------------------------------
+class Target:
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host, self.port, self.timeout = host, port, timeout
+        self._csrf: str | None = None
+
+    def _conn(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def csrf(self) -> str:
+        if self._csrf is None:
+            c = self._conn()
+            c.request("GET", "/")
+            r = c.getresponse()
+            r.read()
+            cookie = SimpleCookie()
+            for h in r.headers.get_all("Set-Cookie") or []:
+                cookie.load(h)
+            c.close()
+            if "csrftoken" not in cookie:
+                raise RuntimeError("csrftoken cookie alınmadı")
+            self._csrf = cookie["csrftoken"].value
+        return self._csrf
+
+    def upload(self, data: bytes, fmt: str, stream: bool = False) -> tuple[int, int]:
+        """
+        stream=False: POST / (upload_file) → fayl cavabı.
+        stream=True: POST /upload/stream/ → SSE sonuna qədər oxunur, `done`-dakı fayl yüklənir.
+        """
+        token = self.csrf()
+        boundary = uuid.uuid4().hex
+        body = b"".join([
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"format\"\r\n\r\n{fmt}\r\n".encode(),
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"excel_file\"; filename=\"loadtest.xlsx\"\r\n"
+            "Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n".encode(),
+            data, f"\r\n--{boundary}--\r\n".encode(),
+        ])
+        c = self._conn()
+        try:
+            c.request("POST", "/upload/stream/" if stream else "/", body=body, headers={
+                "Content-Type": f"multipart/form-data; boundary={boundary}",
+                "Cookie": f"csrftoken={token}",
+                "X-CSRFToken": token,
+            })
+            r = c.getresponse()
+            payload = r.read()
+        finally:
+            c.close()
+        if not stream or r.status != 200:
+            return r.status, len(payload)
+        return self._download(payload)
+
+    def _download(self, sse: bytes) -> tuple[int | str, int]:
+        event = data = None
+        for line in sse.decode("utf-8").splitlines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: ") and event in ("done", "error"):
+                data = json.loads(line[6:])
+                break
+        if event != "done" or not data:
+            return (data or {}).get("status", "stream"), 0
+        c = self._conn()
+        try:
+            c.request("GET", data["download"])
+            r = c.getresponse()
+            return r.status, len(r.read())
+        finally:
+            c.close()
+
+# ---------------------------------------------------------
+# Worker prosesləri
+# ---------------------------------------------------------
+class Workers:
+    def __init__(self, n: int, env: dict, host: str, tracemalloc_frames: int, workdir: Path):
+        self.procs: list[subprocess.Popen] = []
+        self.ports: list[int] = []
+        self.profiles: list[Path] = []
+        manage = Path(settings.BASE_DIR) / "manage.py"
+        for i in range(n):
+            prof = workdir / f"profile-{i}-{uuid.uuid4().hex[:6]}.json"
+            args = [sys.executable, str(manage), "loadtest", "--serve", "--host", host, "--profile-out", str(prof)]
+            if tracemalloc_frames:
+                args += ["--tracemalloc", str(tracemalloc_frames)]
+            p = subprocess.Popen(args, stdout=subprocess.PIPE, text=True, env=env)
+            self.procs.append(p)
+            self.profiles.append(prof)
+        for i, p in enumerate(self.procs):
+            line = p.stdout.readline()
+            if not line.startswith("READY"):
+                self.stop()
+                raise CommandError(f"worker {i} başlamadı: {line!r}")
+            self.ports.append(int(line.split()[1]))
+
+    @property
+    def pids(self) -> list[int]:
+        return [p.pid for p in self.procs]
+
+    def reset_profiles(self) -> None:
+        for p in self.procs:
+            p.send_signal(signal.SIGUSR1)
+        time.sleep(0.1)
+
+    def stop(self) -> list[dict]:
+        hwm = []
+        for p in self.procs:
+            hwm.append(_proc_status(p.pid, "VmHWM"))
+            if p.poll() is None:
+                p.send_signal(signal.SIGTERM)
+        for p in self.procs:
+            try:
+                p.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        out = []
+        for prof, h in zip(self.profiles, hwm):
+            stages = json.loads(prof.read_text(encoding="utf-8")) if prof.exists() else {}
+            out.append({"vm_hwm_bytes": h, "stages": stages})
+        return out
+
+def _merge_stages(per_worker: list[dict]) -> dict:
+    merged: dict[str, dict] = {}
+    for w in per_worker:
+        for name, st in w.get("stages", {}).items():
+            m = merged.setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                          "alloc_net_bytes": 0, "peak_alloc_bytes": 0, "peak_samples": 0,
+                                          "top_sites": {}})
+            m["calls"] += st["calls"]
+            m["seconds"] += st["seconds"]
+            m["max_seconds"] = max(m["max_seconds"], st["max_seconds"])
+            m["alloc_net_bytes"] += st["alloc_net_bytes"]
+            m["peak_alloc_bytes"] = max(m["peak_alloc_bytes"], st["peak_alloc_bytes"])
+            m["peak_samples"] += st["peak_samples"]
+            for site, size in st.get("top_sites", []):
+                m["top_sites"][site] = m["top_sites"].get(site, 0) + size
+    for m in merged.values():
+        m["mean_seconds"] = m["seconds"] / m["calls"] if m["calls"] else None
+        m["top_sites"] = sorted(m["top_sites"].items(), key=lambda kv: -kv[1])[:10]
+    return merged
+
+# ---------------------------------------------------------
+# Komanda
+# ---------------------------------------------------------
+class Command(BaseCommand):
+    help = "upload_file üçün yük testi: throughput, gecikmə, pik RSS və mərhələ profili."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", default="100", help="Workbook ölçüləri (vergüllə): 100,1000")
+        parser.add_argument("--concurrency", default="1,4", help="Paralel klient sayları")
+        parser.add_argument("--workers", default="1", help="Worker prosesi sayları")
+        parser.add_argument("--requests", type=int, default=20, help="Hər ssenaridə upload sayı")
+        parser.add_argument("--format", default="xlsx", choices=["xlsx", "csv", "parquet", "arrow"])
+        parser.add_argument("--pool", default=None, help="Sorğu hovuzu workbook-u (default: master)")
+        parser.add_argument("--reuse-cache", action="store_true", help="Eyni workbook – upload keşini ölç")
+        parser.add_argument("--stream", action="store_true", help="upload_file əvəzinə /upload/stream/ (SSE + download)")
+        parser.add_argument("--tracemalloc", type=int, default=0, metavar="FRAMES",
+                            help="Worker-lərdə tracemalloc (0 – söndürülüb). Çox yavaşladır – "
+                                 "bu rejimdə gecikmə/throughput yazılmır (null, timing_valid=false), yalnız yaddaş və ayrılma nöqtələri")
+        parser.add_argument("--timeout", type=float, default=600.0)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--out", default=None, help="JSON hesabat faylı")
+        parser.add_argument("--baseline", default=None, help="Müqayisə üçün köhnə JSON hesabat")
+        parser.add_argument("--keep", action="store_true", help="Müvəqqəti iş qovluğunu (media, db, profillər) silmə")
+        # daxili: worker rejimi
+        parser.add_argument("--serve", action="store_true", help="(daxili) worker kimi işlə")
+        parser.add_argument("--profile-out", default=None, help="(daxili) worker profil faylı")
+
+    # -- worker ------------------------------------------------------------
+    def _serve(self, opts):
+        import tracemalloc
+        from socketserver import ThreadingMixIn
+        from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+        if opts["tracemalloc"]:
+            tracemalloc.start(opts["tracemalloc"])
+
+        from config.wsgi import application
+        from analyzer import profiling
+
+        class Server(ThreadingMixIn, WSGIServer):
+            daemon_threads = True
+            request_queue_size = 128
+
+        class Quiet(WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        srv = make_server(opts["host"], 0, application, server_class=Server, handler_class=Quiet)
+
+        def _term(*_):
+            raise KeyboardInterrupt
+
+        signal.signal(signal.SIGTERM, _term)
+        # klient isinmədən sonra göndərir – ilk master yükləməsi mərhələ statistikasına düşməsin
+        signal.signal(signal.SIGUSR1, lambda *_: profiling.reset())
+        sys.stdout.write(f"READY {srv.server_port}\n")
+        sys.stdout.flush()
+        sys.stdout = sys.stderr  # pipe-ı daha oxuyan yoxdur (master yükləmə print-ləri)
+        try:
+            srv.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if opts["profile_out"]:
+                profiling.dump(opts["profile_out"])
+            srv.server_close()
+
+    # -- klient ------------------------------------------------------------
+    def _scenario(self, books: Workbooks, rows: int, conc: int, n_workers: int, opts, env, workdir) -> dict:
+        workers = Workers(n_workers, env, opts["host"], opts["tracemalloc"], workdir)
+        try:
+            targets = [Target(opts["host"], p, opts["timeout"]) for p in workers.ports]
+            # isinma: master yüklənsin, RSS-in "boş" səviyyəsi ölçülsün
+            warm = books.make(5)
+            for t in targets:
+                t.upload(warm, opts["format"], opts["stream"])
+            idle = [_proc_status(pid, "VmRSS") for pid in workers.pids]
+            workers.reset_profiles()
+
+            fixed = books.make(rows) if opts["reuse_cache"] else None
+            payloads = [fixed or books.make(rows) for _ in range(opts["requests"])]
+            sampler = RssSampler(workers.pids)
+            sampler.start()
+            results = []
+            rr = itertools.count()
+
+            def one(data):
+                t = targets[next(rr) % len(targets)]
+                t0 = time.perf_counter()
+                try:
+                    status, size = t.upload(data, opts["format"], opts["stream"])
+                except Exception as e:
+                    status, size = type(e).__name__, 0
+                return status, size, time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=conc) as pool:
+                results = list(pool.map(one, payloads))
+            wall = time.perf_counter() - t0
+            sampler.stop()
+        finally:
+            per_worker = workers.stop()
+
+        ok = [lat for status, _, lat in results if status == 200]
+        errors: dict[str, int] = {}
+        for status, _, _ in results:
+            if status != 200:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+        # tracemalloc rejimində take_snapshot() worker-in bütün thread-lərini saxlayır –
+        # gecikmə/throughput rəqəmləri mənasızdır, hesabata yazılmır
+        timed = not opts["tracemalloc"]
+        lat = sorted(ok) if timed else []
+        ms = lambda v: None if v is None else round(v * 1000, 1)
+        return {
+            "rows": rows, "concurrency": conc, "workers": n_workers, "requests": len(results),
+            "ok": len(ok), "errors": errors,
+            "timing_valid": timed,
+            "wall_seconds": round(wall, 3) if timed else None,
+            "throughput_rps": round(len(ok) / wall, 3) if timed and wall else None,
+            "rows_per_second": round(len(ok) * rows / wall, 1) if timed and wall else None,
+            "latency_ms": {
+                "mean": ms(sum(lat) / len(lat)) if lat else None,
+                "p50": ms(_quantile(lat, 0.50)), "p90": ms(_quantile(lat, 0.90)),
+                "p95": ms(_quantile(lat, 0.95)), "p99": ms(_quantile(lat, 0.99)), "max": ms(lat[-1] if lat else None),
+            },
+            "rss": {
+                "idle_bytes": idle,
+                "peak_sampled_bytes": [sampler.peak[pid] for pid in workers.pids],
+                "vm_hwm_bytes": [w["vm_hwm_bytes"] for w in per_worker],
+                "total_peak_bytes": sum(sampler.peak.values()),
+            },
+            "stages": _merge_stages(per_worker),
+        }
+
+    def handle(self, *args, **opts):
+        if opts["serve"]:
+            return self._serve(opts)
+
+        from analyzer.masters import resolve_master_path
+
+        books = Workbooks(resolve_master_path(), Path(opts["pool"]) if opts["pool"] else None, opts["seed"])
+        workdir = Path(tempfile.mkdtemp(prefix="azcon-loadtest-"))
+        try:
+            self._run(books, workdir, opts)
+        finally:
+            if opts["keep"]:
+                self.stderr.write(f"iş qovluğu saxlanıldı: {workdir}")
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    def _run(self, books: Workbooks, workdir: Path, opts) -> None:
+        env = {
+            **os.environ,
+            "AZCON_MEDIA_ROOT": str(workdir / "media"),   # layihənin media/ qovluğuna toxunmuruq
+            "AZCON_DB_PATH": str(workdir / "db.sqlite3"),
+            "AZCON_PROFILE_STAGES": "1",
+            "PYTHONUNBUFFERED": "1",
+        }
+        subprocess.run([sys.executable, str(Path(settings.BASE_DIR) / "manage.py"), "migrate", "-v", "0"],
+                       env=env, check=True)
+
+        scenarios = []
+        for rows, n_workers, conc in itertools.product(_ints(opts["rows"]), _ints(opts["workers"]), _ints(opts["concurrency"])):
+            self.stderr.write(f"→ rows={rows} workers={n_workers} concurrency={conc} …")
+            scenarios.append(self._scenario(books, rows, conc, n_workers, opts, env, workdir))
+            self.stdout.write(self._line(scenarios[-1]))
+
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+            "options": {k: opts[k] for k in ("rows", "concurrency", "workers", "requests", "format", "reuse_cache", "stream", "tracemalloc", "seed")},
+            "scenarios": scenarios,
+        }
+        if opts["out"]:
+            Path(opts["out"]).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+            self.stderr.write(f"hesabat: {opts['out']}")
+        if opts["baseline"]:
+            self._compare(json.loads(Path(opts["baseline"]).read_text(encoding="utf-8")), report)
+        if opts["tracemalloc"]:
+            self._hot_spots(scenarios)
+
+    # -- hesabat -----------------------------------------------------------
+    @staticmethod
+    def _line(s: dict) -> str:
+        lat, mb = s["latency_ms"], s["rss"]["total_peak_bytes"] / 2**20
+        head = f"rows={s['rows']:>6} workers={s['workers']:>2} conc={s['concurrency']:>3} | ok {s['ok']}/{s['requests']} | "
+        if not s.get("timing_valid", True):
+            return head + f"vaxt ölçülmür (--tracemalloc) | peak RSS {mb:.0f} MB"
+        stages = " ".join(f"{k}={v['mean_seconds']:.3f}s" for k, v in s["stages"].items() if v["mean_seconds"] is not None)
+        return (
+            head + f"{s['throughput_rps']} req/s {s['rows_per_second']} rows/s | "
+            f"p50 {lat['p50']} p95 {lat['p95']} p99 {lat['p99']} ms | peak RSS {mb:.0f} MB | {stages}"
+        )
+
+    def _compare(self, old: dict, new: dict) -> None:
+        key = lambda s: (s["rows"], s["workers"], s["concurrency"])
+        before = {key(s): s for s in old.get("scenarios", [])}
+        self.stdout.write("\nbaseline ilə müqayisə (yeni / köhnə):")
+        for s in new["scenarios"]:
+            b = before.get(key(s))
+            if not b:
+                continue
+            ratio = lambda a, c: f"{a / c:.2f}x" if a and c else "—"
+            self.stdout.write(
+                f"rows={s['rows']:>6} workers={s['workers']:>2} conc={s['concurrency']:>3} | "
+                f"throughput {ratio(s['throughput_rps'], b['throughput_rps'])} | "
+                f"p95 {ratio(s['latency_ms']['p95'], b['latency_ms']['p95'])} | "
+                f"peak RSS {ratio(s['rss']['total_peak_bytes'], b['rss']['total_peak_bytes'])}"
+            )
+
+    def _hot_spots(self, scenarios: list[dict]) -> None:
+        self.stdout.write("\nayrılma nöqtələri (tracemalloc, mərhələ üzrə):")
+        for s in scenarios:
+            self.stdout.write(f"rows={s['rows']} workers={s['workers']} conc={s['concurrency']}")
+            for name, st in s["stages"].items():
+                top = ", ".join(f"{site} +{size / 2**20:.1f}MB" for site, size in st["top_sites"][:3])
+                peak = (f"peak +{st['peak_alloc_bytes'] / 2**20:.1f} MB ({st['peak_samples']}/{st['calls']})"
+                        if st["peak_samples"] else "peak — (hamısı paralel)")
+                self.stdout.write(f"  {name:<7} {peak} | {top}")
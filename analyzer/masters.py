@@ -0,0 +1,168 @@
+# analyzer/masters.py
+# Sorğunun master-i: default fayl (prosesdə keşlənmiş və ya shared mmap), sharded
+# Coordinator və ya adlı kataloq. View-lar və management komandaları load() ilə alır.
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+from django.conf import settings
+
+from azcon_match import api as match_api
+from azcon_match import config
+from azcon_match import metrics
+from azcon_match import vocab as vocab_mod
+
+
+class MasterUnavailable(Exception):
+    """Master tapılmadı / yüklənmədi; status – view-un qaytaracağı HTTP kodu."""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+def resolve_master_path() -> Path | None:
+    """
+    Master faylını tapmaq üçün prioritet:
+      1) BASE_DIR / data / master_db.xlsx
+      2) BASE_DIR / master_db.xlsx
+      3) config.MASTER_PATH (əgər mövcuddursa və fayl varsa)
+    """
+    candidates: list[Path] = [
+        Path(settings.BASE_DIR) / "data" / "master_db.xlsx",
+        Path(settings.BASE_DIR) / "master_db.xlsx",
+    ]
+    for p in candidates:
+        if p.exists():
+            return p
+
+    legacy = getattr(config, "MASTER_PATH", None)
+    if legacy and Path(legacy).exists():
+        return Path(legacy)
+
+    return None
+
+# Prosesdaxili master keşi: (path, mtime) dəyişməyibsə yenidən yükləmirik.
+# Kilid yalnız keşi yoxlamaq / dəyişdirmək üçündür; yükləmə (Excel, vocab yenilənməsi,
+# shard-lara qoşulma) kilidsizdir – eyni açarı bir thread yükləyir, digərləri onun
+# Future-unu gözləyir, başqa açarlara (və hazır master-ə) sorğular gözləmir.
+_master_cache: dict[str, tuple[float, object]] = {}
+_master_lock = threading.Lock()
+_loading: dict[str, Future] = {}
+
+def _single_flight(key: str, cached, load):
+    """cached() kilid altında hazır dəyəri (və ya None) verir; yoxdursa load() bir dəfə, kilidsiz."""
+    with _master_lock:
+        value = cached()
+        if value is not None:
+            return value
+        fut = _loading.get(key)
+        owner = fut is None
+        if owner:
+            fut = _loading[key] = Future()
+    if not owner:
+        return fut.result()
+    try:
+        value = load()
+    except BaseException as e:
+        with _master_lock:
+            _loading.pop(key, None)
+        fut.set_exception(e)
+        raise
+    with _master_lock:
+        _loading.pop(key, None)
+    fut.set_result(value)
+    return value
+
+def _get_master(master_path: Path):
+    """
+    AZCON_SHARED_MASTER təyin olunubsa master bütün worker-lər üçün bir mmap
+    faylından oxunur; əks halda prosesdə bir dəfə yüklənib keşlənir
+    (fayl dəyişəndə və ya vocab yenilənəndə yenilənir).
+    """
+    shared = getattr(settings, "AZCON_SHARED_MASTER", None)
+    if shared:
+        return match_api.load_shared_master(master_path, shared)
+
+    key, mtime = str(master_path), master_path.stat().st_mtime
+    version = vocab_mod.current().version
+
+    def cached():
+        hit = _master_cache.get(key)
+        fresh = hit is not None and hit[0] == mtime
+        metrics.cache("master", fresh)
+        return hit[1] if fresh and hit[1].attrs.get("vocab_version") == version else None
+
+    def load():
+        with _master_lock:
+            hit = _master_cache.get(key)
+        if hit and hit[0] == mtime:
+            df = match_api.refresh_master(hit[1])  # yalnız vocab dəyişib
+        else:
+            df = match_api.load_master(path=str(master_path))
+        with _master_lock:
+            _master_cache[key] = (mtime, df)
+        return df
+
+    return _single_flight(key, cached, load)
+
+_coordinator = None
+
+def _get_coordinator():
+    """AZCON_SHARDS təyin olunubsa default master shard server-lərə bölünüb (scatter-gather)."""
+    def load():
+        global _coordinator
+        from azcon_match import sharding
+        coord = sharding.remote(
+            settings.AZCON_SHARDS,
+            timeout=getattr(settings, "AZCON_SHARD_TIMEOUT", 5.0),
+            top=getattr(settings, "AZCON_SHARD_TOP", None),
+        )
+        with _master_lock:
+            _coordinator = coord
+        return coord
+
+    return _single_flight("shards", lambda: _coordinator, load)
+
+def preload_shared_master() -> None:
+    """wsgi/asgi import zamanı çağırılır: gunicorn --preload ilə fayl fork-dan əvvəl hazır olur."""
+    if not getattr(settings, "AZCON_SHARED_MASTER", None):
+        return
+    master_path = resolve_master_path()
+    if master_path:
+        _get_master(master_path)
+
+# Adlı kataloqlar: registr prosesdə bir dəfə qurulur, kataloqlar ilk müraciətdə yüklənir.
+match_api.configure_catalogs(
+    dirs=getattr(settings, "AZCON_CATALOG_DIRS", ()),
+    explicit=getattr(settings, "AZCON_CATALOGS", None),
+    budget_mb=getattr(settings, "AZCON_CATALOG_MEMORY_MB", 2048),
+    snapshot_dir=getattr(settings, "AZCON_CATALOG_SNAPSHOT_DIR", None),
+)
+
+def load(catalog_name: str = ""):
+    """
+    Kataloq adı verilibsə – həmin kataloq; AZCON_SHARDS varsa – Coordinator;
+    əks halda default master. Tapılmırsa / yüklənmirsə MasterUnavailable.
+    """
+    if catalog_name:
+        from azcon_match.catalog import UnknownCatalog
+        try:
+            return match_api.load_catalog(catalog_name)
+        except UnknownCatalog:
+            raise MasterUnavailable(f"Kataloq tapılmadı: {catalog_name}", 404)
+        except Exception as e:
+            raise MasterUnavailable(f"Kataloq yüklənmədi ({catalog_name}): {e}", 500) from e
+
+    if getattr(settings, "AZCON_SHARDS", None):
+        return _get_coordinator()
+
+    master_path = resolve_master_path()
+    if not master_path:
+        raise MasterUnavailable("Master faylı tapılmadı. Zəhmət olmasa 'data/master_db.xlsx' yerləşdir.", 500)
+    try:
+        return _get_master(master_path)
+    except Exception as e:
+        raise MasterUnavailable(f"Master yüklənmədi: {e}", 500) from e
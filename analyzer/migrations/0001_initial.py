@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfirmedMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('catalog', models.CharField(blank=True, default='', max_length=64)),
+                ('canon', models.CharField(max_length=512)),
+                ('flag', models.CharField(blank=True, default='', max_length=16)),
+                ('unit', models.CharField(blank=True, default='', max_length=32)),
+                ('query', models.TextField(blank=True, default='')),
+                ('row_ids', models.JSONField(default=list)),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('vocab_version', models.CharField(blank=True, default='', max_length=16)),
+                ('valid', models.BooleanField(default=True)),
+                ('invalidated_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['catalog', 'valid'], name='confirmed_catalog_valid')],
+                'constraints': [models.UniqueConstraint(fields=('catalog', 'canon', 'flag', 'unit'), name='confirmed_match_key')],
+            },
+        ),
+    ]
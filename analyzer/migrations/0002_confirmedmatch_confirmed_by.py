@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='confirmedmatch',
+            name='confirmed_by',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+    ]
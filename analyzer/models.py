@@ -1,3 +1,34 @@
 from django.db import models
 
-# Create your models here.
+
+class ConfirmedMatch(models.Model):
+    """
+    Təsdiqlənmiş sorğu → master sətir(lər)i. Açar: (kataloq, canon, flag, unit) –
+    matcher bunu ilk olaraq yoxlayır (azcon_match.confirmed; qeydlər kataloq üzrə bir
+    sorğu ilə prosesə oxunur – analyzer.confirmed.prefetch).
+    fingerprint istinad olunan sətirlərin mətn/tip/vahidindən hesablanır; master-də
+    onlar dəyişibsə qeyd avtomatik etibarsız sayılır (valid=False).
+    """
+
+    catalog = models.CharField(max_length=64, blank=True, default="")  # "" – default master
+    canon = models.CharField(max_length=512)
+    flag = models.CharField(max_length=16, blank=True, default="")
+    unit = models.CharField(max_length=32, blank=True, default="")
+    query = models.TextField(blank=True, default="")  # nümunə xam sorğu (admin üçün)
+    row_ids = models.JSONField(default=list)
+    fingerprint = models.CharField(max_length=40)
+    vocab_version = models.CharField(max_length=16, blank=True, default="")
+    valid = models.BooleanField(default=True)
+    confirmed_by = models.CharField(max_length=150, blank=True, default="")  # istifadəçi adı və ya "import"
+    invalidated_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["catalog", "canon", "flag", "unit"], name="confirmed_match_key"),
+        ]
+        indexes = [models.Index(fields=["catalog", "valid"], name="confirmed_catalog_valid")]
+
+    def __str__(self):
+        return f"{self.canon} [{self.flag}/{self.unit}] → {self.row_ids}"
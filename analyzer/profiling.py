@@ -0,0 +1,103 @@
+# analyzer/profiling.py
+# Upload mərhələləri üzrə vaxt + yaddaş profili (loadtest üçün). Default söndürülüb:
+# AZCON_PROFILE_STAGES=1 ilə aktivdir; tracemalloc işləyirsə ayrılmalar da yazılır.
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+ENABLED = os.environ.get("AZCON_PROFILE_STAGES") == "1"
+# hər mərhələ üçün ilk N çağırışda tracemalloc snapshot fərqi (snapshot bahalıdır)
+SNAPSHOTS = int(os.environ.get("AZCON_PROFILE_SNAPSHOTS", 3))
+TOP_SITES = 10
+
+# snapshot-ların öz ayrılmaları nəticəni çirkləndirməsin
+_NOISE = (tracemalloc.Filter(False, tracemalloc.__file__),)
+
+_lock = threading.Lock()
+_stages: dict[str, dict] = {}
+# tracemalloc-un peak-i proses üzrədir: mərhələ peak-i yalnız o an başqa mərhələ
+# işləmirsə ölçülür (girişdə reset_peak; çıxışda arada başqa mərhələ başlamayıbsa yazılır)
+_active = 0
+_entered = 0
+
+def _slot(name: str) -> dict:
+    return _stages.setdefault(name, {
+        "calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+        "alloc_net_bytes": 0, "peak_alloc_bytes": 0, "peak_samples": 0, "snapshots": 0, "sites": Counter(),
+    })
+
+@contextmanager
+def stage(name: str):
+    """
+    Mərhələni ölç. Paralel sorğularda alloc_net_bytes və top_sites proses üzrədir
+    (digər thread-lərin ayrılmaları da daxil olur) – müqayisə üçün eyni concurrency ilə baxın.
+    peak_alloc_bytes – mərhələ ərzində traced yaddaşın girişdəki səviyyədən ən çox artımı;
+    yalnız başqa mərhələ ilə üst-üstə düşməyən çağırışlardan (peak_samples) –
+    --concurrency 1 ilə hər çağırış sayılır.
+    """
+    global _active, _entered
+    if not ENABLED:
+        yield
+        return
+    tracing = tracemalloc.is_tracing()
+    with _lock:
+        take = tracing and _slot(name)["snapshots"] < SNAPSHOTS
+        if take:
+            _slot(name)["snapshots"] += 1
+    snap0 = tracemalloc.take_snapshot() if take else None
+    with _lock:
+        solo = tracing and _active == 0
+        if solo:
+            tracemalloc.reset_peak()
+        _active += 1
+        _entered += 1
+        ticket = _entered
+        cur0 = tracemalloc.get_traced_memory()[0] if tracing else 0
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        with _lock:
+            cur1, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+            _active -= 1
+            solo = solo and _entered == ticket  # arada başqa mərhələ başlamayıb
+        sites = []
+        if snap0 is not None:
+            diff = tracemalloc.take_snapshot().filter_traces(_NOISE).compare_to(snap0.filter_traces(_NOISE), "lineno")
+            sites = [(f"{s.traceback[0].filename}:{s.traceback[0].lineno}", s.size_diff) for s in diff[:TOP_SITES]]
+        with _lock:
+            st = _slot(name)
+            st["calls"] += 1
+            st["seconds"] += dt
+            st["max_seconds"] = max(st["max_seconds"], dt)
+            st["alloc_net_bytes"] += cur1 - cur0
+            if solo:
+                st["peak_alloc_bytes"] = max(st["peak_alloc_bytes"], peak - cur0)
+                st["peak_samples"] += 1
+            for site, size in sites:
+                st["sites"][site] += size
+
+def report() -> dict:
+    with _lock:
+        out = {}
+        for name, st in _stages.items():
+            out[name] = {k: v for k, v in st.items() if k != "sites"}
+            out[name]["top_sites"] = st["sites"].most_common(TOP_SITES)
+        return out
+
+def reset() -> None:
+    with _lock:
+        _stages.clear()
+        if tracemalloc.is_tracing() and _active == 0:
+            tracemalloc.reset_peak()
+
+def dump(path: str | Path) -> None:
+    Path(path).write_text(json.dumps(report(), indent=2, ensure_ascii=False), encoding="utf-8")
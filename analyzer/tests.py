@@ -1,3 +1,1043 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from django.test import AsyncClient, TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from azcon_match import config
+
+from . import masters, views
+
+# Kiçik master: eyni mətnli sətirlər (exact), ortaq tokenli variantlar (fuzzy) və
+# rəqəmli sətirlər (numeric blok) – matcher-in bütün yollarını əhatə edir.
+MASTER_ROWS = [
+    ("Divarların alçipan ilə örtülməsi", "Xidmət", 12.5, "m2"),
+    ("Divarların alçipan ilə örtülməsi", "Xidmət", 14.0, "m2"),
+    ("Tavanın alçipan ilə örtülməsi", "Xidmət", 15.0, "m2"),
+    ("Divarların suvaqlanması", "Xidmət", 6.0, "m2"),
+    ("Divarların boyanması su emulsiyası ilə", "Xidmət", 4.5, "m2"),
+    ("Döşəməyə laminat vurulması", "Xidmət", 7.0, "m2"),
+    ("Döşəməyə kafel düzülməsi", "Xidmət", 11.0, "m2"),
+    ("Kafel 30x30 sm", "Məhsul", 18.0, "m2"),
+    ("Kafel 60x60 sm", "Məhsul", 25.0, "m2"),
+    ("Plastik boru 20 mm", "Məhsul", 1.2, "m"),
+    ("Plastik boru 32 mm", "Məhsul", 2.1, "m"),
+    ("Mis kabel 3x2.5 mm2", "Məhsul", 3.4, "m"),
+    ("Mis kabel 3x4 mm2", "Məhsul", 5.1, "m"),
+    ("Qapı taxta 80 sm", "Məhsul", 210.0, "ədəd"),
+    ("Qapının quraşdırılması", "Xidmət", 40.0, "ədəd"),
+    ("Pəncərə plastik ikiqat şüşə", "Məhsul", 150.0, "m2"),
+    ("Köhnə kafelin sökülməsi", "Xidmət", 3.0, "m2"),
+    ("Tikinti tullantılarının daşınması", "Xidmət", 9.0, "ton"),
+]
+
+QUERIES = [
+    ("Divarların alçipan ilə örtülməsi", "Xidmət", "m2"),
+    ("Divarlara alçipan vurulması", "Xidmət", "m2"),
+    ("Plastik boru 20 mm", "Məhsul", "m"),
+    ("Kafel 30x30 sm", "", ""),
+    ("Qapı quraşdırılması", "", "ədəd"),
+    ("Mis kabel 3x4 mm2", "Məhsul", "m"),
+    ("tamamilə naməlum sorğu", "", ""),
+]
+
+def _frame(rows, cols):
+    return pd.DataFrame(rows, columns=cols)
+
+def write_master(path: Path, rows=MASTER_ROWS) -> Path:
+    _frame(rows, [config.MASTER_TEXT_COL, config.MASTER_FLAG_COL, config.PRICE_COL, config.UNIT_COL]).to_excel(path, index=False)
+    return path
+
+def query_workbook(rows=QUERIES) -> bytes:
+    buf = io.BytesIO()
+    _frame(rows, [config.QUERY_TEXT_COL, config.QUERY_FLAG_COL, config.UNIT_COL]).to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+class ViewTestCase(TestCase):
+    """Müvəqqəti MEDIA_ROOT + kiçik master; masters-in keşi hər test üçün təmizlənir."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = Path(tempfile.mkdtemp(prefix="azcon-test-"))
+        cls.master_path = write_master(cls.tmp / "master.xlsx")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        media = tempfile.mkdtemp(prefix="media-", dir=self.tmp)
+        settings = override_settings(MEDIA_ROOT=media, AZCON_SHARDS=[], AZCON_SHARED_MASTER=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = mock.patch.object(masters, "resolve_master_path", return_value=self.master_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        masters._master_cache.clear()
+
+    def upload(self, data: bytes = None, name: str = "sorğu.xlsx") -> SimpleUploadedFile:
+        return SimpleUploadedFile(name, data if data is not None else query_workbook())
+
+
+class UploadStreamTests(ViewTestCase):
+    def read_events(self, response) -> list:
+        body = b"".join(iter(response)).decode("utf-8")  # WSGI server-in oxuduğu kimi
+        events = []
+        for chunk in body.split("\n\n"):
+            if chunk.strip():
+                head, data = chunk.split("\n", 1)
+                events.append((head.removeprefix("event: "), data.removeprefix("data: ")))
+        return events
+
+    def test_stream_completes_under_wsgi(self):
+        resp = self.client.post(reverse("upload_stream"), {"excel_file": self.upload()})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        events = self.read_events(resp)
+        names = [e for e, _ in events]
+        self.assertEqual(names[0], "queued")
+        self.assertEqual(names[-1], "done")
+        self.assertIn("progress", names)
+
+        done = json.loads(events[-1][1])
+        self.assertFalse(done["cached"])
+        self.assertEqual(done["rows"], len(QUERIES))
+        dl = self.client.get(done["download"])
+        self.assertEqual(dl.status_code, 200)
+
+    async def test_stream_under_asgi(self):
+        resp = await AsyncClient().post(reverse("upload_stream"), {"excel_file": self.upload()})
+        body = b"".join([chunk async for chunk in resp.streaming_content]).decode("utf-8")
+        self.assertIn("event: done", body)
+
+    def test_stream_reports_errors(self):
+        resp = self.client.post(reverse("upload_stream"), {"excel_file": self.upload(b"not excel", "x.xlsx")})
+        events = self.read_events(resp)
+        self.assertEqual(events[-1][0], "error")
+
+
+class LaneBackpressureTests(ViewTestCase):
+    def full_lane(self, name: str):
+        from . import jobs
+
+        lane = jobs.Lane(name, workers=1, queue=0)
+        lane.reserve()  # yeganə slot tutulub
+        self.addCleanup(lane.release)
+        patcher = mock.patch.object(jobs, name, lane)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return lane
+
+    def test_lane_rejects_beyond_capacity_and_frees_slot_when_done(self):
+        import threading
+
+        from . import jobs
+
+        lane = jobs.Lane("t", workers=1, queue=1)
+        gate = threading.Event()
+        first = lane.submit(gate.wait)
+        second = lane.submit(lambda: "ok")  # növbədə gözləyir
+        with self.assertRaises(jobs.Busy):
+            lane.submit(lambda: None)
+        gate.set()
+        first.result(timeout=5)
+        self.assertEqual(second.result(timeout=5), "ok")
+        lane.submit(lambda: None).result(timeout=5)  # slotlar geri qaytarılıb
+
+    def test_match_query_returns_503_when_light_lane_is_full(self):
+        self.full_lane("light")
+        resp = self.client.get(reverse("match"), {"q": "Plastik boru 20 mm"})
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp["Retry-After"], "5")
+
+    def test_upload_stream_returns_503_when_heavy_lane_is_full(self):
+        self.full_lane("heavy")
+        resp = self.client.post(reverse("upload_stream"), {"excel_file": self.upload()})
+        self.assertEqual(resp.status_code, 503)
+
+    def test_match_query_succeeds_with_free_slot(self):
+        resp = self.client.get(reverse("match"), {"q": "Plastik boru 20 mm", "flag": "Məhsul", "unit": "m"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["priced_hits"][0]["text"], "Plastik boru 20 mm")
+
+
+class MultiprocessMetricsTests(TestCase):
+    def test_counters_sum_across_process_files(self):
+        from azcon_match import metrics
+
+        d = tempfile.mkdtemp(prefix="azcon-metrics-")
+        self.addCleanup(shutil.rmtree, d, True)
+        workers = []
+        for n in (3, 4):  # iki "worker": hər registr öz faylını yazır
+            reg = metrics.Registry()
+            rows = metrics.Counter("t_rows_total", "test", reg)
+            reg.configure_multiprocess(d, interval=3600)
+            rows.inc(n)
+            reg.render()  # scrape (və ya interval) prosesin faylını yeniləyir
+            workers.append(reg)
+        for reg in workers:
+            self.assertIn("t_rows_total 7", reg.render())
+
+
+class ProfilingStageTests(TestCase):
+    def setUp(self):
+        import tracemalloc
+
+        from . import profiling
+
+        patcher = mock.patch.object(profiling, "ENABLED", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.addCleanup(tracemalloc.stop)
+        profiling.reset()
+        self.addCleanup(profiling.reset)
+
+    def test_peak_is_per_stage_not_process_wide(self):
+        from . import profiling
+
+        with profiling.stage("big"):
+            blob = bytearray(8 * 2**20)
+            del blob
+        with profiling.stage("small"):
+            blob = bytearray(2**10)
+            del blob
+        rep = profiling.report()
+        self.assertGreater(rep["big"]["peak_alloc_bytes"], 7 * 2**20)
+        self.assertLess(rep["small"]["peak_alloc_bytes"], 2**20)
+        self.assertEqual(rep["small"]["peak_samples"], 1)
+
+    def test_overlapping_stages_are_not_sampled(self):
+        from . import profiling
+
+        with profiling.stage("outer"):
+            with profiling.stage("inner"):
+                pass
+        rep = profiling.report()
+        self.assertEqual(rep["outer"]["peak_samples"], 0)
+        self.assertEqual(rep["outer"]["calls"], 1)
+
+
+class VocabReloadMixin:
+    """vocab-a müvəqqəti sinonim əlavə edir; test bitəndə əvvəlki vocab bərpa olunur."""
+
+    def reload_vocab(self, generic=(), **synonyms):
+        from azcon_match import vocab as vocab_mod
+
+        with open(vocab_mod.manager.path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.addCleanup(vocab_mod.reload, json.loads(json.dumps(data)))
+        data["synonyms"].update(synonyms)
+        data["generic"] = list(data.get("generic", [])) + list(generic)
+        return vocab_mod.reload(data)
+
+
+class MasterTestCase(TestCase):
+    """Kiçik master bir dəfə yüklənir (preprocess + index); testlər onu dəyişmir."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from azcon_match import data_loader
+
+        cls.tmp = Path(tempfile.mkdtemp(prefix="azcon-master-"))
+        cls.master = data_loader.load_master(str(write_master(cls.tmp / "m.xlsx")))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+        super().tearDownClass()
+
+
+class RefreshMasterTests(VocabReloadMixin, MasterTestCase):
+    def test_only_rows_touching_changed_synonyms_are_recomputed(self):
+        from azcon_match import data_loader, preprocessing as pp
+
+        self.reload_vocab(boru="truba")
+        with mock.patch.object(data_loader.pp, "canon", wraps=pp.canon) as canon:
+            fresh = data_loader.refresh_master(self.master)
+
+        self.assertEqual(canon.call_count, 2)  # yalnız iki "boru" sətri
+        changed = fresh["canon"] != self.master["canon"]
+        self.assertEqual(list(fresh.index[changed]), [9, 10])
+        self.assertIn("truba", fresh.at[9, "tokens"])
+        self.assertNotIn("truba", self.master.at[9, "tokens"])  # köhnə frame toxunulmur
+        self.assertNotEqual(fresh.attrs["vocab_version"], self.master.attrs["vocab_version"])
+        self.assertIs(data_loader.refresh_master(fresh), fresh)  # artıq aktualdır
+
+    def test_change_without_canon_effect_recomputes_nothing(self):
+        from azcon_match import data_loader
+
+        change = self.reload_vocab(generic=["plastik"])  # generic yalnız filtrə təsir edir
+        self.assertFalse(change.affects_canon)
+        with mock.patch.object(data_loader.pp, "canon") as canon:
+            fresh = data_loader.refresh_master(self.master, change)
+        canon.assert_not_called()
+        self.assertTrue(fresh["canon"].equals(self.master["canon"]))
+        self.assertEqual(fresh.attrs["vocab_version"], change.new.version)
+
+
+class BlockingTests(MasterTestCase):
+    QUERIES = QUERIES + [
+        ("alçipan örtülməsi", "", "m2"),
+        ("kafel", "Məhsul", "m2"),
+        ("mis kabel", "", "m"),
+        ("Divarların boyanması", "Xidmət", ""),
+    ]
+
+    def hits(self, res):
+        from collections import Counter
+
+        return Counter((t, sc, u) for t, sc, _, u in res["hits"])
+
+    def test_blocked_candidates_give_full_scan_hits(self):
+        from azcon_match import matcher
+
+        blocked = 0
+        with mock.patch.object(config, "EXACT_FAST_PATH", False):  # həmişə fuzzy yol
+            for q in self.QUERIES:
+                a = matcher.find_matches(*q, self.master, blocking=True)
+                b = matcher.find_matches(*q, self.master, blocking=False)
+                self.assertEqual(self.hits(a), self.hits(b), q)
+                self.assertEqual(b["stats"]["block"], "full")
+                if a["stats"]["block"] != "full":
+                    blocked += 1
+                    self.assertLess(a["stats"]["candidates"], len(self.master))
+        self.assertGreater(blocked, len(self.QUERIES) // 2)
+
+    def test_audit_reports_no_missed_hits(self):
+        from azcon_match import matcher
+
+        report = matcher.audit_blocking(self.QUERIES, self.master)
+        self.assertEqual(sum(r["queries"] for r in report.values()), len(self.QUERIES))
+        self.assertEqual(sum(r["missed"] for r in report.values()), 0)
+
+
+class ExactFastPathTests(MasterTestCase):
+    def test_identical_canon_skips_fuzzy_scan(self):
+        from azcon_match import matcher
+
+        with mock.patch.object(matcher, "_scan", wraps=matcher._scan) as scan:
+            res = matcher.find_matches("Divarların alçipan ilə örtülməsi", "Xidmət", "m2", self.master)
+        scan.assert_not_called()
+        self.assertEqual(res["stats"]["fast_path"], "exact")
+        self.assertEqual(res["hit_ids"], [0, 1])
+        self.assertEqual({sc for _, sc, _, _ in res["hits"]}, {100})
+        self.assertEqual([pr for _, _, pr, _ in res["priced_hits"]], [12.5, 14.0])
+
+    def test_exact_path_respects_unit_and_falls_back_to_fuzzy(self):
+        from azcon_match import matcher
+
+        other_unit = matcher.find_matches("Divarların alçipan ilə örtülməsi", "", "ədəd", self.master)
+        self.assertNotIn("fast_path", other_unit["stats"])
+        self.assertEqual(other_unit["hits"], [])
+
+        fuzzy = matcher.find_matches("Divarlara alçipan vurulması", "Xidmət", "m2", self.master)
+        self.assertNotIn("fast_path", fuzzy["stats"])
+
+    def test_merge_mode_adds_fuzzy_hits_after_exact(self):
+        from azcon_match import matcher
+
+        with mock.patch.object(config, "EXACT_MODE", "merge"):
+            res = matcher.find_matches("Divarların alçipan ilə örtülməsi", "Xidmət", "m2", self.master)
+        self.assertEqual(res["hit_ids"][:2], [0, 1])
+        self.assertEqual(len(res["hit_ids"]), len(set(res["hit_ids"])))  # exact sətirlər təkrarlanmır
+        self.assertGreater(len(res["hit_ids"]), 2)
+
+
+class DiagnosticsTests(MasterTestCase):
+    QUERIES = QUERIES + [
+        ("Divarların boyanması", "", ""),
+        ("Kafel 60x60 sm", "Məhsul", "m2"),
+        ("Qapı taxta", "", ""),
+        ("Plastik boru", "", "m"),
+    ]
+
+    def test_compile_query_uses_given_vocab(self):
+        from azcon_match import numeric, vocab as vocab_mod
+        from azcon_match.query import compile_query
+
+        cq = compile_query("Plastik boru 20 mm", "Məhsul", "m")
+        self.assertEqual(cq.canon, self.master.at[9, "canon"])
+        self.assertEqual(cq.tokens, frozenset(cq.canon.split()))
+        self.assertEqual(cq.nums, tuple(numeric.extract("Plastik boru 20 mm")))
+        self.assertEqual((cq.flag, cq.unit), ("məhsul", "m"))
+        self.assertEqual(cq.vocab_version, vocab_mod.current().version)
+
+        data = {"synonyms": {}, "generic": ["boru"], "critical": ["boru"]}
+        custom = compile_query("Plastik boru 20 mm", vocab=vocab_mod.compile_vocab(data))
+        self.assertEqual(custom.critical, {"boru"})
+        self.assertNotIn("boru", custom.non_generic)
+        self.assertNotEqual(custom.vocab_version, cq.vocab_version)
+
+    def test_compare_uses_query_vocab_critical(self):
+        from azcon_match import diagnostics, vocab as vocab_mod
+        from azcon_match.query import compile_query
+
+        self.assertFalse(diagnostics.compare("Mis boru", "Mis kabel")["critical_mismatch"])
+        v = vocab_mod.compile_vocab({"synonyms": {}, "generic": [], "critical": ["boru"]})
+        res = diagnostics.compare(compile_query("Mis boru", vocab=v), "Mis kabel")
+        self.assertTrue(res["critical_mismatch"])
+        self.assertEqual(res["only_in_a"], {"boru"})
+
+    def verdicts(self, cq):
+        from azcon_match import diagnostics, matcher
+
+        cand = matcher._filter(self.master, cq)
+        rows = [{"text": t, "canon": c, "tokens": tok}
+                for t, c, tok in cand[[config.MASTER_TEXT_COL, "canon", "tokens"]].itertuples(index=False, name=None)]
+        return list(cand.index), diagnostics.explain_many(cq, rows)
+
+    def test_explain_many_agrees_with_matcher(self):
+        from azcon_match import matcher
+        from azcon_match.query import compile_query
+
+        seen = set()
+        for threshold in (0, config.THRESHOLD):
+            with mock.patch.multiple(config, THRESHOLD=threshold, EXACT_FAST_PATH=False, CONFIRMED_LOOKUP=False):
+                for q in self.QUERIES:
+                    cq = compile_query(*q)
+                    ids, verdicts = self.verdicts(cq)
+                    passed = [rid for rid, v in zip(ids, verdicts) if v == "pass"]
+                    self.assertEqual(passed, matcher.find_matches(cq, "", "", self.master, blocking=False)["hit_ids"], q)
+                    seen.update(verdicts)
+        self.assertIn("pass", seen)
+        self.assertGreater(len(seen), 2)  # bir neçə fərqli imtina səbəbi yoxlanılıb
+
+
+class BulkReportTests(MasterTestCase):
+    # son ikisi yalnız aşağı hədlərlə (REPLAY) tapılır
+    QUERIES = DiagnosticsTests.QUERIES + [("Divar alçipan", "", ""), ("Tavan alçipan örtük", "", "")]
+    REPLAY = {"THRESHOLD": 70, "MIN_COVER": 0.3}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from azcon_match import bulk_report
+
+        cls.report = bulk_report.run(cls.QUERIES, cls.master, workers=1)
+
+    def rerun(self, **thresholds) -> list:
+        """Matcher-in özü: tam skan, fast path-lar söndürülüb (funnel yalnız fuzzy yolu sayır)."""
+        from azcon_match import matcher
+
+        with mock.patch.multiple(config, EXACT_FAST_PATH=False, CONFIRMED_LOOKUP=False, **thresholds):
+            return [matcher.find_matches(*q, self.master, blocking=False) for q in self.QUERIES]
+
+    def assert_matches_matcher(self, funnel, results):
+        self.assertEqual(funnel["passed"].tolist(), [len(r["hits"]) for r in results])
+        self.assertEqual(funnel["priced"].tolist(), [len(r["priced_hits"]) for r in results])
+
+    def test_funnel_matches_matcher_at_recorded_thresholds(self):
+        funnel = self.report.funnel()
+        self.assert_matches_matcher(funnel, self.rerun())
+        self.assertGreater(funnel["passed"].sum(), 0)
+        stages = funnel[["generic", "critical", "coverage", "numeric", "threshold", "passed"]].sum(axis=1)
+        self.assertEqual(stages.tolist(), funnel["prefiltered"].tolist())  # hər namizəd bir mərhələdə
+
+    def test_replay_matches_matcher_rerun(self):
+        res = self.report.replay(**self.REPLAY)
+        after = self.rerun(**self.REPLAY)
+        self.assert_matches_matcher(res, after)
+        before = self.rerun()
+        self.assertEqual(int(res["passed_delta"].sum()), sum(len(a["hits"]) - len(b["hits"]) for a, b in zip(after, before)))
+        self.assertNotEqual(int(res["passed_delta"].sum()), 0)  # bu hədlər nəticəni dəyişir
+
+    def test_csv_round_trip_replays_identically(self):
+        from azcon_match import bulk_report
+
+        out = Path(tempfile.mkdtemp(prefix="bulk-", dir=self.tmp))
+        self.report.write(out, fmt="csv")
+        loaded = bulk_report.BulkReport.load(out)
+        self.assertEqual(loaded.meta["thresholds"], self.report.meta["thresholds"])
+        want, got = self.report.replay(**self.REPLAY), loaded.replay(**self.REPLAY)
+        pd.testing.assert_frame_equal(got, want, check_dtype=False)
+
+    def test_unknown_threshold_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.report.replay(TRESHOLD=70)
+
+
+class ExportFormatTests(MasterTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from azcon_match import api, export
+
+        cls.summary, cls.long = [], []
+        for i, (q, flag, unit) in enumerate(QUERIES):
+            res = api.find_matches(q, flag, unit, cls.master)
+            cls.summary.append(export.summary_row(q, res))
+            cls.long.extend(export.long_rows(i, q, flag, unit, res))
+
+    def read(self, fmt: str) -> pd.DataFrame:
+        from azcon_match import export
+
+        path = export.write(self.tmp / f"out.{export.FORMATS[fmt][0]}", fmt, self.summary, self.long)
+        return {
+            "xlsx": pd.read_excel, "csv": pd.read_csv, "parquet": pd.read_parquet, "arrow": pd.read_feather,
+        }[fmt](path)
+
+    def test_long_formats_round_trip_with_types(self):
+        from azcon_match import export
+
+        want = export._long_frame(self.long)
+        self.assertEqual(list(want.columns), export.LONG_COLUMNS)
+        self.assertEqual(set(want["query_id"]), set(range(len(QUERIES))))
+        self.assertIn(0, set(want["rank"]))  # hit-siz sorğu da bir sətir alır
+        for fmt in ("parquet", "arrow"):
+            pd.testing.assert_frame_equal(self.read(fmt), want, obj=fmt)
+
+    def test_csv_round_trips_values(self):
+        from azcon_match import export
+
+        got = self.read("csv")
+        want = export._long_frame(self.long)
+        for col in ("query_flag", "query_unit"):  # CSV-də boş sətir ilə NaN fərqlənmir
+            got[col] = got[col].fillna("")
+        for col in ("text", "unit"):
+            want[col] = want[col].where(want[col].notna(), float("nan"))
+        self.assertEqual(list(got.columns), export.LONG_COLUMNS)
+        pd.testing.assert_frame_equal(got, want, check_dtype=False, obj="csv")
+
+    def test_xlsx_keeps_the_summary_layout(self):
+        got = self.read("xlsx")
+        self.assertEqual(list(got.columns), list(self.summary[0]))
+        self.assertEqual(list(got["Sual"]), [q for q, _, _ in QUERIES])
+
+    def test_unknown_format_is_rejected(self):
+        from azcon_match import export
+
+        with self.assertRaises(ValueError):
+            export.write(self.tmp / "out.txt", "txt", self.summary, self.long)
+
+
+class UploadFormatTests(ViewTestCase):
+    def test_upload_returns_requested_format(self):
+        resp = self.client.post(reverse("upload"), {"excel_file": self.upload(), "format": "parquet"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "application/vnd.apache.parquet")
+        self.assertTrue(resp["Content-Disposition"].endswith("analyzed_sor%C4%9Fu.parquet"))
+        df = pd.read_parquet(io.BytesIO(b"".join(resp.streaming_content)))
+        self.assertEqual(df.loc[df["query_id"] == 2, "row_id"].tolist(), [9])
+
+
+class ShardMergeTests(MasterTestCase):
+    def assertSameResult(self, sharded, single, q):
+        self.assertEqual(sharded["hit_ids"], single["hit_ids"], q)
+        self.assertEqual([h[:2] + h[3:] for h in sharded["hits"]], [h[:2] + h[3:] for h in single["hits"]], q)
+        self.assertEqual(sharded["priced_ids"], single["priced_ids"], q)
+        self.assertEqual(sharded["prices"], single["prices"], q)
+        self.assertEqual(sharded["stats"].get("fast_path"), single["stats"].get("fast_path"), q)
+
+    def test_local_shards_merge_to_single_process_results(self):
+        from azcon_match import matcher, sharding
+
+        for n in (1, 3, 5):
+            coord = sharding.local(self.master, n)
+            self.addCleanup(coord.close)
+            for q in BlockingTests.QUERIES:
+                res = coord.find_matches(*q)
+                self.assertFalse(res["stats"]["partial"])
+                self.assertSameResult(res, matcher.find_matches(*q, self.master), (n, q))
+
+    def test_remote_shards_merge_to_single_process_results(self):
+        import threading
+
+        from azcon_match import matcher, sharding
+
+        shards = []
+        for i, part in enumerate(sharding.partition(self.master, 2)):
+            srv = sharding.ShardServer(part, name=str(i))
+            threading.Thread(target=srv.serve_forever, daemon=True).start()
+            self.addCleanup(srv.server_close)
+            self.addCleanup(srv.shutdown)
+            shards.append(sharding.RemoteShard("127.0.0.1", srv.port, name=f"shard{i}"))
+        coord = sharding.Coordinator(shards)
+        self.addCleanup(coord.close)
+        for q in QUERIES:
+            self.assertSameResult(coord.find_matches(*q), matcher.find_matches(*q, self.master), q)
+
+    def test_failed_shard_marks_result_partial(self):
+        from azcon_match import sharding
+
+        coord = sharding.local(self.master, 3)
+        self.addCleanup(coord.close)
+        full = coord.find_matches("plastik", "", "")
+        with mock.patch.object(coord.shards[2], "match", side_effect=ConnectionError("down")):
+            res = coord.find_matches("plastik", "", "")
+        self.assertTrue(res["stats"]["partial"])
+        self.assertEqual([s["status"] for s in res["stats"]["shards"]], ["ok", "ok", "error"])
+        lost = set(coord.shards[2].df.index)
+        self.assertTrue(res["hit_ids"])
+        self.assertTrue(lost & set(full["hit_ids"]))
+        self.assertEqual(res["hit_ids"], [rid for rid in full["hit_ids"] if rid not in lost])
+
+
+class MasterLoadTests(ViewTestCase):
+    def test_concurrent_requests_share_one_load(self):
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        from azcon_match import api as match_api
+
+        gate, calls = threading.Event(), []
+        real = match_api.load_master
+
+        def slow_load(**kw):
+            calls.append(kw)
+            gate.wait(5)
+            return real(**kw)
+
+        with mock.patch.object(match_api, "load_master", side_effect=slow_load):
+            with ThreadPoolExecutor(4) as pool:
+                futs = [pool.submit(masters.load) for _ in range(4)]
+                while not calls:
+                    threading.Event().wait(0.01)
+                gate.set()
+                dfs = [f.result(timeout=10) for f in futs]
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(df is dfs[0] for df in dfs))
+
+    def test_loading_one_master_does_not_block_another(self):
+        import threading
+
+        from azcon_match import api as match_api
+
+        other = write_master(self.tmp / "other.xlsx", MASTER_ROWS[:5])
+        ready = masters._get_master(other)  # keşdə hazırdır
+        gate, started, hits = threading.Event(), threading.Event(), []
+        real = match_api.load_master
+
+        def slow_load(**kw):
+            started.set()
+            gate.wait(5)
+            return real(**kw)
+
+        with mock.patch.object(match_api, "load_master", side_effect=slow_load):
+            loader = threading.Thread(target=masters.load)
+            loader.start()
+            self.addCleanup(loader.join, 10)
+            self.addCleanup(gate.set)
+            self.assertTrue(started.wait(5))
+            probe = threading.Thread(target=lambda: hits.append(masters._get_master(other)), daemon=True)
+            probe.start()
+            probe.join(1)
+            self.assertEqual(hits, [ready])  # yükləmə gedərkən kilid tutulmur
+        gate.set()
+
+
+class UploadCacheTests(ViewTestCase):
+    def post(self, **extra):
+        with mock.patch.object(views, "_match_rows", wraps=views._match_rows) as match:
+            resp = self.client.post(reverse("upload"), {"excel_file": self.upload(), **extra})
+        self.assertEqual(resp.status_code, 200)
+        return b"".join(resp.streaming_content), match.called
+
+    def files(self, kind: str) -> list:
+        from . import upload_cache
+
+        d = {"uploads": upload_cache.uploads_dir(), "outputs": upload_cache.outputs_dir()}[kind]
+        return sorted(p.name for p in d.iterdir()) if d.is_dir() else []
+
+    def test_same_upload_reuses_stored_file_and_output(self):
+        first, computed = self.post()
+        self.assertTrue(computed)
+        again, computed = self.post()
+        self.assertFalse(computed)
+        self.assertEqual(again, first)
+        self.assertEqual(len(self.files("uploads")), 1)
+        self.assertEqual(len(self.files("outputs")), 1)
+
+        _, computed = self.post(format="csv")  # başqa format – başqa açar
+        self.assertTrue(computed)
+        self.assertEqual(len(self.files("outputs")), 2)
+
+    def test_new_confirmation_invalidates_output(self):
+        from .confirmed import confirm
+
+        self.post()
+        confirm("Plastik boru 20 mm", "Məhsul", "m", [10], masters.load())
+        body, computed = self.post()
+        self.assertTrue(computed)
+        df = pd.read_excel(io.BytesIO(body))
+        self.assertEqual(df.loc[2, "Qiymət"], 2.1)  # təsdiqlənmiş sətir (32 mm)
+
+    def test_eviction_by_size_and_age(self):
+        import time
+
+        from . import upload_cache
+
+        self.post()
+        stats = upload_cache.evict(max_bytes=10**9, max_age=3600)
+        self.assertEqual(stats["removed"], 0)
+        stats = upload_cache.evict(max_bytes=10**9, max_age=3600, now=time.time() + 7200)
+        self.assertEqual(stats["removed"], 2)
+        self.assertEqual(self.files("uploads") + self.files("outputs"), [])
+
+        self.post()
+        _, computed = self.post()
+        self.assertFalse(computed)
+        stats = upload_cache.evict(max_bytes=0, max_age=3600)
+        self.assertEqual((stats["removed"], stats["remaining"]), (2, 0))
+        _, computed = self.post()
+        self.assertTrue(computed)
+
+    def test_size_limit_evicts_least_recently_used_first(self):
+        import os
+        import time
+
+        from . import upload_cache
+
+        self.post()
+        old_output = upload_cache.outputs_dir() / self.files("outputs")[0]
+        upload_cache.save("b" * 64, "csv", lambda path: path.write_bytes(b"x" * 100))
+        past = time.time() - 60
+        for path in (*upload_cache.uploads_dir().iterdir(), old_output):
+            os.utime(path, (past, past))
+        stats = upload_cache.evict(max_bytes=100, max_age=3600)
+        self.assertEqual(stats["remaining"], 100)
+        self.assertEqual(self.files("outputs"), ["b" * 64 + ".csv"])
+
+
+class SharedMasterTests(VocabReloadMixin, MasterTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp(prefix="shared-", dir=self.tmp))
+        self.source = self.tmp / "m.xlsx"
+
+    def publish(self):
+        from azcon_match import shared_master
+
+        return shared_master.ensure_published(self.source, self.dir / "m.arrow")
+
+    def assertSameMatches(self, shared):
+        from azcon_match import matcher
+
+        for q in BlockingTests.QUERIES:
+            for blocking in (True, False):
+                a = matcher.find_matches(*q, self.master, blocking=blocking)
+                b = matcher.find_matches(*q, shared, blocking=blocking)
+                self.assertEqual(b["hit_ids"], a["hit_ids"], q)
+                self.assertEqual([h[1] for h in b["hits"]], [h[1] for h in a["hits"]], q)
+                self.assertEqual(b["stats"].get("block"), a["stats"].get("block"), q)
+
+    def test_attach_is_equivalent_to_load_master(self):
+        from azcon_match import index as master_index, shared_master, tokens
+
+        shared = shared_master.attach(self.publish())
+        self.assertEqual(list(shared.index), list(self.master.index))
+        for col in (config.MASTER_TEXT_COL, config.UNIT_COL, "canon"):
+            self.assertEqual(list(shared[col]), list(self.master[col]), col)
+        # tokens və index mmap-dən oxunur – worker-də Python obyektləri qurulmur
+        self.assertTrue(tokens.is_encoded(shared["tokens"]))
+        self.assertEqual(list(tokens.decode(shared["tokens"])), [frozenset(t) for t in self.master["tokens"]])
+        idx = master_index.get(shared)
+        self.assertIsInstance(idx, shared_master.SharedIndex)
+        norm = lambda i: sorted((b, repr(k), p.tolist()) for b, k, p in i.entries())
+        self.assertEqual(norm(idx), norm(master_index.get(self.master)))
+        self.assertSameMatches(shared)
+
+    def test_refresh_of_shared_master_matches_in_process_refresh(self):
+        from azcon_match import data_loader, shared_master
+
+        shared = shared_master.attach(self.publish())
+        self.reload_vocab(boru="truba")
+        a, b = data_loader.refresh_master(self.master), data_loader.refresh_master(shared)
+        self.assertEqual(list(b["canon"]), list(a["canon"]))
+        self.assertEqual(list(b["tokens"]), [frozenset(t) for t in a["tokens"]])
+
+    def test_source_or_vocab_change_republishes(self):
+        import os
+
+        from azcon_match import shared_master
+
+        path = self.publish()
+        created = shared_master.read_meta(path)["created"]
+        self.assertTrue(shared_master.is_fresh(path, self.source))
+        self.assertEqual(shared_master.read_meta(self.publish())["created"], created)  # təkrar yazılmır
+
+        st = os.stat(self.source)
+        os.utime(self.source, (st.st_atime, st.st_mtime + 10))
+        self.addCleanup(os.utime, self.source, (st.st_atime, st.st_mtime))
+        self.assertFalse(shared_master.is_fresh(path, self.source))
+        self.assertNotEqual(shared_master.read_meta(self.publish())["created"], created)
+        self.assertTrue(shared_master.is_fresh(path, self.source))
+
+        self.reload_vocab(boru="truba")
+        self.assertFalse(shared_master.is_fresh(path, self.source))
+
+    def test_missing_or_stale_sidecar_falls_back_to_local_index(self):
+        from azcon_match import index as master_index, shared_master
+
+        path = self.publish()
+        sidecar = shared_master.index_path(path)
+        shared_master.publish_index(master_index.get(self.master), sidecar, stamp=0.0)  # başqa publish-ə aid
+        stale = shared_master.attach(path)
+        self.assertIsInstance(master_index.get(stale), master_index.MasterIndex)
+
+        sidecar.unlink()
+        shared = shared_master.attach(path)
+        self.assertIsInstance(master_index.get(shared), master_index.MasterIndex)
+        self.assertSameMatches(shared)
+
+
+class CatalogRefreshTests(VocabReloadMixin, TestCase):
+    def setUp(self):
+        from azcon_match import catalog
+
+        self.tmp = Path(tempfile.mkdtemp(prefix="azcon-cat-"))
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        path = write_master(self.tmp / "a.xlsx")
+        self.registry = catalog.CatalogRegistry(sources=lambda: {"a": path})
+
+    def test_vocab_refresh_runs_outside_lock_and_updates_footprint(self):
+        from azcon_match import catalog, data_loader, index as master_index
+
+        old = self.registry.get("a")
+        self.reload_vocab(boru="truba")
+
+        locked_during_refresh = []
+        real_refresh = data_loader.refresh_master
+
+        def refresh(df, *a, **kw):
+            free = self.registry._lock.acquire(blocking=False)
+            if free:
+                self.registry._lock.release()
+            locked_during_refresh.append(not free)
+            return real_refresh(df, *a, **kw)
+
+        with mock.patch.object(data_loader, "refresh_master", side_effect=refresh):
+            new = self.registry.get("a")
+            again = self.registry.get("a")
+
+        self.assertEqual(locked_during_refresh, [False])   # bir dəfə və kilidsiz
+        self.assertIsNot(new, old)
+        self.assertIs(again, new)
+        self.assertEqual(new.attrs["catalog"], "a")
+        self.assertIn(id(new), master_index._INDEXES)      # index artıq qurulub
+        self.assertEqual(self.registry.stats()["a"]["bytes"], catalog.footprint(new))
+        self.assertEqual(sum("truba" in t for t in new["tokens"]), 2)
+
+
+class ConfirmPermissionTests(ViewTestCase):
+    def post_confirm(self):
+        return self.client.post(reverse("confirm"), {"q": "Plastik boru 20 mm", "flag": "Məhsul", "unit": "m", "row_ids": "9"})
+
+    def make_user(self, *perms):
+        from django.contrib.auth.models import Permission, User
+
+        user = User.objects.create_user("operator", password="x")
+        user.user_permissions.add(*Permission.objects.filter(content_type__app_label="analyzer", codename__in=perms))
+        self.client.force_login(user)
+        return user
+
+    def test_anonymous_is_redirected_to_login(self):
+        from .models import ConfirmedMatch
+
+        resp = self.post_confirm()
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn(reverse("admin:login"), resp["Location"])
+        self.assertFalse(ConfirmedMatch.objects.exists())
+
+    def test_user_without_permission_is_forbidden(self):
+        from .models import ConfirmedMatch
+
+        self.make_user()
+        self.assertEqual(self.post_confirm().status_code, 403)
+        self.assertFalse(ConfirmedMatch.objects.exists())
+
+    def test_permitted_user_is_recorded(self):
+        from .models import ConfirmedMatch
+
+        self.make_user("add_confirmedmatch", "change_confirmedmatch")
+        with self.assertLogs("analyzer.views", "INFO") as logs:
+            resp = self.post_confirm()
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual(ConfirmedMatch.objects.get().confirmed_by, "operator")
+        self.assertIn("by operator", logs.output[0])
+
+
+class ConfirmedMatchTests(MasterTestCase):
+    QUERY = ("Plastik borular", "Məhsul", "m")
+
+    def test_confirmation_overrides_fuzzy_hits_with_current_prices(self):
+        from azcon_match import matcher
+
+        from .confirmed import confirm
+
+        before = matcher.find_matches(*self.QUERY, self.master)
+        self.assertNotEqual(before["stats"].get("fast_path"), "confirmed")
+
+        confirm(*self.QUERY, [10], self.master, confirmed_by="operator")
+        repriced = self.master.copy()
+        repriced.at[10, config.PRICE_COL] = 2.5  # qiymət dəyişməsi təsdiqi pozmur
+        res = matcher.find_matches(*self.QUERY, repriced)
+        self.assertEqual(res["stats"]["fast_path"], "confirmed")
+        self.assertEqual(res["hit_ids"], [10])
+        self.assertEqual(res["priced_hits"], [("Plastik boru 32 mm", 100, 2.5, "m")])
+
+    def test_changed_master_row_invalidates_confirmation(self):
+        from azcon_match import matcher
+
+        from .confirmed import confirm, flush_invalid
+        from .models import ConfirmedMatch
+
+        confirm(*self.QUERY, [10], self.master)
+        changed = self.master.copy()
+        changed.at[10, config.MASTER_TEXT_COL] = "Plastik boru 40 mm"
+        with self.assertNumQueries(1):  # snapshot oxunur; matç yolunda UPDATE yoxdur
+            res = matcher.find_matches(*self.QUERY, changed)
+        self.assertNotEqual(res["stats"].get("fast_path"), "confirmed")
+        self.assertTrue(ConfirmedMatch.objects.get().valid)
+        self.assertEqual(flush_invalid(), 1)  # upload / sorğu bitəndən sonra
+        obj = ConfirmedMatch.objects.get()
+        self.assertFalse(obj.valid)
+        self.assertIsNotNone(obj.invalidated_at)
+
+        # köhnə master-də də artıq istifadə olunmur – yenidən təsdiq lazımdır
+        self.assertNotEqual(matcher.find_matches(*self.QUERY, self.master)["stats"].get("fast_path"), "confirmed")
+        confirm(*self.QUERY, [10], changed)
+        self.assertEqual(matcher.find_matches(*self.QUERY, changed)["stats"]["fast_path"], "confirmed")
+
+    def test_lookup_reads_catalog_once_per_master(self):
+        from azcon_match import matcher
+
+        from .confirmed import confirm, prefetch
+
+        confirm(*self.QUERY, [10], self.master)
+        prefetch(self.master)
+        with self.assertNumQueries(0):
+            for q in (self.QUERY, ("Mis kabel 3x4 mm2", "Məhsul", "m"), self.QUERY):
+                matcher.find_matches(*q, self.master)
+            self.assertEqual(matcher.find_matches(*self.QUERY, self.master)["hit_ids"], [10])
+
+    def test_upload_invalidates_stale_confirmation_after_matching(self):
+        from .confirmed import confirm
+        from .models import ConfirmedMatch
+
+        confirm(*self.QUERY, [10], self.master)
+        changed = self.master.copy()
+        changed.at[10, config.MASTER_TEXT_COL] = "Plastik boru 40 mm"
+        results, _ = views._match_rows([self.QUERY] * 3, changed)
+        self.assertEqual(len(results), 3)
+        self.assertFalse(ConfirmedMatch.objects.get().valid)
+
+    def test_unknown_row_ids_are_rejected(self):
+        from .confirmed import confirm
+
+        with self.assertRaises(ValueError):
+            confirm(*self.QUERY, [len(self.master)], self.master)
+
+
+class ShardedConfirmTests(ViewTestCase):
+    def setUp(self):
+        super().setUp()
+        from azcon_match import data_loader, sharding
+
+        self.master = data_loader.load_master(str(self.master_path))
+        self.coord = sharding.local(self.master, 3)
+        self.addCleanup(self.coord.close)
+        for p in (override_settings(AZCON_SHARDS=["local"]),):
+            p.enable()
+            self.addCleanup(p.disable)
+        patcher = mock.patch.object(masters, "_get_coordinator", return_value=self.coord)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        from django.contrib.auth.models import User
+
+        self.client.force_login(User.objects.create_superuser("admin", password="x"))
+
+    def test_confirm_and_lookup_across_shards(self):
+        from azcon_match import api
+
+        ids = [0, 17]  # ilk və son shard-da
+        resp = self.client.post(reverse("confirm"), {"q": "bahalı kafel", "row_ids": "0,17"})
+        self.assertEqual(resp.status_code, 200, resp.content)
+
+        res = api.find_matches("bahalı kafel", "", "", self.coord)
+        self.assertEqual(res["stats"]["fast_path"], "confirmed")
+        self.assertEqual([h[0] for h in res["priced_hits"]], [MASTER_ROWS[i][0] for i in ids])
+        self.assertEqual(res["priced_ids"], ids)
+
+    def test_unavailable_shard_does_not_crash_or_invalidate(self):
+        from azcon_match import api
+
+        from .models import ConfirmedMatch
+
+        self.client.post(reverse("confirm"), {"q": "bahalı kafel", "row_ids": "0,17"})
+        with mock.patch.object(self.coord.shards[2], "match", side_effect=ConnectionError("down")):
+            res = api.find_matches("bahalı kafel", "", "", self.coord)
+            resp = self.client.post(reverse("confirm"), {"q": "başqa sorğu", "row_ids": "17"})
+        self.assertNotEqual(res["stats"].get("fast_path"), "confirmed")
+        self.assertEqual(resp.status_code, 503)
+        self.assertTrue(ConfirmedMatch.objects.get(canon__contains="kafel").valid)
+
+
+class ConfirmedImportTests(ViewTestCase):
+    def run_import(self, text: str, *args):
+        from django.core.management import call_command
+
+        path = self.tmp / "import.csv"
+        path.write_text(text, encoding="utf-8")
+        out = io.StringIO()
+        call_command("confirmed_import", str(path), *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_rows_are_fingerprinted_against_resolved_master(self):
+        from .models import ConfirmedMatch
+
+        out = self.run_import("query,flag,unit,row_ids\nPlastik borular,Məhsul,m,10\n")
+        self.assertIn("İdxal: 1", out)
+        obj = ConfirmedMatch.objects.get()
+        self.assertEqual(obj.row_ids, [10])
+        self.assertEqual(obj.confirmed_by, "import")
+
+    def test_unknown_catalog_is_reported_per_row(self):
+        from .models import ConfirmedMatch
+
+        out = self.run_import("query,flag,unit,row_ids\nPlastik borular,Məhsul,m,10\n", "--catalog", "yoxdur")
+        self.assertIn("ötürüldü: 1", out)
+        self.assertFalse(ConfirmedMatch.objects.exists())
+
+
+class OutputKeyTests(MasterTestCase):
+    def key(self, master=None):
+        from .upload_cache import output_key
+
+        return output_key("a" * 64, self.master if master is None else master, "xlsx")
+
+    def test_matcher_settings_change_key(self):
+        base = self.key()
+        self.assertEqual(self.key(), base)
+        for name, value in (("THRESHOLD", 70), ("MIN_COVER", 0.4), ("EXACT_MODE", "merge"), ("CONFIRMED_LOOKUP", False)):
+            with mock.patch.object(config, name, value):
+                self.assertNotEqual(self.key(), base, name)
+
+    def test_sharded_key_follows_shard_sources(self):
+        from azcon_match import sharding
+
+        coord = sharding.local(self.master, 2)
+        self.addCleanup(coord.close)
+        base = self.key(coord)
+        self.assertEqual(self.key(coord), base)
+        shard_df = coord.shards[1].df
+        shard_df.attrs["source"] = {**shard_df.attrs["source"], "source_mtime": 1.0}  # shard master yenidən yüklənib
+        self.assertNotEqual(self.key(coord), base)
+
+    def test_unavailable_shard_key_is_never_reused(self):
+        from azcon_match import sharding
+
+        coord = sharding.local(self.master, 2)
+        self.addCleanup(coord.close)
+        with mock.patch.object(coord.shards[0], "match", side_effect=ConnectionError("down")):
+            self.assertNotEqual(self.key(coord), self.key(coord))
@@ -0,0 +1,226 @@
+# analyzer/upload_cache.py
+# Content-addressed upload-lar və nəticə keşi.
+#   MEDIA_ROOT/uploads/<sha256>.<ext>  – eyni məzmun bir dəfə saxlanılır
+#   MEDIA_ROOT/outputs/<açar>.<ext>    – açar = sha256(upload + master + vocab + format + kataloq + təsdiqlər
+#                                        + matcher ayarları)
+# Hər iki qovluq ölçü və yaş limiti ilə təmizlənir (ən köhnə istifadə olunan əvvəl silinir).
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from django.conf import settings
+
+from azcon_match import config, metrics, vocab as vocab_mod
+
+logger = logging.getLogger(__name__)
+
+KEY_RE = re.compile(r"^[0-9a-f]{64}\.[a-z]+$")
+CHUNK = 1 << 20
+
+def _root() -> Path:
+    return Path(settings.MEDIA_ROOT)
+
+def uploads_dir() -> Path:
+    return _root() / "uploads"
+
+def outputs_dir() -> Path:
+    return _root() / "outputs"
+
+# ---------------------------------------------------------
+# Upload-lar
+# ---------------------------------------------------------
+def store_upload(up) -> tuple[str, Path, str]:
+    """
+    Upload-u hash-ləyərək saxlayır: (orijinal ad, fayl yolu, sha256).
+    Eyni məzmun artıq varsa yenidən yazılmır, yalnız mtime yenilənir (LRU).
+    """
+    name = os.path.basename(up.name or "upload.xlsx")
+    ext = (Path(name).suffix.lower() or ".xlsx")[:8]
+    d = uploads_dir()
+    d.mkdir(parents=True, exist_ok=True)
+    h = hashlib.sha256()
+    tmp = d / f".{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as fh:
+        for chunk in up.chunks(CHUNK):
+            h.update(chunk)
+            fh.write(chunk)
+    digest = h.hexdigest()
+    path = d / f"{digest}{ext}"
+    if path.exists():
+        tmp.unlink()
+        _touch(path)
+    else:
+        os.replace(tmp, path)
+        maybe_evict()
+    return name, path, digest
+
+# ---------------------------------------------------------
+# Nəticə açarı
+# ---------------------------------------------------------
+# Nəticəyə təsir edən matcher ayarları – dəyişəndə köhnə nəticələr istifadə olunmur
+MATCHER_SETTINGS = (
+    "THRESHOLD", "MIN_COVER", "PRICE_AVG_MIN_SCORE", "TOP_N",
+    "EXACT_FAST_PATH", "EXACT_MODE", "BLOCKING", "BLOCKING_HEAD", "CONFIRMED_LOOKUP",
+)
+
+def matcher_settings() -> dict:
+    return {name: getattr(config, name, None) for name in MATCHER_SETTINGS}
+
+def master_key(master_df) -> dict:
+    """
+    Master-in kimliyi: mənbə faylı + mtime/ölçü + vocab versiyası. Sharded rejimdə
+    hər shard-ın öz kimliyi (mənbə, hissə, vocab) – shard yenidən yüklənəndə açar dəyişir.
+    Shard cavab vermirsə sharding.ShardUnavailable.
+    """
+    if getattr(master_df, "is_sharded", False):
+        return {"shards": [{**info, "addr": s.name} for s, info in zip(master_df.shards, master_df.identity())]}
+    attrs = getattr(master_df, "attrs", {}) or {}
+    return {
+        "source": attrs.get("source"),
+        "rows": len(master_df),
+        "vocab": attrs.get("vocab_version") or vocab_mod.current().version,
+    }
+
+def _confirmed_generation() -> str:
+    """Təsdiqlənmiş matçlar dəyişəndə (yeni/yenilənmiş/etibarsız) nəticə də dəyişir."""
+    from django.db.models import Count, Max
+
+    from .models import ConfirmedMatch
+
+    try:
+        agg = ConfirmedMatch.objects.aggregate(n=Count("pk"), u=Max("updated_at"), i=Max("invalidated_at"))
+    except Exception:  # cədvəl hələ migrate olunmayıb
+        return ""
+    return f"{agg['n']}:{agg['u']}:{agg['i']}"
+
+def output_key(upload_sha: str, master_df, fmt: str, catalog: str = "") -> str:
+    """
+    Nəticənin açarı. Master-in kimliyi müəyyən edilə bilmirsə (shard cavab vermir)
+    təsadüfi açar qaytarılır: keşdə tapılmır və nəticə başqa upload-a verilmir.
+    """
+    from azcon_match.sharding import ShardUnavailable
+
+    try:
+        master = master_key(master_df)
+    except ShardUnavailable as e:
+        logger.warning("master kimliyi alınmadı, nəticə keşlənmir: %s", e)
+        return secrets.token_hex(32)
+    payload = {
+        "upload": upload_sha,
+        "master": master,
+        "format": fmt,
+        "catalog": catalog,
+        "confirmed": _confirmed_generation(),
+        "settings": matcher_settings(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+# ---------------------------------------------------------
+# Nəticələr
+# ---------------------------------------------------------
+def output_path(key: str, ext: str) -> Path:
+    return outputs_dir() / f"{key}.{ext}"
+
+def lookup(key: str, ext: str) -> Optional[Path]:
+    path = output_path(key, ext)
+    hit = path.is_file()
+    metrics.cache("upload_output", hit)
+    if hit:
+        _touch(path)
+        return path
+    return None
+
+def save(key: str, ext: str, writer: Callable[[Path], object]) -> Path:
+    """writer(tmp_path) faylı yazır; sonra atomik olaraq açar adına köçürülür."""
+    d = outputs_dir()
+    d.mkdir(parents=True, exist_ok=True)
+    path = output_path(key, ext)
+    tmp = d / f".{key}.{os.getpid()}.{threading.get_ident()}.{ext}"  # uzantı qalır – pandas engine-i ona görə seçir
+    try:
+        writer(tmp)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    maybe_evict()
+    return path
+
+def resolve(name: str) -> Optional[Path]:
+    """download üçün: yalnız outputs/<açar>.<ext> (qovluqdan kənara çıxmaq mümkün deyil)."""
+    name = os.path.basename(name)
+    if not KEY_RE.match(name):
+        return None
+    path = outputs_dir() / name
+    return path if path.is_file() else None
+
+# ---------------------------------------------------------
+# Təmizləmə
+# ---------------------------------------------------------
+def _touch(path: Path) -> None:
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+_last_evict = 0.0
+_evict_lock = threading.Lock()
+
+def maybe_evict(min_interval: float = 60.0) -> None:
+    """Hər yazıda qovluğu skan etməmək üçün prosesdə ən çox min_interval-da bir dəfə."""
+    global _last_evict
+    if time.monotonic() - _last_evict < min_interval or not _evict_lock.acquire(blocking=False):
+        return
+    try:
+        _last_evict = time.monotonic()
+        evict()
+    except Exception as e:
+        logger.warning("upload keşi təmizlənmədi: %s", e)
+    finally:
+        _evict_lock.release()
+
+def evict(max_bytes: Optional[int] = None, max_age: Optional[float] = None, now: Optional[float] = None) -> dict:
+    """
+    uploads/ və outputs/: max_age-dən köhnə fayllar silinir, sonra cəm ölçü
+    max_bytes-dan böyükdürsə ən köhnə (mtime – son istifadə) fayllar silinir.
+    """
+    max_bytes = max_bytes if max_bytes is not None else int(getattr(settings, "AZCON_UPLOAD_CACHE_MB", 1024)) << 20
+    max_age = max_age if max_age is not None else float(getattr(settings, "AZCON_UPLOAD_CACHE_DAYS", 7)) * 86400
+    now = now or time.time()
+
+    files = []
+    for d in (uploads_dir(), outputs_dir()):
+        if not d.is_dir():
+            continue
+        for entry in os.scandir(d):
+            if entry.is_file():
+                st = entry.stat()
+                files.append((st.st_mtime, st.st_size, Path(entry.path)))
+    files.sort()
+
+    removed = freed = 0
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in files:
+        tmp = path.name.startswith(".")
+        # yarımçıq tmp faylları (.<...>) yalnız yaşa görə silinir – yazılma ərəfəsində ola bilər
+        expired = now - mtime > (min(max_age, 3600) if tmp else max_age)
+        if not expired and (total <= max_bytes or tmp):
+            continue
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+        freed += size
+    if removed:
+        logger.info("upload keşi: %d fayl silindi (%.1f MB)", removed, freed / 2**20)
+    return {"removed": removed, "freed": freed, "remaining": total}
@@ -3,4 +3,8 @@ from . import views
 
 urlpatterns = [
     path('', views.upload_file, name='upload'),
+    path('upload/stream/', views.upload_stream, name='upload_stream'),
+    path('match/', views.match_query, name='match'),
+    path('confirm/', views.confirm_match, name='confirm'),
+    path('download/<str:name>', views.download, name='download'),
 ]
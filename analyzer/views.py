@@ -58,109 +58,333 @@
 #     return render(request, 'analyzer/upload.html')
 
 
+
 # analyzer/views.py
 # analyzer/views.py
 from __future__ import annotations
 
 from django.shortcuts import render
-from django.http import FileResponse, HttpResponse
-from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse, Http404
 from django.conf import settings
+from django.contrib.auth.decorators import login_required, permission_required
+from django.core.handlers.asgi import ASGIRequest
+from django.urls import reverse
+from asgiref.sync import sync_to_async
 
 from pathlib import Path
-import pandas as pd
+from urllib.parse import urlencode
+import json
+import logging
 import os
+import time
 
 from azcon_match import api as match_api
 from azcon_match import config  # sütun adları üçün
+from azcon_match import export
+from azcon_match import metrics
+from azcon_match import confirmed as confirmed_hook
+
+from . import confirmed, jobs, masters, profiling, upload_cache
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------
+# Upload mərhələləri (sync və async view-lar ortaq istifadə edir).
+# profiling.stage burada dekoratordur – hər iki yol eyni mərhələ statistikasına düşür.
+# ---------------------------------------------------------
+class UploadError(Exception):
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+@profiling.stage("save")
+def _save_upload(up) -> tuple[str, Path, str]:
+    """Content-addressed saxlama: (orijinal ad, fayl yolu, sha256). Eyni fayl ikinci dəfə yazılmır."""
+    return upload_cache.store_upload(up)
+
+# Çox prosesli deploy-da /metrics bütün worker-lərin cəmini versin
+metrics.configure_multiprocess(
+    getattr(settings, "AZCON_METRICS_DIR", None),
+    interval=getattr(settings, "AZCON_METRICS_INTERVAL", 5.0),
+)
+
+def _catalog_name(request) -> str:
+    """?catalog=<ad> (POST və ya GET); boş → default master."""
+    return (request.POST.get("catalog") or request.GET.get("catalog") or "").strip()
+
+@profiling.stage("master")
+def _load_master_or_fail(catalog_name: str = ""):
+    try:
+        return masters.load(catalog_name)
+    except masters.MasterUnavailable as e:
+        raise UploadError(str(e), e.status) from e
+
+@profiling.stage("parse")
+def _read_queries(filepath: Path) -> list[tuple[str, str, str]]:
+    import pandas as pd  # ağır import – yalnız lazım olanda
+
+    try:
+        query_df = pd.read_excel(filepath)
+    except Exception as e:
+        raise UploadError(f"Query Excel oxunmadı: {e}", 400) from e
+
+    rows = []
+    for _, row in query_df.iterrows():
+        q_raw  = row.get(config.QUERY_TEXT_COL, "")
+        q_flag = row.get(config.QUERY_FLAG_COL, "")
+        q_unit = row.get(config.UNIT_COL, "")
+
+        # Mütləq string-ləşdir
+        q_raw  = "" if pd.isna(q_raw)  else str(q_raw)
+        q_flag = "" if pd.isna(q_flag) else str(q_flag)
+        q_unit = "" if pd.isna(q_unit) else str(q_unit)
+        rows.append((q_raw, q_flag, q_unit))
+    return rows
 
-def _resolve_master_path() -> Path | None:
+@profiling.stage("match")
+def _match_rows(rows, master_df, progress=None, every: int = 25) -> tuple[list[dict], list[dict]]:
+    """(Excel xülasə sətirləri, long cədvəl sətirləri) – hər sorğu bir dəfə matçlanır."""
+    results: list[dict] = []
+    long: list[dict] = []
+    total = len(rows)
+    t0 = time.perf_counter()
+    if confirmed_hook.active():
+        confirmed.prefetch(master_df)  # təsdiqlər upload başına bir sorğu ilə
+    for i, (q_raw, q_flag, q_unit) in enumerate(rows, 1):
+        # API həmişə dict qaytarmalıdır; ehtiyat üçün guard
+        res = match_api.find_matches(q_raw, q_flag, q_unit, master_df) or {}
+        results.append(export.summary_row(q_raw, res))
+        long.extend(export.long_rows(i - 1, q_raw, q_flag, q_unit, res))
+        if progress and (i % every == 0 or i == total):
+            progress(i, total)
+    elapsed = time.perf_counter() - t0
+    confirmed.flush_invalid()
+    metrics.UPLOAD_ROWS.inc(total)
+    metrics.UPLOAD_SECONDS.observe(elapsed)
+    if total and elapsed > 0:
+        metrics.UPLOAD_ROWS_PER_SECOND.set(total / elapsed)
+    return results, long
+
+def _output_format(request) -> str:
+    fmt = (request.POST.get("format") or request.GET.get("format") or export.DEFAULT_FORMAT).lower()
+    return fmt if fmt in export.FORMATS else export.DEFAULT_FORMAT
+
+def _cached_output(digest: str, master_df, filename: str, fmt: str, catalog_name: str = "") -> tuple[str, str, Path | None]:
     """
-    Master faylını tapmaq üçün prioritet:
-      1) BASE_DIR / data / master_db.xlsx
-      2) BASE_DIR / master_db.xlsx
-      3) config.MASTER_PATH (əgər mövcuddursa və fayl varsa)
+    (açar, istifadəçiyə veriləcək ad, hazır nəticə faylı və ya None).
+    Açar upload məzmunu + master + vocab + format + kataloq + təsdiqlər + matcher ayarlarından asılıdır.
     """
-    candidates: list[Path] = [
-        Path(settings.BASE_DIR) / "data" / "master_db.xlsx",
-        Path(settings.BASE_DIR) / "master_db.xlsx",
-    ]
-    for p in candidates:
-        if p.exists():
-            return p
+    key = upload_cache.output_key(digest, master_df, fmt, catalog_name)
+    out_name = export.output_name(os.path.basename(filename), fmt)
+    return key, out_name, upload_cache.lookup(key, export.FORMATS[fmt][0])
 
-    legacy = getattr(config, "MASTER_PATH", None)
-    if legacy and Path(legacy).exists():
-        return Path(legacy)
+@profiling.stage("write")
+def _write_output(results: list[dict], long: list[dict], key: str, fmt: str = export.DEFAULT_FORMAT) -> Path:
+    return upload_cache.save(key, export.FORMATS[fmt][0], lambda path: export.write(path, fmt, results, long))
 
-    return None
+def _download_url(key: str, fmt: str, out_name: str) -> str:
+    return reverse("download", args=[f"{key}.{export.FORMATS[fmt][0]}"]) + "?" + urlencode({"filename": out_name})
 
+def _output_response(out_name: str, out_path: Path) -> FileResponse:
+    return FileResponse(
+        open(out_path, "rb"),
+        as_attachment=True,
+        filename=out_name,
+        content_type=export.content_type(out_name),
+    )
+
+# ---------------------------------------------------------
+# Sync view (WSGI / adi form göndərişi)
+# ---------------------------------------------------------
 def upload_file(request):
     if request.method == 'POST' and request.FILES.get('excel_file'):
-        # 1) Faylı saxla
-        up = request.FILES['excel_file']
-        fs = FileSystemStorage()
-        filename = fs.save(up.name, up)
-        filepath = Path(fs.path(filename))
-
-        # 2) Master-i tap və yüklə (MEDIA deyil!)
-        master_path = _resolve_master_path()
-        if not master_path:
-            return HttpResponse(
-                "Master faylı tapılmadı. Zəhmət olmasa 'data/master_db.xlsx' yerləşdir.",
-                status=500
-            )
         try:
-            master_df = match_api.load_master(path=str(master_path))
-        except Exception as e:
-            return HttpResponse(f"Master yüklənmədi: {e}", status=500)
+            # 1) Faylı saxla (məzmun hash-i ilə)
+            filename, filepath, digest = _save_upload(request.FILES['excel_file'])
+            # 2) Master-i (və ya seçilmiş kataloqu) tap və yüklə (MEDIA deyil!)
+            catalog_name, fmt = _catalog_name(request), _output_format(request)
+            master_df = _load_master_or_fail(catalog_name)
+            # 3) Eyni fayl eyni master/vocab ilə artıq hesablanıbsa – hazır nəticəni ver
+            key, out_name, cached = _cached_output(digest, master_df, filename, fmt, catalog_name)
+            if cached:
+                return _output_response(out_name, cached)
+            # 4) Query faylını oxu
+            rows = _read_queries(filepath)
+        except UploadError as e:
+            return HttpResponse(str(e), status=e.status)
+
+        # 5) Sətir-sətir matçla
+        results, long = _match_rows(rows, master_df)
+
+        # 6) Nəticəni keşə yaz və göndər (default xlsx; csv/parquet/arrow – long cədvəl)
+        out_path = _write_output(results, long, key, fmt)
+        return _output_response(out_name, out_path)
+
+    # GET → formu göstər
+    return render(request, 'analyzer/upload.html', {"catalogs": match_api.list_catalogs()})
+
+# ---------------------------------------------------------
+# Async view-lar (ASGI; WSGI-də async_to_sync ilə)
+# ---------------------------------------------------------
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+def _busy_response() -> HttpResponse:
+    resp = HttpResponse("Server məşğuldur, bir az sonra yenidən cəhd edin.", status=503)
+    resp["Retry-After"] = "5"
+    return resp
+
+async def upload_stream(request):
+    """
+    POST excel_file → text/event-stream. Parse + matç ağır lane-də işləyir,
+    irəliləyiş `progress` hadisələri ilə, sonda `done` (download URL) göndərilir.
+    Lane doludursa dərhal 503 qaytarılır (backpressure).
+    """
+    if request.method != "POST":
+        return HttpResponse(status=405)
+    up = await sync_to_async(lambda: request.FILES.get("excel_file"))()
+    fmt = await sync_to_async(_output_format)(request)
+    catalog_name = await sync_to_async(_catalog_name)(request)
+    if up is None:
+        return HttpResponse("excel_file tələb olunur.", status=400)
+
+    try:
+        jobs.heavy.reserve()
+    except jobs.Busy:
+        return _busy_response()
 
-        # 3) Query faylını oxu
+    progress = jobs.Progress()
+
+    def job():
         try:
-            query_df = pd.read_excel(filepath)
+            filename, filepath, digest = _save_upload(up)
+            progress.push("stage", {"stage": "master", "catalog": catalog_name or None})
+            master_df = _load_master_or_fail(catalog_name)
+            key, out_name, cached = _cached_output(digest, master_df, filename, fmt, catalog_name)
+            if cached:
+                progress.push("done", {"download": _download_url(key, fmt, out_name), "cached": True})
+                return
+            progress.push("stage", {"stage": "parse"})
+            rows = _read_queries(filepath)
+            progress.push("stage", {"stage": "match", "total": len(rows)})
+            results, long = _match_rows(rows, master_df, progress=lambda i, n: progress.push("progress", {"done": i, "total": n}))
+            progress.push("stage", {"stage": "write"})
+            _write_output(results, long, key, fmt)
+            progress.push("done", {"download": _download_url(key, fmt, out_name), "rows": len(results), "cached": False})
+        except UploadError as e:
+            progress.push("error", {"message": str(e), "status": e.status})
         except Exception as e:
-            return HttpResponse(f"Query Excel oxunmadı: {e}", status=400)
-
-        # 4) Sətir-sətir matçla
-        results: list[dict] = []
-        for _, row in query_df.iterrows():
-            q_raw  = row.get(config.QUERY_TEXT_COL, "")
-            q_flag = row.get(config.QUERY_FLAG_COL, "")
-            q_unit = row.get(config.UNIT_COL, "")
-
-            # Mütləq string-ləşdir
-            q_raw  = "" if pd.isna(q_raw)  else str(q_raw)
-            q_flag = "" if pd.isna(q_flag) else str(q_flag)
-            q_unit = "" if pd.isna(q_unit) else str(q_unit)
-
-            # API həmişə dict qaytarmalıdır; ehtiyat üçün guard
-            res = match_api.find_matches(q_raw, q_flag, q_unit, master_df) or {}
-            hits = res.get("priced_hits") or []
-
-            top = hits[0] if len(hits) > 0 else ("", 0, None, "")
-            matched_rows = [f"{t} – {pr} ₼ / {u} (score {sc})" for t, sc, pr, u in hits]
-
-            results.append({
-                "Sual": q_raw,
-                "Qiymət": top[2],
-                "Ölçü vahidi": top[3],
-                "Uyğunluq dərəcəsi": top[1],
-                "Uyğun gələn sətrlər": "\n".join(matched_rows) if matched_rows else "—",
-            })
-
-        # 5) Nəticəni MEDIA_ROOT-a yaz və göndər
-        out_name = f"analyzed_{os.path.basename(filename)}"
-        out_path = Path(settings.MEDIA_ROOT) / out_name
-        os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
-        pd.DataFrame(results).to_excel(out_path, index=False)
-
-        return FileResponse(
-            open(out_path, "rb"),
-            as_attachment=True,
-            filename=out_name,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+            progress.push("error", {"message": f"{type(e).__name__}: {e}", "status": 500})
+        finally:
+            progress.close()
 
-    # GET → formu göstər
-    return render(request, 'analyzer/upload.html')
+    # İş pool thread-indədir və view-un event loop-una bağlı deyil: WSGI-də (runserver)
+    # async_to_sync view qayıdanda loop-u bağlayır, stream isə ondan sonra oxunur.
+    jobs.heavy.submit(job, reserved=True)
+
+    if isinstance(request, ASGIRequest):
+        async def stream():
+            yield _sse("queued", {"active": jobs.heavy.active})
+            async for event, data in progress.events():
+                yield _sse(event, data)
+    else:
+        def stream():
+            yield _sse("queued", {"active": jobs.heavy.active})
+            for event, data in progress:
+                yield _sse(event, data)
+
+    resp = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"
+    return resp
+
+async def match_query(request):
+    """
+    Tək sorğu: ?q=...&flag=...&unit=... → JSON. Ayrıca (light) lane-də işləyir ki,
+    böyük upload-lar interaktiv sorğuları gecikdirməsin.
+    """
+    params = request.GET if request.method == "GET" else await sync_to_async(lambda: request.POST)()
+    q_raw = (params.get("q") or "").strip()
+    if not q_raw:
+        return JsonResponse({"error": "q tələb olunur"}, status=400)
+
+    catalog_name = (params.get("catalog") or "").strip()
+
+    def job():
+        master_df = _load_master_or_fail(catalog_name)
+        res = match_api.find_matches(q_raw, params.get("flag", ""), params.get("unit", ""), master_df)
+        confirmed.flush_invalid()
+        return res
 
+    try:
+        res = await jobs.light.run(job)
+    except jobs.Busy:
+        return _busy_response()
+    except UploadError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+
+    hits = [
+        {"text": t, "score": sc, "price": None if pr is None or pr != pr else float(pr), "unit": u}
+        for t, sc, pr, u in res.get("priced_hits") or []
+    ]
+    return JsonResponse(
+        {"query": q_raw, "catalog": catalog_name or None, "priced_hits": hits, "why": res.get("why") or [], "stats": res.get("stats") or {}},
+        json_dumps_params={"ensure_ascii": False, "default": str},
+    )
+
+@login_required
+@permission_required(["analyzer.add_confirmedmatch", "analyzer.change_confirmedmatch"], raise_exception=True)
+def confirm_match(request):
+    """
+    POST q, flag, unit, row_ids ("12,57"), [catalog] → sorğunu bu master sətirlərinə bağlayır.
+    Növbəti eyni (canon, flag, unit) sorğusu fuzzy skan olmadan bu sətirləri qaytarır –
+    bütün sonrakı upload-ların qiymətinə təsir etdiyi üçün yalnız icazəsi olan istifadəçilər.
+    """
+    if request.method != "POST":
+        return HttpResponse(status=405)
+    from azcon_match.sharding import ShardUnavailable
+
+    catalog_name = _catalog_name(request)
+    try:
+        row_ids = [int(x) for x in request.POST.get("row_ids", "").replace(";", ",").split(",") if x.strip()]
+        master_df = _load_master_or_fail(catalog_name)
+        obj = confirmed.confirm(request.POST.get("q", ""), request.POST.get("flag", ""), request.POST.get("unit", ""),
+                      row_ids, master_df, catalog=catalog_name, confirmed_by=request.user.get_username())
+    except UploadError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except ShardUnavailable as e:
+        return JsonResponse({"error": f"Shard-lar cavab vermir: {e}"}, status=503)
+    logger.info("confirmed match #%s by %s: %r [%s/%s] → %s (catalog=%r)",
+                obj.pk, obj.confirmed_by, obj.query, obj.flag, obj.unit, obj.row_ids, obj.catalog)
+    return JsonResponse(
+        {"id": obj.pk, "catalog": obj.catalog, "canon": obj.canon, "flag": obj.flag, "unit": obj.unit, "row_ids": obj.row_ids},
+        json_dumps_params={"ensure_ascii": False},
+    )
+
+def download(request, name: str):
+    """
+    Nəticə faylı: keşdən (outputs/<açar>.<ext>, ?filename= – yükləmə adı) və ya
+    köhnə MEDIA_ROOT/analyzed_* faylları.
+    """
+    name = os.path.basename(name)
+    out_path = upload_cache.resolve(name)
+    if out_path is not None:
+        out_name = os.path.basename(request.GET.get("filename") or "")
+        if not out_name.startswith("analyzed_") or Path(out_name).suffix.lstrip(".") not in {*export.FORMATS, "xls"}:
+            out_name = f"analyzed_{name}"
+        return _output_response(out_name, out_path)
+    out_path = Path(settings.MEDIA_ROOT) / name
+    if not name.startswith("analyzed_") or not out_path.is_file():
+        raise Http404(name)
+    return _output_response(name, out_path)
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint (text exposition format).
+    AZCON_METRICS_DIR verilməyibsə metriklər yalnız cavab verən prosesindir –
+    bir neçə worker olduqda counter-lər scrape-dən scrape-ə "atlanır"; multi-worker
+    deploy-da qovluğu təyin edin (digər worker-lərin dəyərləri ən çox interval qədər köhnədir).
+    """
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -1,2 +1,10 @@
 # AzerCon matcher package (patched)
-from .diagnostics import trace, compare
+# Heavy submodules (pandas, rapidfuzz) are only imported when first used.
+import importlib
+
+__all__ = ["trace", "compare"]
+
+def __getattr__(name):
+    if name in ("trace", "compare"):
+        return getattr(importlib.import_module(".diagnostics", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
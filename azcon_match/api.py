@@ -6,7 +6,7 @@ from pathlib import Path
 import importlib
 import logging
 
-from . import config
+from . import config, metrics
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +21,14 @@ def _import_matcher_module():
             continue
     raise ModuleNotFoundError("Matcher modulunu tapa bilmədim (matcher_v2/matcher).")
 
-_matcher = _import_matcher_module()
+# matcher pandas/rapidfuzz gətirir – ilk çağırışda import edirik, import zamanı yox
+_matcher = None
+
+def _get_matcher():
+    global _matcher
+    if _matcher is None:
+        _matcher = _import_matcher_module()
+    return _matcher
 
 # ---------------------------------------------------------
 # Master yükləyici
@@ -45,6 +52,69 @@ def load_master(path: Optional[str | Path] = None):
         logger.warning("data_loader.load_master alınmadı, pandas ilə oxuyuram: %s (%s)", _p, e)
         return pd.read_excel(_p)
 
+# ---------------------------------------------------------
+# Shared (mmap) master – multi-worker deploy üçün
+# ---------------------------------------------------------
+_shared_cache: Dict[str, Tuple[float, Any]] = {}
+
+def load_shared_master(source: str | Path, shared_path: str | Path):
+    """
+    Preprocessed master-i bir dəfə Arrow faylına yazır (lazımdırsa) və bu prosesə
+    read-only mmap kimi qoşur. Fayl yenidən yazılıbsa (mtime dəyişib) yenidən qoşulur.
+    """
+    from . import shared_master
+
+    shared_path = Path(shared_path)
+    shared_master.ensure_published(source, shared_path)
+    mtime = shared_path.stat().st_mtime
+    hit = _shared_cache.get(str(shared_path))
+    metrics.cache("shared_master", bool(hit and hit[0] == mtime))
+    if hit and hit[0] == mtime:
+        return hit[1]
+    df = shared_master.attach(shared_path)
+    _shared_cache[str(shared_path)] = (mtime, df)
+    return df
+
+# ---------------------------------------------------------
+# Adlı kataloqlar (region / il üzrə master-lər)
+# ---------------------------------------------------------
+_catalogs = None
+
+def configure_catalogs(dirs=(), explicit=None, budget_mb: int = 2048, snapshot_dir=None):
+    """
+    Kataloq registrini qurur: <dir>/<ad>.xlsx faylları + {ad: yol}.
+    Yaddaş büdcəsi aşılanda ən soyuq kataloq çıxarılır.
+    """
+    global _catalogs
+    from . import catalog
+
+    _catalogs = catalog.CatalogRegistry(
+        sources=lambda: catalog.discover(dirs, explicit),
+        budget_bytes=int(budget_mb) << 20,
+        snapshot_dir=snapshot_dir,
+    )
+    return _catalogs
+
+def load_catalog(name: str):
+    """Adlı kataloqun master DataFrame-i (lazım olduqda yüklənir). Naməlum ad → catalog.UnknownCatalog."""
+    if _catalogs is None:
+        configure_catalogs()
+    return _catalogs.get(name)
+
+def list_catalogs() -> List[str]:
+    if _catalogs is None:
+        configure_catalogs()
+    return _catalogs.names()
+
+def refresh_master(master_df):
+    """
+    vocab.json dəyişibsə master-in yalnız təsirlənən sətirlərini yenidən
+    kanonikləşdirir və YENİ DataFrame qaytarır (köhnəsi toxunulmaz qalır).
+    Uzun yaşayan master saxlayanlar nəticəni tək mənimsətmə ilə əvəz etsin.
+    """
+    from . import data_loader
+    return data_loader.refresh_master(master_df)
+
 # ---------------------------------------------------------
 # Nəticəni sabit formata çevirən helper
 # ---------------------------------------------------------
@@ -54,8 +124,9 @@ def _normalize_result(raw_res: Any) -> Dict[str, Any]:
       {
         "priced_hits": List[Tuple[text:str, score:int, price:float|None, unit:str]],
         "why": [...],
-        "stats": {...}
+        "stats": {...}   # stats["vocab_version"] – nəticəni verən vocab versiyası
       }
+    Matcher verirsə əlavə olaraq "priced_ids" (priced_hits ilə eyni sırada master sətir id-ləri).
     """
     out: Dict[str, Any] = {"priced_hits": [], "why": [], "stats": {}}
 
@@ -66,6 +137,8 @@ def _normalize_result(raw_res: Any) -> Dict[str, Any]:
         out["priced_hits"] = raw_res.get("priced_hits") or []
         out["why"] = raw_res.get("why") or []
         out["stats"] = raw_res.get("stats") or {}
+        if "priced_ids" in raw_res:
+            out["priced_ids"] = raw_res.get("priced_ids") or []
         return out
 
     if isinstance(raw_res, list):
@@ -113,12 +186,31 @@ def _normalize_result(raw_res: Any) -> Dict[str, Any]:
 # ---------------------------------------------------------
 # Public API – views.py yalnız bunları çağıracaq
 # ---------------------------------------------------------
-def find_matches(q_raw: str, q_flag: str, q_unit: str, master_df) -> Dict[str, Any]:
+def compile_query(q_raw: str, q_flag: str = "", q_unit: str = ""):
+    """
+    Sorğunu bir dəfə kompilyasiya edir (canon, tokenlər, rəqəmlər, material, flag/unit).
+    Nəticə find_matches-ə və diagnostics funksiyalarına q_raw yerinə ötürülə bilər.
     """
+    from .query import compile_query as _compile
+    return _compile(q_raw, q_flag, q_unit)
+
+def find_matches(q_raw, q_flag: str, q_unit: str, master_df) -> Dict[str, Any]:
+    """
+    q_raw: str və ya compile_query() nəticəsi.
+    master_df: DataFrame və ya sharding.Coordinator (sharded rejim).
     Altda funksiyanın adı/signature-ı fərqli ola bilər.
     Burda bir neçə mümkün variantı cəhd edirik, nəticəni normalize edirik.
     İstənilən səhvdə BOŞ struktur qaytarırıq (None YOX!).
     """
+    if getattr(master_df, "is_sharded", False):
+        # sharding.Coordinator: scatter-gather, nəticə artıq matcher formatındadır
+        try:
+            return _normalize_result(master_df.find_matches(q_raw, q_flag, q_unit))
+        except Exception as e:
+            metrics.MATCHER_ERRORS.inc(type=type(e).__name__)
+            logger.error("sharded matç xətası: %s", e, exc_info=True)
+            return {"priced_hits": [], "why": [f"error:sharded:{e}"], "stats": {}}
+
     candidates = [
         ("find_matches", (q_raw, q_flag, q_unit, master_df), {}),
         ("process",      (q_raw, q_flag, q_unit, master_df), {}),
@@ -126,8 +218,9 @@ def find_matches(q_raw: str, q_flag: str, q_unit: str, master_df) -> Dict[str, A
         ("match",        (), {"query": q_raw, "flag": q_flag, "unit": q_unit, "master": master_df}),
     ]
 
+    matcher = _get_matcher()
     for fname, args, kwargs in candidates:
-        func = getattr(_matcher, fname, None)
+        func = getattr(matcher, fname, None)
         if callable(func):
             try:
                 raw = func(*args, **kwargs)
@@ -136,10 +229,11 @@ def find_matches(q_raw: str, q_flag: str, q_unit: str, master_df) -> Dict[str, A
                 # signature uyğun gəlməyibsə növbəti varianta keç
                 continue
             except Exception as e:
+                metrics.MATCHER_ERRORS.inc(type=type(e).__name__)
                 logger.error("matcher.%s çağırışında xəta: %s", fname, e, exc_info=True)
                 return {"priced_hits": [], "why": [f"error:{fname}:{e}"], "stats": {}}
 
-    CandidateClass = getattr(_matcher, "Matcher", None) or getattr(_matcher, "Engine", None)
+    CandidateClass = getattr(matcher, "Matcher", None) or getattr(matcher, "Engine", None)
     if CandidateClass:
         try:
             obj = CandidateClass()
@@ -152,6 +246,7 @@ def find_matches(q_raw: str, q_flag: str, q_unit: str, master_df) -> Dict[str, A
                         raw = m(query=q_raw, flag=q_flag, unit=q_unit, master=master_df)
                     return _normalize_result(raw)
         except Exception as e:
+            metrics.MATCHER_ERRORS.inc(type=type(e).__name__)
             logger.error("Matcher/Engine obyekti ilə xəta: %s", e, exc_info=True)
             return {"priced_hits": [], "why": [f"error:class:{e}"], "stats": {}}
 
@@ -0,0 +1,79 @@
+"""Import-time benchmark for the azcon_match package.
+
+Each target is imported in a fresh interpreter so that module caches do not
+hide the cost. Usage::
+
+    python -m azcon_match.bench_import            # 7 runs per target
+    python -m azcon_match.bench_import -n 15
+
+The ``legacy`` row times ``import advertools, pandas`` – what importing
+``azcon_match`` used to pay before the stopword list was vendored and the
+heavy modules were made lazy. It is skipped when advertools is not installed.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+HEAVY = ("pandas", "numpy", "rapidfuzz", "advertools", "scrapy", "twisted", "openpyxl")
+
+TARGETS = {
+    "package":    "import azcon_match",
+    "api":        "import azcon_match.api",
+    "canon":      "import azcon_match.preprocessing as pp; pp.canon('Divarların boya ilə rənglənməsi')",
+    "legacy":     "import advertools, pandas",
+}
+
+_PROBE = """
+import sys, time
+t0 = time.perf_counter()
+exec({code!r})
+dt = time.perf_counter() - t0
+loaded = [m for m in {heavy!r} if m in sys.modules]
+print(f"{{dt:.6f}}|{{','.join(loaded)}}")
+"""
+
+def _run_once(code: str) -> tuple[float, str] | None:
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(code=code, heavy=HEAVY)],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return None
+    dt, loaded = proc.stdout.strip().rsplit("\n", 1)[-1].split("|")
+    return float(dt), loaded
+
+def bench(runs: int = 7) -> list[dict]:
+    rows = []
+    for name, code in TARGETS.items():
+        samples, loaded = [], ""
+        for _ in range(runs):
+            res = _run_once(code)
+            if res is None:
+                break
+            samples.append(res[0]); loaded = res[1]
+        if not samples:
+            rows.append({"target": name, "skipped": True})
+            continue
+        rows.append({
+            "target": name,
+            "median_ms": statistics.median(samples) * 1000,
+            "min_ms": min(samples) * 1000,
+            "heavy_loaded": loaded or "-",
+        })
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", "--runs", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    print(f"{'target':<10} {'median ms':>10} {'min ms':>10}  heavy modules loaded")
+    for r in bench(args.runs):
+        if r.get("skipped"):
+            print(f"{r['target']:<10} {'skipped (import failed)':>22}")
+            continue
+        print(f"{r['target']:<10} {r['median_ms']:>10.1f} {r['min_ms']:>10.1f}  {r['heavy_loaded']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# azcon_match/bulk_report.py
+# Bütün query vərəqi üçün diagnostika: hər qaydada neçə namizəd atıldı (funnel),
+# columnar hesabat və threshold-ların yenidən hesablanması (replay).
+"""
+Usage::
+
+    python -m azcon_match.bulk_report queries.xlsx out/ --master data/master_db.xlsx --workers 4
+    python -m azcon_match.bulk_report --replay out/ THRESHOLD=75 MIN_COVER=0.4
+
+Funnel mərhələləri matcher-dəki sıra ilə: prefilter (flag/unit/material) →
+generic → critical → coverage → numeric → threshold → passed → priced.
+
+Ucuz qaydalarla (generic, critical) atılan sətirlər yalnız sayılır; qalan hər
+namizəd üçün coverage, numeric_ok və skor `detail` cədvəlinə yazılır. Bu cədvəl
+THRESHOLD / MIN_COVER / PRICE_AVG_MIN_SCORE dəyişəndə funnel-i fuzzy skoru
+yenidən hesablamadan qurmağa kifayət edir.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import config, index as index_mod, numeric, tokens as tokens_mod
+from .matcher import score_row
+from .query import CompiledQuery, compile_query
+
+THRESHOLD_KEYS = ("THRESHOLD", "MIN_COVER", "PRICE_AVG_MIN_SCORE")
+FUNNEL_STAGES = ("generic", "critical", "coverage", "numeric", "threshold")
+
+def current_thresholds() -> Dict[str, float]:
+    return {k: getattr(config, k) for k in THRESHOLD_KEYS}
+
+# ---------------------------------------------------------
+# Bir sorğunun qiymətləndirilməsi
+# ---------------------------------------------------------
+def _prefilter(master_df: pd.DataFrame, cq: CompiledQuery) -> np.ndarray:
+    """matcher._filter ilə eyni semantika, amma index üzərindən (mövqelər)."""
+    idx = index_mod.get(master_df, cq.vocab)
+    pos = np.arange(idx.n_rows, dtype=np.int32)
+    if cq.material:
+        pos = np.intersect1d(pos, idx.block("material", cq.material))
+    if cq.flag in index_mod.FLAGS:
+        pos = np.intersect1d(pos, idx.block("flag", cq.flag))
+    if cq.unit:
+        pos = np.intersect1d(pos, idx.block("unit", cq.unit))
+    return pos
+
+def evaluate(query_id: int, cq: CompiledQuery, master_df: pd.DataFrame) -> Tuple[Dict[str, Any], List[tuple]]:
+    """(funnel sətri, detail sətirləri) – detail: (query_id, row_id, coverage, numeric_ok, score, priced)."""
+    v = cq.vocab
+    idx = index_mod.get(master_df, v)
+    pre = _prefilter(master_df, cq)
+    survivors = np.intersect1d(pre, idx.postings("term", cq.non_generic))
+
+    row = {
+        "query_id": query_id, "query": cq.raw, "canon": cq.canon, "flag": cq.flag, "unit": cq.unit,
+        "prefiltered": int(len(pre)),
+        "generic": int(len(pre) - len(survivors)),
+        "critical": 0,
+        "exact_hits": int(len(index_mod.exact_positions(master_df, cq))) if cq.non_generic else 0,
+    }
+    detail: List[tuple] = []
+    cand = master_df.iloc[survivors]
+    # matcher._scan kimi: tokenlər sütunun formasında (shared master-də int32 id-lər)
+    space = tokens_mod.space(cand["tokens"])
+    q_tokens, q_critical, critical = (space.ids(t) for t in (cq.tokens, cq.critical, v.critical))
+    n_q = max(1, len(cq.tokens))
+    rows = cand[[config.MASTER_TEXT_COL, config.PRICE_COL, "canon"]].itertuples(index=True, name=None)
+    for (rid, s_text, price, s_can), s_tokens in zip(rows, space.rows(cand["tokens"])):
+        if len(q_critical) < len(cq.critical) or not q_critical <= s_tokens:
+            row["critical"] += 1
+            continue
+        cov = len(q_tokens & s_tokens) / n_q  # pp.coverage
+        penal, num_ok = 1.0, True
+        if cq.has_num:
+            c_nums = numeric.extract(s_text)
+            if c_nums and not any(q == c for q in cq.nums for c in c_nums):
+                num_ok = False
+            elif not c_nums:
+                penal = 0.80
+        score = int(score_row(q_tokens, s_tokens, cq.canon, s_can, critical) * penal) if num_ok else -1
+        detail.append((query_id, rid, cov, num_ok, score, bool(pd.notna(price))))
+    return row, detail
+
+# ---------------------------------------------------------
+# Paralel icra
+# ---------------------------------------------------------
+_WORKER_MASTER: Optional[pd.DataFrame] = None
+
+def _init_worker(master_path: Optional[str], shared_path: Optional[str]) -> None:
+    global _WORKER_MASTER
+    if _WORKER_MASTER is not None:  # fork: valideyndən miras qalıb
+        return
+    if shared_path:
+        from .shared_master import attach
+        _WORKER_MASTER = attach(shared_path)
+    else:
+        from .data_loader import load_master
+        _WORKER_MASTER = load_master(path=master_path)
+
+def _run_chunk(chunk: Sequence[Tuple[int, str, str, str]]):
+    rows, detail = [], []
+    for qid, q_raw, q_flag, q_unit in chunk:
+        r, d = evaluate(qid, compile_query(q_raw, q_flag, q_unit), _WORKER_MASTER)
+        rows.append(r); detail.extend(d)
+    return rows, detail
+
+def run(
+    queries: Sequence[Sequence[str]],
+    master_df: Optional[pd.DataFrame] = None,
+    *,
+    master_path: Optional[str] = None,
+    shared_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+) -> "BulkReport":
+    """
+    queries: (q_raw, q_flag, q_unit) siyahısı (data_loader.load_queries formatı).
+    master_df verilibsə fork ilə worker-lərə miras verilir; fork yoxdursa
+    worker-lər master_path/shared_path-dan özləri yükləyir.
+    """
+    global _WORKER_MASTER
+    t0 = time.time()
+    items = [(i, *(("" if pd.isna(x) else str(x)) for x in q)) for i, q in enumerate(queries)]
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    fork_ok = "fork" in mp.get_all_start_methods()
+    if master_df is None and not (master_path or shared_path):
+        raise ValueError("master_df, master_path və ya shared_path lazımdır")
+
+    rows, detail = [], []
+    if workers <= 1 or len(chunks) <= 1 or not (fork_ok or master_path or shared_path):
+        _WORKER_MASTER = master_df
+        _init_worker(master_path, shared_path)
+        try:
+            for c in chunks:
+                r, d = _run_chunk(c); rows.extend(r); detail.extend(d)
+        finally:
+            _WORKER_MASTER = None
+    else:
+        ctx = mp.get_context("fork" if fork_ok and master_df is not None else None)
+        _WORKER_MASTER = master_df if ctx.get_start_method() == "fork" else None
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                     initializer=_init_worker, initargs=(master_path, shared_path)) as ex:
+                for r, d in ex.map(_run_chunk, chunks):
+                    rows.extend(r); detail.extend(d)
+        finally:
+            _WORKER_MASTER = None
+
+    base = pd.DataFrame(rows).sort_values("query_id").reset_index(drop=True)
+    det = pd.DataFrame(detail, columns=["query_id", "row_id", "coverage", "numeric_ok", "score", "priced"])
+    rep = BulkReport(base=base, detail=det, meta={
+        "thresholds": current_thresholds(), "queries": len(items), "workers": workers,
+        "seconds": round(time.time() - t0, 3),
+        "vocab_version": master_df.attrs.get("vocab_version") if master_df is not None else None,
+    })
+    return rep
+
+# ---------------------------------------------------------
+# Hesabat + replay
+# ---------------------------------------------------------
+@dataclass
+class BulkReport:
+    base: pd.DataFrame     # sorğu başına: prefiltered, generic, critical, exact_hits
+    detail: pd.DataFrame   # namizəd başına: coverage, numeric_ok, score, priced
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def funnel(self, **thresholds) -> pd.DataFrame:
+        """Funnel-i verilən (və ya cari config) threshold-larla qurur – fuzzy yenidən hesablanmır."""
+        t = {**current_thresholds(), **(self.meta.get("thresholds") or {}), **thresholds}
+        d = self.detail
+        cov_fail = d["coverage"] < t["MIN_COVER"]
+        num_fail = ~cov_fail & ~d["numeric_ok"]
+        ok = ~cov_fail & d["numeric_ok"]
+        thr_fail = ok & (d["score"] < t["THRESHOLD"])
+        passed = ok & (d["score"] >= t["THRESHOLD"])
+        priced = passed & d["priced"] & (d["score"] >= t["PRICE_AVG_MIN_SCORE"])
+        agg = pd.DataFrame({
+            "query_id": d["query_id"], "coverage": cov_fail, "numeric": num_fail,
+            "threshold": thr_fail, "passed": passed, "priced": priced,
+        }).groupby("query_id").sum()
+        out = self.base.set_index("query_id").join(agg)
+        cnt = ["coverage", "numeric", "threshold", "passed", "priced"]
+        out[cnt] = out[cnt].fillna(0).astype("int64")
+        return out.reset_index()
+
+    def replay(self, **thresholds) -> pd.DataFrame:
+        """Cari funnel ilə müqayisə: hər sorğu üçün passed/priced fərqi."""
+        unknown = set(thresholds) - set(THRESHOLD_KEYS)
+        if unknown:
+            raise ValueError(f"Naməlum threshold: {sorted(unknown)}")
+        old, new = self.funnel(), self.funnel(**thresholds)
+        out = new.copy()
+        out["passed_delta"] = new["passed"] - old["passed"]
+        out["priced_delta"] = new["priced"] - old["priced"]
+        return out
+
+    # -- I/O ---------------------------------------------------------------
+    def write(self, out_dir: str | Path, fmt: str = "parquet") -> Path:
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        frames = {"base": self.base, "detail": self.detail, "funnel": self.funnel()}
+        for name, df in frames.items():
+            if fmt == "parquet":
+                df.to_parquet(out_dir / f"{name}.parquet", index=False)
+            else:
+                df.to_csv(out_dir / f"{name}.csv", index=False)
+        (out_dir / "meta.json").write_text(json.dumps({**self.meta, "format": fmt}, ensure_ascii=False, indent=2), encoding="utf-8")
+        return out_dir
+
+    @classmethod
+    def load(cls, out_dir: str | Path) -> "BulkReport":
+        out_dir = Path(out_dir)
+        meta = json.loads((out_dir / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format") == "parquet":
+            read = lambda n: pd.read_parquet(out_dir / f"{n}.parquet")
+        else:
+            # mətn sütunları: boş flag/unit "" qalsın (NaN yox), "20" kimi canon str qalsın
+            text = {c: str for c in ("query", "canon", "flag", "unit")}
+            read = lambda n: pd.read_csv(out_dir / f"{n}.csv", dtype=text, keep_default_na=False)
+        return cls(base=read("base"), detail=read("detail"), meta=meta)
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+def _parse_overrides(items: Sequence[str]) -> Dict[str, float]:
+    out = {}
+    for it in items:
+        k, _, v = it.partition("=")
+        out[k.strip().upper()] = float(v)
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Bulk diagnostics (funnel) report")
+    ap.add_argument("queries", nargs="?", help="query Excel")
+    ap.add_argument("out_dir", nargs="?", help="hesabat qovluğu")
+    ap.add_argument("--master", default=None, help="master Excel (default: config.MASTER_PATH)")
+    ap.add_argument("--shared", default=None, help="shared master Arrow faylı (AZCON_SHARED_MASTER)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--format", choices=("parquet", "csv"), default="parquet")
+    ap.add_argument("--replay", metavar="REPORT_DIR", default=None)
+    ap.add_argument("overrides", nargs="*", help="THRESHOLD=75 MIN_COVER=0.4 ...")
+    args = ap.parse_args(argv)
+
+    if args.replay:
+        # positional-lar bu rejimdə override-dır
+        extra = [a for a in (args.queries, args.out_dir) if a] + list(args.overrides)
+        rep = BulkReport.load(args.replay)
+        res = rep.replay(**_parse_overrides(extra))
+        print(res[["query_id", "query", "passed", "passed_delta", "priced", "priced_delta"]].to_string(index=False))
+        print(f"\nTotal passed Δ: {int(res['passed_delta'].sum())}, priced Δ: {int(res['priced_delta'].sum())}")
+        return
+
+    if not (args.queries and args.out_dir):
+        ap.error("queries və out_dir lazımdır")
+    from . import data_loader as dl
+    queries = dl.load_queries(args.queries)
+    master_path = args.master or config.MASTER_PATH
+    master_df = None if args.shared else dl.load_master(path=master_path)
+    rep = run(queries, master_df, master_path=master_path, shared_path=args.shared, workers=args.workers)
+    rep.write(args.out_dir, fmt=args.format)
+    f = rep.funnel()
+    print(f"{len(f)} queries in {rep.meta['seconds']}s → {args.out_dir}")
+    print(f[["prefiltered", *FUNNEL_STAGES, "passed", "priced"]].sum().to_string())
+
+if __name__ == "__main__":
+    main()
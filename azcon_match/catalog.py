@@ -0,0 +1,212 @@
+# azcon_match/catalog.py
+# Bir neçə master kataloqu (region / il üzrə) adla seçilir. Kataloqlar ilk
+# müraciətdə yüklənir, yaddaş büdcəsini aşanda ən soyuğu (LRU) çıxarılır.
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+EXTENSIONS = (".xlsx", ".xls")
+
+class UnknownCatalog(KeyError):
+    """Ad qeydiyyatda (konfiq və ya kataloq qovluğunda) yoxdur."""
+
+def discover(dirs: Iterable[str | Path], explicit: Optional[Mapping[str, str | Path]] = None) -> Dict[str, Path]:
+    """
+    <dir>/<ad>.xlsx faylları + açıq verilmiş {ad: yol}. Açıq verilənlər üstündür.
+    Hər çağırışda yenidən baxılır – yeni kataloq faylı restart-sız görünür.
+    """
+    out: Dict[str, Path] = {}
+    for d in dirs:
+        d = Path(d)
+        if not d.is_dir():
+            continue
+        for p in sorted(d.iterdir()):
+            if p.suffix.lower() in EXTENSIONS and NAME_RE.match(p.stem) and not p.name.startswith("~$"):
+                out.setdefault(p.stem, p)
+    for name, p in (explicit or {}).items():
+        out[name] = Path(p)
+    return out
+
+def footprint(master_df) -> int:
+    """DataFrame + onun index-inin təxmini ölçüsü (bayt)."""
+    from . import index as master_index
+
+    n = int(master_df.memory_usage(index=True, deep=True).sum())
+    idx = master_index._INDEXES.get(id(master_df))
+    if idx is not None:
+        n += idx.nbytes
+    return n
+
+@dataclass
+class Entry:
+    name: str
+    source: Path
+    mtime: float
+    df: object
+    nbytes: int
+    loaded_at: float
+    refreshing: Optional[Future] = None   # vocab yenilənməsi gedirsə (single-flight)
+
+class CatalogRegistry:
+    """
+    Ad → preprocessed master (+ index). Thread-safe:
+      * eyni kataloqu eyni anda istəyən sorğular tək yükləməni paylaşır (single-flight);
+      * yüklənmiş kataloqların cəmi `budget_bytes`-ı aşanda ən köhnə istifadə olunan çıxarılır
+        (ən son istifadə olunan həmişə qalır);
+      * `snapshot_dir` verilibsə kataloq Arrow snapshot-a yazılıb mmap olunur
+        (shared_master) – worker-lər arasında paylaşılır və restart-da preprocess olunmur.
+    """
+
+    def __init__(
+        self,
+        sources: Callable[[], Mapping[str, Path]],
+        budget_bytes: int = 2 << 30,
+        snapshot_dir: Optional[str | Path] = None,
+    ):
+        self._sources = sources
+        self.budget_bytes = budget_bytes
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        self._lock = threading.Lock()
+        self._loaded: "OrderedDict[str, Entry]" = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+
+    # -- public ------------------------------------------------------------
+    def names(self) -> List[str]:
+        return sorted(self._sources())
+
+    def get(self, name: str):
+        from . import vocab as vocab_mod
+
+        source = self._source(name)
+        mtime = source.stat().st_mtime
+        version = vocab_mod.current().version
+        refresh = None
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is not None and entry.mtime == mtime and entry.source == source:
+                self._loaded.move_to_end(name)
+                metrics.cache("catalog", True)
+                if entry.df.attrs.get("vocab_version") == version:
+                    return entry.df
+                if self.snapshot_dir is None:
+                    # vocab dəyişib: təsirlənən sətirlər kilidsiz, bir dəfə yenilənir
+                    refresh = entry.refreshing
+                    owner = refresh is None
+                    if owner:
+                        refresh = entry.refreshing = Future()
+                else:
+                    self._drop(name)  # snapshot köhnəlib – aşağıda yenidən publish olunur
+            if refresh is None:
+                fut = self._loading.get(name)
+                owner = fut is None
+                if owner:
+                    fut = self._loading[name] = Future()
+        if refresh is not None:
+            return self._refresh(entry, refresh) if owner else refresh.result()
+
+        metrics.cache("catalog", False)
+        if not owner:
+            return fut.result()
+
+        try:
+            entry = self._load(name, source, mtime)
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(name, None)
+            fut.set_exception(e)
+            raise
+        with self._lock:
+            self._loading.pop(name, None)
+            self._loaded[name] = entry
+            self._loaded.move_to_end(name)
+            self._evict()
+        fut.set_result(entry.df)
+        return entry.df
+
+    def evict(self, name: str) -> bool:
+        with self._lock:
+            return self._drop(name)
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            return {
+                e.name: {"rows": len(e.df), "bytes": e.nbytes, "loaded_at": e.loaded_at, "source": str(e.source)}
+                for e in self._loaded.values()
+            }
+
+    # -- daxili ------------------------------------------------------------
+    def _source(self, name: str) -> Path:
+        if not NAME_RE.match(name or ""):
+            raise UnknownCatalog(name)
+        src = self._sources().get(name)
+        if src is None or not Path(src).is_file():
+            raise UnknownCatalog(name)
+        return Path(src)
+
+    def _load(self, name: str, source: Path, mtime: float) -> Entry:
+        from . import data_loader, shared_master
+
+        t0 = time.perf_counter()
+        if self.snapshot_dir is not None:
+            snap = shared_master.ensure_published(source, self.snapshot_dir / f"{name}.arrow")
+            df = shared_master.attach(snap)
+        else:
+            df = data_loader.load_master(path=str(source))
+        df.attrs["catalog"] = name
+        entry = Entry(name, source, mtime, df, footprint(df), time.time())
+        logger.info("kataloq '%s' yükləndi: %d sətir, ~%.1f MB, %.2fs",
+                    name, len(df), entry.nbytes / 2**20, time.perf_counter() - t0)
+        return entry
+
+    def _refresh(self, entry: Entry, fut: Future):
+        """
+        vocab dəyişib: yalnız təsirlənən sətirlər yenilənir (registr kilidindən kənarda –
+        digər kataloqlara sorğular gözləmir). Yeni frame-in index-i və ölçüsü hazır olandan
+        sonra tək mənimsətmə ilə dəyişdirilir; eyni kataloqu gözləyənlər `fut`-u paylaşır.
+        """
+        from . import data_loader, index as master_index
+
+        try:
+            df = data_loader.refresh_master(entry.df)
+            master_index.get(df)  # index indi qurulsun, növbəti sorğuda yox
+            nbytes = footprint(df)
+        except BaseException as e:
+            with self._lock:
+                entry.refreshing = None
+            fut.set_exception(e)
+            raise
+        with self._lock:
+            entry.df, entry.nbytes, entry.refreshing = df, nbytes, None
+            self._evict()
+        fut.set_result(df)
+        return df
+
+    def _drop(self, name: str) -> bool:
+        entry = self._loaded.pop(name, None)
+        self._publish_size()
+        return entry is not None
+
+    def _evict(self) -> None:
+        total = sum(e.nbytes for e in self._loaded.values())
+        while total > self.budget_bytes and len(self._loaded) > 1:
+            name, entry = self._loaded.popitem(last=False)
+            total -= entry.nbytes
+            logger.info("kataloq '%s' yaddaşdan çıxarıldı (~%.1f MB)", name, entry.nbytes / 2**20)
+        self._publish_size()
+
+    def _publish_size(self) -> None:
+        metrics.CATALOG_BYTES.set(sum(e.nbytes for e in self._loaded.values()))
+        metrics.CATALOGS_LOADED.set(len(self._loaded))
@@ -8,3 +8,11 @@ QUERY_FLAG_COL  = "Tip"
 PRICE_COL       = "Qiyməti"
 UNIT_COL        = "Ölçü vahidi"
 TOP_N=5; THRESHOLD=80; PRICE_AVG_MIN_SCORE=8; MIN_COVER=0.50; SHOW_MATCHES=True
+# Blocking (index.py): BLOCKING – ən seçici blokla namizədləri daralt; BLOCKING_HEAD – itkili
+# "ilk non-generic token" blokunu da icazə ver; BLOCKING_AUDIT – hər sorğunu tam skanla müqayisə et
+BLOCKING=True; BLOCKING_HEAD=False; BLOCKING_AUDIT=False
+# Exact fast path: canon+flag+unit master sətri ilə eynidirsə hash lookup (skor 100).
+# EXACT_MODE="only" – yalnız exact hit-lər; "merge" – fuzzy nəticələrlə birləşdir
+EXACT_FAST_PATH=True; EXACT_MODE="only"
+# Təsdiqlənmiş matçlar (analyzer.ConfirmedMatch): provider qeydiyyatdadırsa find_matches əvvəl ona baxır
+CONFIRMED_LOOKUP=True
@@ -0,0 +1,76 @@
+# azcon_match/confirmed.py
+# Təsdiqlənmiş sorğu → master sətir xəritəsi üçün hook. azcon_match Django-dan
+# asılı deyil: saxlama qatı (analyzer.confirmed) provider-i özü qeydiyyatdan keçirir.
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence
+
+from . import config, metrics
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from .query import CompiledQuery
+
+logger = logging.getLogger(__name__)
+
+# provider(cq, master_df) → təsdiqlənmiş sətir id-ləri və ya None
+Provider = Callable[["CompiledQuery", "pd.DataFrame"], Optional[Sequence[int]]]
+
+_provider: Optional[Provider] = None
+
+def register(provider: Optional[Provider]) -> None:
+    global _provider
+    _provider = provider
+
+def active() -> bool:
+    return _provider is not None and config.CONFIRMED_LOOKUP
+
+def catalog_of(master_df: "pd.DataFrame") -> str:
+    return (getattr(master_df, "attrs", None) or {}).get("catalog") or ""
+
+def fingerprint(master_df: "pd.DataFrame", row_ids: Sequence[int]) -> Optional[str]:
+    """
+    İstinad olunan sətirlərin (mətn, tip, vahid) sha1-i; hər hansı id master-də
+    yoxdursa None. Qiymət daxil deyil – qiymət dəyişməsi təsdiqi pozmur, cavab
+    həmişə cari qiyməti göstərir.
+    """
+    import pandas as pd
+
+    cols = [config.MASTER_TEXT_COL, config.MASTER_FLAG_COL, config.UNIT_COL]
+    if getattr(master_df, "is_sharded", False):
+        # sharding.Coordinator: sətirlər shard-lardan yığılır (shard cavab vermirsə – xəta, None yox)
+        rows = master_df.rows(row_ids)
+        if len(rows) != len(row_ids):
+            return None
+        rows = rows[cols]
+    else:
+        try:
+            rows = master_df.loc[list(row_ids), cols]
+        except KeyError:
+            return None
+    h = hashlib.sha1()
+    for rid, vals in zip(row_ids, rows.itertuples(index=False, name=None)):
+        # NaN / <NA> → "" ki, Excel-dən və shared (Arrow) master-dən eyni fingerprint alınsın
+        text, flag, unit = ("" if pd.isna(x) else str(x) for x in vals)
+        h.update(f"{rid}\x1f{text}\x1f{flag}\x1f{unit}\x1e".encode("utf-8"))
+    return h.hexdigest()
+
+def lookup(cq: "CompiledQuery", master_df: "pd.DataFrame") -> Optional[List[int]]:
+    """
+    Provider-dən təsdiqlənmiş sətirlər (yalnız hamısı bu master-də varsa).
+    Shard hissələrində işləmir – id-lərin bir hissəsi başqa shard-dadır;
+    sharded rejimdə Coordinator özü (scatter-dən əvvəl) çağırır.
+    Provider xətası matçı dayandırmır: fuzzy yola düşürük.
+    """
+    if _provider is None or not cq.canon or "shard" in master_df.attrs:
+        return None
+    try:
+        ids = _provider(cq, master_df)
+    except Exception as e:
+        metrics.MATCHER_ERRORS.inc(type=f"confirmed:{type(e).__name__}")
+        logger.warning("confirmed lookup alınmadı: %s", e)
+        return None
+    metrics.cache("confirmed", bool(ids))
+    return list(ids) if ids else None
@@ -84,11 +84,12 @@
 # azcon_match/data_loader.py
 # Robust master loader: header autodetect + computed columns (canon/tokens/material)
 
+import os
 import time
 from typing import Any, Tuple, List, Dict
 import pandas as pd
 
-from . import config, preprocessing as pp
+from . import config, index as master_index, metrics, preprocessing as pp, tokens as tokens_mod, vocab as vocab_mod
 from .preprocessing import extract_material
 
 # ---------- Normalisers ----------
@@ -203,17 +204,64 @@ def load_master(path: str | None = None) -> pd.DataFrame:
     df[config.PRICE_COL]       = pd.to_numeric(df[config.PRICE_COL], errors="coerce")
 
     # canon/tokens/material
-    df["canon"]    = df[config.MASTER_TEXT_COL].map(pp.canon)
+    v = vocab_mod.current()
+    df["canon"]    = df[config.MASTER_TEXT_COL].map(lambda t: pp.canon(t, vocab=v))
     df["tokens"]   = df["canon"].str.split().map(set)
     # if text_col is weird, compute material from canon/text robustly
     df["material"] = df[config.MASTER_TEXT_COL].astype(str).str.lower().apply(extract_material)
 
     # drop rows where text is missing after all
     df = df.dropna(subset=[config.MASTER_TEXT_COL])
+    df.attrs["vocab_version"] = v.version
+    st = os.stat(path)
+    df.attrs["source"] = {"source": str(path), "source_mtime": st.st_mtime, "source_size": st.st_size}
+    master_index.attach(df, v)
 
+    metrics.MASTER_LOAD_SECONDS.observe(time.time() - t0, source="excel")
+    metrics.MASTER_ROWS.set(len(df))
     print(f"Master rows: {len(df)}  ({time.time() - t0:.2f}s)\n")
     return df
 
+# ---------- Vocab hot-reload ----------
+def refresh_master(df: pd.DataFrame, change: "vocab_mod.VocabChange | None" = None) -> pd.DataFrame:
+    """
+    Bring a preprocessed master up to the current vocab version.
+    Only rows whose tokens intersect the changed synonym entries get their
+    canon/tokens recomputed; the input frame is never mutated, so callers can
+    swap the returned frame in with a single assignment.
+    """
+    new_v = change.new if change else vocab_mod.current()
+    have = df.attrs.get("vocab_version")
+    if have == new_v.version:
+        return df
+
+    if change is None or change.old.version != have:
+        old_v = vocab_mod.manager.get(have) if have else None
+        change = vocab_mod.diff(old_v, new_v) if old_v else None
+
+    out = df.copy(deep=False)
+    out.attrs = dict(df.attrs)
+    out.attrs["vocab_version"] = new_v.version
+    if change is not None and not change.affects_canon:
+        return out
+
+    # astype(object) / decode copy – and detach Arrow-backed (shared) columns
+    canon_col  = df["canon"].astype(object)
+    tokens_col = tokens_mod.decode(df["tokens"])
+    if change is None:
+        # unknown starting version – recompute everything
+        mask = pd.Series(True, index=df.index)
+    else:
+        probe = change.probe_tokens()
+        mask = tokens_col.map(lambda s: not probe.isdisjoint(s)).astype(bool)
+    if mask.any():
+        new_canon = df.loc[mask, config.MASTER_TEXT_COL].map(lambda t: pp.canon(t, vocab=new_v))
+        canon_col.loc[mask]  = new_canon
+        tokens_col.loc[mask] = new_canon.str.split().map(set)
+    out["canon"], out["tokens"] = canon_col, tokens_col
+    print(f"Master vocab {have} → {new_v.version}: {int(mask.sum())}/{len(df)} rows recomputed")
+    return out
+
 # keep the old helper name for compatibility
 load_master_path = load_master
 
@@ -3,12 +3,14 @@ from dataclasses import dataclass, asdict
 from typing import List, Dict, Set
 import re
 from . import preprocessing as pp
+from .query import CompiledQuery, QueryLike, compile_query, ensure
 @dataclass
 class CanonTrace:
     raw:str; lowered:str; phrase_replaced:str; cleaned:str
     tokens:List[str]; tokens_nostop:List[str]; norm_tokens:List[str]; norm_set:Set[str]
     def as_dict(self)->Dict: return asdict(self)
-def trace(text:str)->"CanonTrace":
+def trace(text)->"CanonTrace":
+    if isinstance(text,CompiledQuery): text=text.raw
     raw=text or ""; lowered=raw.lower().translate(pp.TRANSLIT)
     phrase_replaced=lowered
     for p,r in pp.SYN.items():
@@ -17,31 +19,43 @@ def trace(text:str)->"CanonTrace":
     tokens=cleaned.split(); tokens_nostop=[t for t in tokens if t not in pp.STOP_AZ]
     norm_tokens=[pp.norm_token(t) for t in tokens_nostop]; norm_set=set(norm_tokens)
     return CanonTrace(raw,lowered,phrase_replaced,cleaned,tokens,tokens_nostop,norm_tokens,norm_set)
-def compare(a:str,b:str)->dict:
-    ta,tb=trace(a),trace(b); overlap=ta.norm_set & tb.norm_set
-    return {"overlap":overlap,"only_in_a":ta.norm_set-overlap,"only_in_b":tb.norm_set-overlap,
-            "coverage_a":pp.coverage(ta.norm_set,tb.norm_set),"coverage_b":pp.coverage(tb.norm_set,ta.norm_set),
-            "critical_mismatch":any((c in ta.norm_set)^(c in tb.norm_set) for c in pp.CRITICAL)}
+def compare(a,b)->dict:
+    """a/b: str və ya CompiledQuery; tokenlər və critical terminlər a-nın vocab-ı ilə (matcher kimi)."""
+    ca=ensure(a); cb=b if isinstance(b,CompiledQuery) else compile_query(b,vocab=ca.vocab)
+    na,nb=set(ca.tokens),set(cb.tokens); overlap=na & nb; critical=ca.vocab.critical
+    return {"overlap":overlap,"only_in_a":na-overlap,"only_in_b":nb-overlap,
+            "coverage_a":pp.coverage(na,nb),"coverage_b":pp.coverage(nb,na),
+            "critical_mismatch":any((c in na)^(c in nb) for c in critical)}
 # --- add this in diagnostics.py ---
-from typing import Dict, Any
+from typing import Dict, Any, Iterable
 from . import preprocessing as pp, numeric, config
 
-def explain_candidate(q_raw: str, row: Dict[str, Any]) -> str:
-    # row must contain: text, canon, tokens
-    q_can = pp.canon(q_raw); q_tok = set(q_can.split())
-    s_text, s_can, s_tokens = row["text"], row["canon"], row["tokens"]
+def explain_candidate(q_raw: QueryLike, row: Dict[str, Any]) -> str:
+    """
+    q_raw: str və ya CompiledQuery (çox namizəd üçün bir dəfə compile_query et).
+    row must contain: text, canon, tokens (optional: nums – numeric.extract(text))
+    Yoxlamalar matcher._scan ilə eyni sırada və eyni hədlərlə (config.MIN_COVER, config.THRESHOLD).
+    """
+    from .matcher import score_row
 
-    # adaptive coverage for short queries
-    qt = len(q_tok); min_cover = config.MIN_COVER
-    if qt <= 2: min_cover = 0.25
-    elif qt == 3: min_cover = 0.35
+    cq = ensure(q_raw)
+    q_tok = cq.tokens
+    s_text, s_tokens = row["text"], row["tokens"]
+    if not isinstance(s_tokens, (set, frozenset)): s_tokens = set(s_tokens)
 
-    if not (q_tok & (s_tokens - pp.GENERIC)): return "fail: no non-generic token overlap"
-    if any(c in q_tok and c not in s_tokens for c in pp.CRITICAL): return "fail: missing critical term(s)"
-    if pp.coverage(q_tok, s_tokens) < min_cover: return "fail: coverage"
-    # numeric check (current exact match rule)
-    qn = numeric.extract(q_raw); cn = numeric.extract(s_text)
+    if not (q_tok & (s_tokens - cq.vocab.generic)): return "fail: no non-generic token overlap"
+    if any(c not in s_tokens for c in cq.critical): return "fail: missing critical term(s)"
+    if pp.coverage(q_tok, s_tokens) < config.MIN_COVER: return "fail: coverage"
+    # numeric check (current exact match rule); rəqəmsiz sətir cərimə alır
+    qn = cq.nums
+    cn = row["nums"] if "nums" in row else numeric.extract(s_text)
     if qn and cn and not any(q == c for q in qn for c in cn): return "fail: numeric mismatch"
+    penal = 0.80 if qn and not cn else 1.0
+    if int(score_row(q_tok, s_tokens, cq.canon, row["canon"], cq.vocab.critical) * penal) < config.THRESHOLD:
+        return "fail: score"
     return "pass"
 
-
+def explain_many(q_raw: QueryLike, rows: Iterable[Dict[str, Any]], q_flag: str = "", q_unit: str = "") -> List[str]:
+    """Bir sorğu, çox namizəd: sorğu yalnız bir dəfə kompilyasiya olunur."""
+    cq = ensure(q_raw, q_flag, q_unit)
+    return [explain_candidate(cq, r) for r in rows]
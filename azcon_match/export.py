@@ -0,0 +1,87 @@
+# azcon_match/export.py
+# Nəticə cədvəlləri: Excel xülasəsi (default) + long/normalized cədvəl (CSV/Parquet/Arrow).
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# format → (fayl uzantısı, content-type)
+FORMATS: Dict[str, tuple[str, str]] = {
+    "xlsx":    ("xlsx",    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv":     ("csv",     "text/csv; charset=utf-8"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow":   ("arrow",   "application/vnd.apache.arrow.file"),
+}
+DEFAULT_FORMAT = "xlsx"
+
+LONG_COLUMNS = ["query_id", "query", "query_flag", "query_unit", "rank", "text", "score", "price", "unit", "row_id"]
+
+def summary_row(q_raw: str, res: Dict[str, Any]) -> Dict[str, Any]:
+    """Excel xülasəsinin bir sətri (köhnə upload formatı)."""
+    hits = res.get("priced_hits") or []
+    top = hits[0] if len(hits) > 0 else ("", 0, None, "")
+    matched_rows = [f"{t} – {pr} ₼ / {u} (score {sc})" for t, sc, pr, u in hits]
+    return {
+        "Sual": q_raw,
+        "Qiymət": top[2],
+        "Ölçü vahidi": top[3],
+        "Uyğunluq dərəcəsi": top[1],
+        "Uyğun gələn sətrlər": "\n".join(matched_rows) if matched_rows else "—",
+    }
+
+def long_rows(query_id: int, q_raw: str, q_flag: str, q_unit: str, res: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Hər (sorğu, priced hit) cütü üçün bir sətir; hit-i olmayan sorğu rank=0 ilə bir sətir alır."""
+    hits = res.get("priced_hits") or []
+    ids = res.get("priced_ids") or [None] * len(hits)
+    base = {"query_id": query_id, "query": q_raw, "query_flag": q_flag, "query_unit": q_unit}
+    if not hits:
+        return [{**base, "rank": 0, "text": None, "score": None, "price": None, "unit": None, "row_id": None}]
+    return [
+        {**base, "rank": r, "text": t, "score": sc, "price": pr, "unit": u, "row_id": rid}
+        for r, ((t, sc, pr, u), rid) in enumerate(zip(hits, ids), 1)
+    ]
+
+def _long_frame(rows: List[Dict[str, Any]]):
+    import pandas as pd
+
+    df = pd.DataFrame(rows, columns=LONG_COLUMNS)
+    df["score"] = pd.to_numeric(df["score"], errors="coerce").astype("Int64")
+    df["price"] = pd.to_numeric(df["price"], errors="coerce").astype("float64")
+    df["row_id"] = pd.to_numeric(df["row_id"], errors="coerce").astype("Int64")
+    df["rank"] = df["rank"].astype("int32")
+    return df
+
+def output_name(filename: str, fmt: str) -> str:
+    ext = FORMATS[fmt][0]
+    name = Path(filename).name
+    if fmt == "xlsx":
+        return f"analyzed_{name}"  # köhnə adlandırma
+    return f"analyzed_{Path(name).stem}.{ext}"
+
+def write(path: str | Path, fmt: str, summary: List[Dict[str, Any]], long: Optional[List[Dict[str, Any]]] = None) -> Path:
+    """
+    xlsx → xülasə (openpyxl); csv/parquet/arrow → long cədvəl (openpyxl-dən xeyli sürətli).
+    """
+    import pandas as pd
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Naməlum format: {fmt}")
+    path = Path(path)
+    if fmt == "xlsx":
+        pd.DataFrame(summary).to_excel(path, index=False)
+        return path
+
+    df = _long_frame(long or [])
+    if fmt == "csv":
+        df.to_csv(path, index=False, encoding="utf-8")
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_feather(path)
+    return path
+
+def content_type(fmt_or_name: str) -> str:
+    fmt = fmt_or_name.rsplit(".", 1)[-1].lower()
+    if fmt == "xls":  # .xls adlı upload-un nəticəsi də xlsx-dir
+        fmt = "xlsx"
+    return FORMATS.get(fmt, ("", "application/octet-stream"))[1]
@@ -0,0 +1,194 @@
+# azcon_match/index.py
+# Per-master auxiliary structures built once at load: blocking keys for fast
+# candidate generation and the exact (canon, flag, unit) hash map.
+from __future__ import annotations
+
+import logging
+import weakref
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import config, numeric, vocab as vocab_mod
+
+if TYPE_CHECKING:
+    from .query import CompiledQuery
+
+logger = logging.getLogger(__name__)
+
+FLAGS = {"məhsul", "xidmət", "mix"}
+_EMPTY = np.empty(0, dtype=np.int32)
+
+# Blok açarları. "head" (ilk non-generic token) itkili ola bilər – yalnız
+# config.BLOCKING_HEAD ilə; qalanları matcher-in öz qaydalarına görə itkisizdir:
+#   material / flag / unit – matcher onsuz da bu filtrləri tətbiq edir
+#   term    – sətirdə sorğunun ən azı bir non-generic tokeni olmalıdır
+#   numeric – rəqəmləri uyğun gəlməyən sətirlər onsuz da atılır
+LOSSLESS = ("material", "flag", "unit", "term", "numeric")
+
+@dataclass
+class MasterIndex:
+    n_rows: int
+    vocab_version: Optional[str]
+    generic: FrozenSet[str]
+    blocks: Dict[str, Dict[Any, np.ndarray]] = field(default_factory=dict)
+    no_num: np.ndarray = field(default_factory=lambda: _EMPTY)
+    # canon → {(flag, unit): mövqelər}
+    exact: Dict[str, Dict[Tuple[str, str], np.ndarray]] = field(default_factory=dict)
+
+    # Oxuma interfeysi – shared_master.SharedIndex də eyni metodları verir (mmap üzərində).
+    def block(self, key: str, value: Any) -> np.ndarray:
+        return self.blocks[key].get(value, _EMPTY)
+
+    def postings(self, key: str, values: Iterable[Any]) -> np.ndarray:
+        parts = [p for p in (self.block(key, v) for v in values) if len(p)]
+        if not parts:
+            return _EMPTY
+        if len(parts) == 1:
+            return parts[0]
+        return np.unique(np.concatenate(parts))
+
+    def exact_items(self, canon: str) -> Iterable[Tuple[Tuple[str, str], np.ndarray]]:
+        return (self.exact.get(canon) or {}).items()
+
+    def entries(self) -> Iterator[Tuple[str, Any, np.ndarray]]:
+        """(blok, açar, mövqelər); exact açarı (canon, flag, unit), no_num açarı None."""
+        for block, table in self.blocks.items():
+            for k, pos in table.items():
+                yield block, k, pos
+        for can, by_fu in self.exact.items():
+            for (flag, unit), pos in by_fu.items():
+                yield "exact", (can, flag, unit), pos
+        yield "no_num", None, self.no_num
+
+    @property
+    def nbytes(self) -> int:
+        return sum(int(pos.nbytes) for _, _, pos in self.entries())
+
+# ---------------------------------------------------------
+# Qurmaq
+# ---------------------------------------------------------
+def _head(canon: str, generic: FrozenSet[str]) -> Optional[str]:
+    for t in canon.split():
+        if t not in generic:
+            return t
+    return None
+
+def build(master_df: pd.DataFrame, vocab: Optional[vocab_mod.CompiledVocab] = None) -> MasterIndex:
+    from .data_loader import normalize_flag, normalize_unit
+
+    v = vocab or vocab_mod.current()
+    acc: Dict[str, Dict[Any, List[int]]] = {k: defaultdict(list) for k in (*LOSSLESS, "head")}
+    no_num: List[int] = []
+    exact: Dict[str, Dict[Tuple[str, str], List[int]]] = defaultdict(lambda: defaultdict(list))
+
+    cols = master_df[[config.MASTER_TEXT_COL, config.MASTER_FLAG_COL, config.UNIT_COL, "material", "canon", "tokens"]]
+    for pos, (text, flag, unit, mat, can, toks) in enumerate(cols.itertuples(index=False, name=None)):
+        flag, unit = normalize_flag(flag), normalize_unit(unit)
+        acc["flag"][flag].append(pos)
+        acc["unit"][unit].append(pos)
+        if isinstance(can, str) and can:
+            exact[can][(flag, unit)].append(pos)
+        if isinstance(mat, str) and mat:
+            acc["material"][mat.lower()].append(pos)
+        for t in set(toks) - v.generic:
+            acc["term"][t].append(pos)
+        if isinstance(can, str) and (h := _head(can, v.generic)):
+            acc["head"][h].append(pos)
+        nums = numeric.extract(text if isinstance(text, str) else "")
+        if nums:
+            for n in set(nums):
+                acc["numeric"][n].append(pos)
+        else:
+            no_num.append(pos)
+
+    blocks = {
+        key: {k: np.asarray(p, dtype=np.int32) for k, p in table.items()}
+        for key, table in acc.items()
+    }
+    return MasterIndex(
+        n_rows=len(master_df),
+        vocab_version=v.version,
+        generic=v.generic,
+        blocks=blocks,
+        no_num=np.asarray(no_num, dtype=np.int32),
+        exact={
+            can: {fu: np.asarray(p, dtype=np.int32) for fu, p in by_fu.items()}
+            for can, by_fu in exact.items()
+        },
+    )
+
+# DataFrame hash-lanmır – id(df) ilə saxlayırıq, df silinəndə weakref.finalize təmizləyir.
+# (df.attrs-a qoymuruq: pandas attrs-ı hər filtrdə kopyalayır.)
+_INDEXES: Dict[int, MasterIndex] = {}
+
+def register(master_df: pd.DataFrame, idx: MasterIndex) -> MasterIndex:
+    """Hazır index-i frame-ə bağla (məs. shared_master faylından oxunmuş)."""
+    key = id(master_df)
+    if key not in _INDEXES:
+        weakref.finalize(master_df, _INDEXES.pop, key, None)
+    _INDEXES[key] = idx
+    return idx
+
+def attach(master_df: pd.DataFrame, vocab: Optional[vocab_mod.CompiledVocab] = None) -> MasterIndex:
+    return register(master_df, build(master_df, vocab))
+
+def get(master_df: pd.DataFrame, vocab: Optional[vocab_mod.CompiledVocab] = None) -> MasterIndex:
+    """Index for this exact frame; (re)built lazily if missing, resized or GENERIC changed."""
+    v = vocab or vocab_mod.current()
+    idx = _INDEXES.get(id(master_df))
+    if idx is None or idx.n_rows != len(master_df) or idx.generic != v.generic:
+        idx = attach(master_df, v)
+    return idx
+
+# ---------------------------------------------------------
+# Seçim
+# ---------------------------------------------------------
+def select(
+    master_df: pd.DataFrame,
+    cq: "CompiledQuery",
+    use_head: Optional[bool] = None,
+) -> Tuple[Optional[str], Optional[np.ndarray], Dict[str, int]]:
+    """
+    Tətbiq oluna bilən bloklardan ən seçicisini qaytarır: (ad, sıralanmış mövqelər, ölçülər).
+    Heç biri işə yaramırsa (ad=None) – fallback: bütün master.
+    """
+    idx = get(master_df, cq.vocab)
+    options: Dict[str, np.ndarray] = {}
+
+    if cq.flag in FLAGS:
+        options["flag"] = idx.block("flag", cq.flag)
+    if cq.unit:
+        options["unit"] = idx.block("unit", cq.unit)
+    if cq.material:
+        options["material"] = idx.block("material", cq.material)
+    options["term"] = idx.postings("term", cq.non_generic)
+    if cq.nums:
+        options["numeric"] = np.union1d(idx.postings("numeric", set(cq.nums)), idx.no_num)
+    if config.BLOCKING_HEAD if use_head is None else use_head:
+        h = _head(cq.canon, cq.vocab.generic)
+        if h:
+            options["head"] = idx.block("head", h)
+
+    sizes = {k: int(len(p)) for k, p in options.items()}
+    name = min(options, key=lambda k: sizes[k])
+    pos = options[name]
+    if len(pos) >= idx.n_rows * 0.9:
+        return None, None, sizes
+    return name, np.sort(pos), sizes
+
+def exact_positions(master_df: pd.DataFrame, cq: "CompiledQuery") -> np.ndarray:
+    """
+    canon-u sorğu ilə eyni olan sətirlər (flag/unit matcher-dəki kimi: boşdursa
+    filtr yoxdur). Hash lookup – master ölçüsündən asılı deyil.
+    """
+    parts = [
+        p for (flag, unit), p in get(master_df, cq.vocab).exact_items(cq.canon)
+        if (cq.flag not in FLAGS or flag == cq.flag) and (not cq.unit or unit == cq.unit)
+    ]
+    if not parts:
+        return _EMPTY
+    return np.sort(np.concatenate(parts)) if len(parts) > 1 else parts[0]
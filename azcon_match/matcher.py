@@ -1,43 +1,117 @@
 
-import statistics
+import logging, statistics, time
+from collections import Counter
 from typing import List, Tuple, Dict, Any
 import pandas as pd
 from rapidfuzz import fuzz
-from . import preprocessing as pp, numeric
+from . import config, preprocessing as pp, numeric, index as index_mod, metrics, confirmed, tokens as tokens_mod
+from .query import CompiledQuery, QueryLike, compile_query, ensure
+logger=logging.getLogger(__name__)
+STATS:Counter=Counter()  # process-wide: queries, exact / confirmed (fast-path answers)
 Match = Tuple[str,int,float,str]
 def _normalize_unit(u:str)->str:
     if not isinstance(u,str): return ""
     u=u.strip().lower()
     return {"m²":"m(2)","m2":"m(2)","m(2)":"m(2)","m":"m","metr":"m","pm":"m","əd":"ədəd","ed":"ədəd","eded":"ədəd","ədəd":"ədəd","ton":"ton"}.get(u,u)
-def score_row(q_tok:set,s_tok:set,q:str,s:str)->int:
+def score_row(q_tok:set,s_tok:set,q:str,s:str,critical:set|None=None)->int:
     score=fuzz.token_set_ratio(q,s)
-    if any((c in q_tok)^(c in s_tok) for c in pp.CRITICAL): score=int(score*0.80)
+    if any((c in q_tok)^(c in s_tok) for c in (pp.CRITICAL if critical is None else critical)): score=int(score*0.80)
     return score
-def find_matches(query_raw:str, query_flag:str, query_unit:str, master_df:pd.DataFrame)->Dict[str,Any]:
+def _filter(cand:pd.DataFrame, cq:CompiledQuery)->pd.DataFrame:
     from .data_loader import normalize_flag, normalize_unit
-    q_can=pp.canon(query_raw); q_tokens=set(q_can.split())
-    q_nums=numeric.extract(query_raw); has_qnum=bool(q_nums)
-    q_flag=normalize_flag(query_flag); q_unit=normalize_unit(query_unit)
     from .material_filter_cheapest import choose_cheapest_subset
-    cand=choose_cheapest_subset(q_can, master_df)
-    if q_flag in {"məhsul","xidmət","mix"}: cand=cand[cand["Tip"].map(normalize_flag)==q_flag]
-    if q_unit: cand=cand[cand["Ölçü vahidi"].map(normalize_unit)==q_unit]
-    hits:List[Match]=[]
-    for s_text,s_flag,price,unit,s_can,s_tokens in cand[["Malların (işlərin və xidmətlərin) adı","Tip","Qiyməti","Ölçü vahidi","canon","tokens"]].itertuples(index=False, name=None):
-        if not (q_tokens & (s_tokens - pp.GENERIC)): continue
-        if any(c in q_tokens and c not in s_tokens for c in pp.CRITICAL): continue
-        if pp.coverage(q_tokens,s_tokens) < 0.50: continue
+    cand=choose_cheapest_subset(cq.canon, cand, material=cq.material)
+    if cq.flag in {"məhsul","xidmət","mix"}: cand=cand[cand["Tip"].map(normalize_flag)==cq.flag]
+    if cq.unit: cand=cand[cand["Ölçü vahidi"].map(normalize_unit)==cq.unit]
+    return cand
+def _scan(cand:pd.DataFrame, cq:CompiledQuery)->Tuple[List[Match],list]:
+    """Returns (hits, master row ids of those hits)."""
+    # tokenlər sütunun formasında (set[str] və ya shared master-in int32 id-ləri) müqayisə olunur
+    space=tokens_mod.space(cand["tokens"])
+    q_tokens,q_ng,q_critical,CRITICAL=(space.ids(t) for t in (cq.tokens,cq.non_generic,cq.critical,cq.vocab.critical))
+    if len(q_critical)<len(cq.critical): return [],[]  # critical termin master-də heç yoxdur
+    q_can,q_nums,has_qnum,n_q=cq.canon,cq.nums,cq.has_num,max(1,len(cq.tokens))
+    min_cover,threshold=config.MIN_COVER,config.THRESHOLD
+    hits:List[Match]=[]; ids=[]
+    rows=cand[["Malların (işlərin və xidmətlərin) adı","Tip","Qiyməti","Ölçü vahidi","canon"]].itertuples(index=True, name=None)
+    for (rid,s_text,s_flag,price,unit,s_can),s_tokens in zip(rows,space.rows(cand["tokens"])):
+        if q_ng.isdisjoint(s_tokens): continue
+        if not q_critical<=s_tokens: continue  # sorğudakı critical terminlərin hamısı sətirdə olmalıdır
+        if len(q_tokens & s_tokens)/n_q < min_cover: continue  # pp.coverage, sorğunun bütün tokenlərinə görə
         penal=1.0
         if has_qnum:
             c_nums=numeric.extract(s_text)
             if c_nums and not any(q==c for q in q_nums for c in c_nums): continue
             if not c_nums: penal=0.80
-        score=int(score_row(q_tokens,s_tokens,q_can,s_can)*penal)
-        if score<80: continue
-        hits.append((s_text,score,price,unit))
-    priced=[(t,sc,pr,u) for (t,sc,pr,u) in hits if (sc>=8 and pd.notna(pr))]
+        score=int(score_row(q_tokens,s_tokens,q_can,s_can,CRITICAL)*penal)
+        if score<threshold: continue
+        hits.append((s_text,score,price,unit)); ids.append(rid)
+    return hits,ids
+def find_matches(query_raw:QueryLike, query_flag:str, query_unit:str, master_df:pd.DataFrame, blocking:bool|None=None)->Dict[str,Any]:
+    # str → bir dəfə kompilyasiya; hazır CompiledQuery olduğu kimi istifadə olunur
+    return find_compiled(ensure(query_raw,query_flag,query_unit), master_df, blocking=blocking)
+def find_compiled(cq:CompiledQuery, master_df:pd.DataFrame, blocking:bool|None=None)->Dict[str,Any]:
+    t0=time.perf_counter()
+    v=cq.vocab
+    stats={"vocab_version": v.version}
+    STATS["queries"]+=1
+    hits:List[Match]=[]; ids=[]
+    # təsdiqlənmiş matç: (kataloq, canon, flag, unit) üzrə bir indeksli lookup – cari qiymətlərlə, skor 100
+    if confirmed.active() and (c_ids:=confirmed.lookup(cq,master_df)):
+        rows=master_df.loc[c_ids,["Malların (işlərin və xidmətlərin) adı","Qiyməti","Ölçü vahidi"]]
+        for rid,(s_text,price,unit) in zip(c_ids,rows.itertuples(index=False, name=None)):
+            hits.append((s_text,100,price,unit)); ids.append(rid)
+        STATS["confirmed"]+=1; stats["fast_path"]="confirmed"
+    # exact fast path: canon+flag+unit master-də eynən varsa – hash lookup, skor 100
+    elif config.EXACT_FAST_PATH and cq.non_generic:
+        pos=index_mod.exact_positions(master_df,cq)
+        if len(pos):
+            cand=_filter(master_df.iloc[pos], cq)
+            for rid,s_text,price,unit in cand[["Malların (işlərin və xidmətlərin) adı","Qiyməti","Ölçü vahidi"]].itertuples(index=True, name=None):
+                hits.append((s_text,100,price,unit)); ids.append(rid)
+        if hits:
+            STATS["exact"]+=1; stats["fast_path"]="exact"
+        metrics.cache("exact", bool(hits))
+    if not hits or (config.EXACT_MODE=="merge" and stats.get("fast_path")!="confirmed"):
+        # blocking: master-in yalnız ən seçici blokunu skan et (yoxdursa – hamısını)
+        block,pos=None,None
+        if config.BLOCKING if blocking is None else blocking:
+            block,pos,stats["block_sizes"]=index_mod.select(master_df,cq)
+        cand=_filter(master_df if pos is None else master_df.iloc[pos], cq)
+        f_hits,f_ids=_scan(cand, cq)
+        seen=set(ids)
+        for h,rid in zip(f_hits,f_ids):
+            if rid not in seen: hits.append(h); ids.append(rid)
+        stats.update(block=block or "full", candidates=len(cand))
+        if block and config.BLOCKING_AUDIT:
+            # recall audit: eyni sorğunu bütün master üzərində yoxla, itənləri say
+            full,_=_scan(_filter(master_df, cq), cq)
+            key=lambda hs: Counter((t,sc,u) for t,sc,_,u in hs)  # price NaN != NaN – açara qatmırıq
+            missed=key(full)-key(f_hits)
+            stats["audit"]={"full_hits": len(full), "missed": sum(missed.values())}
+            if missed: logger.warning("blocking '%s' %d hit itirdi: %r", block, sum(missed.values()), cq.raw)
+    else:
+        stats.update(block=stats["fast_path"], candidates=len(hits))
+    priced_idx=[i for i,(t,sc,pr,u) in enumerate(hits) if (sc>=config.PRICE_AVG_MIN_SCORE and pd.notna(pr))]
+    priced=[hits[i] for i in priced_idx]; priced_ids=[ids[i] for i in priced_idx]
     prices=[pr for _,_,pr,_ in priced]
-    return {"raw": query_raw, "canonical": q_can, "unit": q_unit or "?", "hits": hits, "priced_hits": priced, "prices": prices}
+    m_ver=master_df.attrs.get("vocab_version")
+    if m_ver and m_ver!=v.version: stats["master_vocab_version"]=m_ver
+    metrics.QUERY_SECONDS.observe(time.perf_counter()-t0, path=stats["block"] if stats["block"] in ("confirmed","exact","full") else "blocked")
+    metrics.QUERY_CANDIDATES.observe(stats["candidates"])
+    return {"raw": cq.raw, "canonical": cq.canon, "unit": cq.unit or "?", "hits": hits, "hit_ids": ids, "priced_hits": priced, "priced_ids": priced_ids, "prices": prices, "vocab_version": v.version, "stats": stats}
+def audit_blocking(queries, master_df:pd.DataFrame)->Dict[str,Dict[str,int]]:
+    """Recall audit over (q_raw,q_flag,q_unit) rows: blocked vs full scan, grouped by chosen block."""
+    out:Dict[str,Dict[str,int]]={}
+    for q_raw,q_flag,q_unit in queries:
+        cq=compile_query(q_raw,q_flag,q_unit)
+        a=find_compiled(cq,master_df,blocking=True)
+        b=find_compiled(cq,master_df,blocking=False)
+        got=Counter((t,sc) for t,sc,_,_ in a["hits"]); want=Counter((t,sc) for t,sc,_,_ in b["hits"])
+        row=out.setdefault(a["stats"]["block"],{"queries":0,"full_hits":0,"missed":0,"candidates":0,"full_candidates":0})
+        row["queries"]+=1; row["full_hits"]+=sum(want.values()); row["missed"]+=sum((want-got).values())
+        row["candidates"]+=a["stats"]["candidates"]; row["full_candidates"]+=b["stats"]["candidates"]
+    return out
 def summarise(res:Dict[str,Any])->str:
     lines=[f"Query: {res['raw']}  (unit:{res['unit']})"]
     if res["prices"]:
@@ -46,7 +120,7 @@ def summarise(res:Dict[str,Any])->str:
         lines.append(f"   → Median: {med:.2f} ₼ / {u} | Mean: {avg:.2f} ₼ (n={len(res['prices'])})")
         for t,sc,pr,u in res["priced_hits"]: lines.append(f"      • {t} – {pr} ₼ / {u}  (score {sc})")
     else:
-        lines.append("   – no priced matches ≥ 8 –")
+        lines.append(f"   – no priced matches ≥ {config.PRICE_AVG_MIN_SCORE} –")
         for t,sc,pr,u in sorted(res["hits"], key=lambda x: x[1], reverse=True)[:5]:
             lines.append(f"      · {t} – {('—' if pd.isna(pr) else pr)} / {u}  (score {sc})")
     return "\n".join(lines)
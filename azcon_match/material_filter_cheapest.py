@@ -9,8 +9,9 @@
 import pandas as pd
 from .preprocessing import extract_material
 
-def choose_cheapest_subset(query_canon: str, cand_df: pd.DataFrame) -> pd.DataFrame:
-    q_mat = extract_material(query_canon)
+def choose_cheapest_subset(query_canon: str, cand_df: pd.DataFrame, material: str | None = None) -> pd.DataFrame:
+    # material: already extracted from query_canon (CompiledQuery.material)
+    q_mat = material if material is not None else extract_material(query_canon)
     if not q_mat:
         return cand_df  # No prune if no material in query
 
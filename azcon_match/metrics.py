@@ -0,0 +1,350 @@
+# azcon_match/metrics.py
+# Prometheus text formatında metriklər. Yazma yolu kilidsizdir: hər thread öz
+# "shard"-ına yazır (yalnız o thread dəyişir), scrape zamanı shard-lar toplanır.
+#
+# Çox prosesli deploy (gunicorn -w N): configure_multiprocess(dir) ilə hər proses
+# öz snapshot-ını dir/<pid>-<start>.json faylına yazır (interval saniyədə bir və
+# scrape zamanı), /metrics-i cavablayan worker bütün faylları toplayır. Counter və
+# histogram-lar cəmlənir (ölmüş proseslərinki də – counter geri düşmür), gauge-lər
+# yalnız canlı proseslərdən, `pid` label-i ilə. Qovluq deploy başlayanda təmizlənməlidir.
+from __future__ import annotations
+
+import atexit
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (0, 1, 10, 100, 1000, 5000, 10000, 50000, 100000, 500000)
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class _Shard:
+    __slots__ = ("counters", "hists", "gauges")
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+        # (name, labels) → [bucket counts..., +Inf count, sum]
+        self.hists: Dict[Tuple[str, LabelKey], List[float]] = {}
+        # yalnız snapshot-da doldurulur (set() dəyərləri + set_function callback-ları)
+        self.gauges: Dict[Tuple[str, LabelKey], float] = {}
+
+class Registry:
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()          # yalnız shard qeydiyyatı və scrape üçün
+        self._shards: List[_Shard] = []
+        self._retired = _Shard()               # ölmüş thread-lərin dəyərləri bura köçür
+        self._metrics: Dict[str, "_Metric"] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        self._mp_dir: Optional[Path] = None
+        self._mp_interval = 5.0
+        self._mp_file: Optional[Path] = None     # bu prosesin faylı (fork-dan sonra yenisi)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    # -- shard-lar ---------------------------------------------------------
+    def _shard(self) -> _Shard:
+        s = getattr(self._local, "shard", None)
+        if s is None:
+            self._ensure_writer()
+            s = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(s)
+            # runserver hər sorğu üçün thread açır – thread ölüb gedəndə shard-ı birləşdir
+            weakref.finalize(threading.current_thread(), self._retire, s)
+        return s
+
+    def _retire(self, s: _Shard) -> None:
+        with self._lock:
+            if s in self._shards:
+                self._shards.remove(s)
+            _merge(self._retired, s)
+
+    def register(self, metric: "_Metric") -> "_Metric":
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _after_fork(self) -> None:
+        # gunicorn --preload: uşaq proses valideynin dəyərlərini təkrar saymasın
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards, self._retired = [], _Shard()
+        self._gauges = {}
+        self._mp_file = None
+
+    # -- scrape ------------------------------------------------------------
+    def local_snapshot(self) -> _Shard:
+        """Yalnız bu prosesin dəyərləri (gauge-lər daxil)."""
+        total = _Shard()
+        with self._lock:
+            shards = [self._retired, *self._shards]
+            for s in shards:
+                _merge(total, s)
+        total.gauges.update(self._gauges.copy())
+        for m in list(self._metrics.values()):
+            if isinstance(m, Gauge):
+                for key, fn in list(m._functions.items()):
+                    try:
+                        total.gauges[(m.name, key)] = float(fn())
+                    except Exception:
+                        continue
+        return total
+
+    def snapshot(self) -> _Shard:
+        if self._mp_dir is None:
+            return self.local_snapshot()
+        self._write()
+        return _collect(self._mp_dir)
+
+    def render(self) -> str:
+        snap = self.snapshot()
+        lines: List[str] = []
+        for m in self._metrics.values():
+            lines.extend(m.render(self, snap))
+        return "\n".join(lines) + "\n"
+
+    # -- multiprocess ------------------------------------------------------
+    def configure_multiprocess(self, directory: Optional[str | Path], interval: float = 5.0) -> None:
+        """directory=None – yalnız prosesdaxili (default)."""
+        self._mp_dir = Path(directory) if directory else None
+        self._mp_interval = interval
+        if self._mp_dir is not None:
+            self._mp_dir.mkdir(parents=True, exist_ok=True)
+            self._ensure_writer()
+
+    def _ensure_writer(self) -> None:
+        if self._mp_dir is None or self._mp_file is not None:
+            return
+        with self._lock:
+            if self._mp_file is not None:
+                return
+            self._mp_file = self._mp_dir / f"{os.getpid()}-{time.time_ns()}.json"
+        threading.Thread(target=self._write_loop, args=(self._mp_file,), name="azcon-metrics", daemon=True).start()
+        atexit.register(self._write)
+
+    def _write_loop(self, path: Path) -> None:
+        while self._mp_file == path:  # fork-dan sonra köhnə thread-in davamı yoxdur, amma ehtiyat
+            time.sleep(self._mp_interval)
+            self._write()
+
+    def _write(self) -> None:
+        self._ensure_writer()
+        path = self._mp_file
+        if path is None or not path.parent.is_dir():  # qovluq silinib (məs. restart təmizliyi)
+            return
+        snap = self.local_snapshot()
+        data = {
+            "pid": os.getpid(),
+            "counters": [[n, k, v] for (n, k), v in snap.counters.items()],
+            "hists": [[n, k, row] for (n, k), row in snap.hists.items()],
+            "gauges": [[n, k, v] for (n, k), v in snap.gauges.items()],
+        }
+        tmp = path.with_name(f".{path.name}.tmp")
+        try:
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("metrik faylı yazılmadı (%s): %s", path, e)
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _collect(directory: Path) -> _Shard:
+    """Bütün proses fayllarını topla: counter/histogram cəmi, canlı proseslərin gauge-ləri (pid label-i ilə)."""
+    total = _Shard()
+    for path in sorted(directory.glob("*.json")):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue  # yarımçıq/silinmiş fayl – növbəti scrape-də
+        part = _Shard()
+        part.counters = {(n, tuple(map(tuple, k))): v for n, k, v in data.get("counters", ())}
+        part.hists = {(n, tuple(map(tuple, k))): row for n, k, row in data.get("hists", ())}
+        _merge(total, part)
+        pid = data.get("pid")
+        if pid and _alive(pid):
+            for n, k, v in data.get("gauges", ()):
+                total.gauges[(n, (*map(tuple, k), ("pid", str(pid))))] = v
+    return total
+
+def _merge(dst: _Shard, src: _Shard) -> None:
+    for k, v in src.counters.copy().items():
+        dst.counters[k] = dst.counters.get(k, 0.0) + v
+    for k, v in src.hists.copy().items():
+        cur = dst.hists.get(k)
+        v = list(v)
+        if cur is None:
+            dst.hists[k] = v
+        else:
+            for i, x in enumerate(v):
+                cur[i] += x
+
+def _fmt_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    items = [*key, *extra]
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+def _fmt_num(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+# ---------------------------------------------------------
+# Metrik tipləri
+# ---------------------------------------------------------
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, registry: "Registry"):
+        self.name, self.help, self.registry = name, help, registry
+        registry.register(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        c = self.registry._shard().counters
+        k = (self.name, _key(labels))
+        c[k] = c.get(k, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self.registry.snapshot().counters.get((self.name, _key(labels)), 0.0)
+
+    def render(self, reg: Registry, snap: _Shard) -> List[str]:
+        out = self._header()
+        for (name, key), v in sorted(snap.counters.items()):
+            if name == self.name:
+                out.append(f"{self.name}{_fmt_labels(key)} {_fmt_num(v)}")
+        return out
+
+class Gauge(_Metric):
+    """Son dəyər (set) və ya scrape zamanı çağırılan callback (set_function)."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, registry: "Registry"):
+        super().__init__(name, help, registry)
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self.registry._gauges[(self.name, _key(labels))] = float(value)  # tək dict mənimsətməsi – atomik
+
+    def set_function(self, fn: Callable[[], float], **labels) -> None:
+        self._functions[_key(labels)] = fn
+
+    def render(self, reg: Registry, snap: _Shard) -> List[str]:
+        out = self._header()
+        for (name, key), v in sorted(snap.gauges.items()):
+            if name == self.name:
+                out.append(f"{self.name}{_fmt_labels(key)} {_fmt_num(v)}")
+        return out
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, registry: "Registry", buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        h = self.registry._shard().hists
+        k = (self.name, _key(labels))
+        row = h.get(k)
+        if row is None:
+            row = h[k] = [0.0] * (len(self.buckets) + 2)
+        row[bisect.bisect_left(self.buckets, value)] += 1   # son bucket = +Inf
+        row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self, reg: Registry, snap: _Shard) -> List[str]:
+        out = self._header()
+        for (name, key), row in sorted(snap.hists.items()):
+            if name != self.name:
+                continue
+            cum = 0.0
+            for le, n in zip((*self.buckets, math.inf), row[:-1]):
+                cum += n
+                out.append(f"{self.name}_bucket{_fmt_labels(key, [('le', _fmt_num(le))])} {_fmt_num(cum)}")
+            out.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_num(row[-1])}")
+            out.append(f"{self.name}_count{_fmt_labels(key)} {_fmt_num(cum)}")
+        return out
+
+class _CacheRatio(_Metric):
+    """azcon_cache_requests_total-dan hesablanan hit nisbəti (scrape zamanı)."""
+    kind = "gauge"
+
+    def render(self, reg: Registry, snap: _Shard) -> List[str]:
+        per: Dict[str, List[float]] = {}
+        for (name, key), v in snap.counters.items():
+            if name != CACHE_REQUESTS.name:
+                continue
+            d = dict(key)
+            hm = per.setdefault(d.get("cache", ""), [0.0, 0.0])
+            hm[0 if d.get("result") == "hit" else 1] += v
+        out = self._header()
+        for cache, (hit, miss) in sorted(per.items()):
+            if hit + miss:
+                out.append(f"{self.name}{_fmt_labels((('cache', cache),))} {_fmt_num(hit / (hit + miss))}")
+        return out
+
+# ---------------------------------------------------------
+# Layihənin metrikləri
+# ---------------------------------------------------------
+REGISTRY = Registry()
+
+MASTER_LOAD_SECONDS = Histogram("azcon_master_load_seconds", "Master load + preprocess duration", REGISTRY,
+                                buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+MASTER_ROWS = Gauge("azcon_master_rows", "Rows in the most recently loaded master", REGISTRY)
+QUERY_SECONDS = Histogram("azcon_query_seconds", "find_matches latency per query", REGISTRY)
+QUERY_CANDIDATES = Histogram("azcon_query_candidates", "Master rows scanned per query", REGISTRY, buckets=SIZE_BUCKETS)
+UPLOAD_ROWS = Counter("azcon_upload_rows_total", "Query rows processed by uploads", REGISTRY)
+UPLOAD_SECONDS = Histogram("azcon_upload_seconds", "Matching time per upload", REGISTRY,
+                           buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+UPLOAD_ROWS_PER_SECOND = Gauge("azcon_upload_rows_per_second", "Throughput of the most recent upload", REGISTRY)
+CACHE_REQUESTS = Counter("azcon_cache_requests_total", "Cache lookups by cache and result (hit/miss)", REGISTRY)
+CACHE_HIT_RATIO = _CacheRatio("azcon_cache_hit_ratio", "Hit ratio per cache since process start", REGISTRY)
+CATALOGS_LOADED = Gauge("azcon_catalogs_loaded", "Master catalogues currently resident", REGISTRY)
+CATALOG_BYTES = Gauge("azcon_catalog_bytes", "Estimated memory of resident catalogues", REGISTRY)
+ACTIVE_JOBS = Gauge("azcon_active_jobs", "Jobs currently running per executor lane", REGISTRY)
+MATCHER_ERRORS = Counter("azcon_matcher_errors_total", "Matcher errors by exception type", REGISTRY)
+
+def cache(name: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=name, result="hit" if hit else "miss")
+
+def render() -> str:
+    return REGISTRY.render()
+
+def configure_multiprocess(directory: Optional[str | Path], interval: float = 5.0) -> None:
+    REGISTRY.configure_multiprocess(directory, interval)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -1,30 +1,49 @@
 
-import json, pathlib, re
+import pathlib, re
+from functools import lru_cache
 from typing import Set
-import advertools as adv
-import pandas as pd
 TRANSLIT = str.maketrans("ğiçşöüə", "gıcsoue")
-STOP_AZ  = adv.stopwords["azerbaijani"]
 SUFFIXES = ["lanması","lənməsi","lanma","lənmə","nması","nməsi","ması","məsi","ların","lərin","ları","ləri","lar","lər"]; SUFFIXES.sort(key=len, reverse=True)
 def _base_norm(tok:str)->str:
     tok=tok.lower().translate(TRANSLIT)
     for suf in SUFFIXES:
         if tok.endswith(suf): tok=tok[:-len(suf)]; break
     return tok
-VOCAB_PATH = pathlib.Path(__file__).with_name("vocab.json"); _v=json.load(open(VOCAB_PATH,encoding="utf-8"))
-SYN={_base_norm(k):_base_norm(v) for k,v in _v.get("synonyms",{}).items()}
-SYN.update({k.translate(TRANSLIT):v.translate(TRANSLIT) for k,v in list(SYN.items()) if k.translate(TRANSLIT)!=k})
-GENERIC:set[str] = {_base_norm(t) for t in _v.get("generic",[])}
-CRITICAL:set[str]= {_base_norm(t) for t in _v.get("critical",[])}
-_PHRASE_SYN={k:v for k,v in SYN.items() if " " in k}
-def norm_token(tok:str)->str: 
-    base=_base_norm(tok); return SYN.get(base,base)
-def canon(text:str)->str:
+# Vendored copy of advertools' ``stopwords["azerbaijani"]`` (0.17.0): importing
+# advertools pulls in Scrapy/Twisted just for this list.
+STOPWORDS_PATH = pathlib.Path(__file__).with_name("stopwords_az.txt")
+
+@lru_cache(maxsize=None)
+def _stopwords()->frozenset:
+    with open(STOPWORDS_PATH,encoding="utf-8") as f:
+        return frozenset(w.strip() for w in f if w.strip())
+
+def _vocab():
+    """Current compiled vocabulary (see vocab.py); parsed on first use."""
+    from .vocab import current
+    return current()
+
+_ATTR_MAP = {"SYN": "syn", "GENERIC": "generic", "CRITICAL": "critical", "_PHRASE_SYN": "phrase_syn"}
+
+def __getattr__(name:str):
+    # SYN / GENERIC / CRITICAL / _PHRASE_SYN / STOP_AZ stay importable as module
+    # attributes; they always reflect the *current* vocab snapshot.
+    if name=="STOP_AZ": return _stopwords()
+    if name=="VOCAB_PATH":
+        from .vocab import VOCAB_PATH; return VOCAB_PATH
+    if name=="_PHRASE_SYN": return dict(_vocab().phrase_syn)
+    if name in _ATTR_MAP: return getattr(_vocab(),_ATTR_MAP[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def norm_token(tok:str,vocab=None)->str:
+    base=_base_norm(tok); return (vocab or _vocab()).syn.get(base,base)
+def canon(text:str,vocab=None)->str:
     if not isinstance(text,str): return ""
+    v=vocab or _vocab(); stop=_stopwords()
     lowered=text.lower().translate(TRANSLIT)
-    for p,r in _PHRASE_SYN.items(): lowered=lowered.replace(p,r)
+    for p,r in v.phrase_syn: lowered=lowered.replace(p,r)
     cleaned=re.sub(r"[^\w\s]"," ",lowered)
-    tokens=[norm_token(t) for t in cleaned.split() if t not in STOP_AZ]
+    tokens=[norm_token(t,v) for t in cleaned.split() if t not in stop]
     return " ".join(tokens)
 MATERIAL_REGEX=re.compile(r"\b(pvc|mdf|şüşə|suse|alüminium|aluminum|taxta|laminat|beton|daş|polikarbonat)\b",re.I)
 def extract_material(text:str)->str|None:
@@ -39,11 +58,11 @@ def is_generic_only(text: str) -> bool:
     if not isinstance(text, str) or not text.strip():
         return True
     toks = set(canon(text).split())
-    return len(toks - GENERIC) == 0
+    return len(toks - _vocab().generic) == 0
 
 def non_generic_tokens(text: str) -> set[str]:
     """
     Convenience helper: the set of discriminative tokens in the query.
     """
     toks = set(canon(text).split())
-    return toks - GENERIC
+    return toks - _vocab().generic
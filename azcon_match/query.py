@@ -0,0 +1,63 @@
+# azcon_match/query.py
+# Sorğunu bir dəfə kompilyasiya et: matcher, index və diagnostics eyni obyektdən istifadə edir.
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import FrozenSet, Optional, Tuple, Union
+
+from . import numeric, preprocessing as pp, vocab as vocab_mod
+
+# ---------------------------------------------------------
+# CompiledQuery
+# ---------------------------------------------------------
+@dataclass(frozen=True)
+class CompiledQuery:
+    raw: str
+    canon: str
+    tokens: FrozenSet[str]
+    non_generic: FrozenSet[str]
+    critical: FrozenSet[str]          # sorğudakı critical terminlər (matcher bunları sətirdə tələb edir)
+    nums: Tuple[Tuple[float, str], ...]
+    material: Optional[str]
+    flag: str
+    unit: str
+    vocab: vocab_mod.CompiledVocab = field(compare=False, repr=False)
+
+    @property
+    def has_num(self) -> bool:
+        return bool(self.nums)
+
+    @property
+    def vocab_version(self) -> str:
+        return self.vocab.version
+
+def compile_query(
+    q_raw: str,
+    q_flag: str = "",
+    q_unit: str = "",
+    vocab: Optional[vocab_mod.CompiledVocab] = None,
+) -> CompiledQuery:
+    from .data_loader import normalize_flag, normalize_unit
+
+    v = vocab or vocab_mod.current()
+    raw = q_raw if isinstance(q_raw, str) else ""
+    can = pp.canon(raw, vocab=v)
+    toks = frozenset(can.split())
+    return CompiledQuery(
+        raw=raw,
+        canon=can,
+        tokens=toks,
+        non_generic=toks - v.generic,
+        critical=toks & v.critical,
+        nums=tuple(numeric.extract(raw)),
+        material=pp.extract_material(can),
+        flag=normalize_flag(q_flag),
+        unit=normalize_unit(q_unit),
+        vocab=v,
+    )
+
+QueryLike = Union[str, CompiledQuery]
+
+def ensure(q: QueryLike, q_flag: str = "", q_unit: str = "") -> CompiledQuery:
+    """CompiledQuery-ni olduğu kimi qaytarır, str-i kompilyasiya edir."""
+    return q if isinstance(q, CompiledQuery) else compile_query(q, q_flag, q_unit)
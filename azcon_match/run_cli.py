@@ -15,6 +15,7 @@ def main():
         print(f"   [time {time.time() - t_q:.2f}s]\n")
 
     print(f"Total run: {time.time() - t_start:.2f}s")
+    print(f"Exact fast path: {matcher.STATS['exact']}/{matcher.STATS['queries']} queries")
 
 if __name__ == "__main__":
     main()
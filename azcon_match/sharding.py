@@ -0,0 +1,454 @@
+# azcon_match/sharding.py
+# Sharded scatter-gather: master N hissəyə bölünür, hər shard öz hissəsində
+# matç edir, coordinator nəticələri birləşdirir (api._normalize_result formatında).
+#
+# Protokol (TCP): hər mesaj = 4 bayt big-endian uzunluq + UTF-8 JSON.
+#   sorğu:  {"q": str, "flag": str, "unit": str, "top": int|null}
+#   cavab:  {"shard": str, "hits": [[text, score, price, unit, row_id], ...],
+#            "stats": {...}, "vocab_version": str}  və ya  {"error": str}
+#   kimlik (nəticə keşinin açarı üçün):
+#           {"op": "info"}
+#   cavab:  {"shard": str, "rows": int, "part": [i, n], "vocab_version": str, "source": {...}}
+#   sətirlər (təsdiqlənmiş matçlar üçün):
+#           {"op": "rows", "ids": [row_id, ...]}
+#   cavab:  {"shard": str, "rows": [[row_id, text, flag, price, unit], ...]}  – yalnız bu shard-dakılar
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import queue
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from . import config, index as master_index, metrics
+
+logger = logging.getLogger(__name__)
+
+_LEN = struct.Struct(">I")
+MAX_MESSAGE = 64 << 20
+
+# ---------------------------------------------------------
+# Bölmə
+# ---------------------------------------------------------
+def partition(master_df: pd.DataFrame, n: int, deep: bool = False) -> List[pd.DataFrame]:
+    """
+    Ardıcıl (contiguous) hissələr: sətir id-ləri (index) saxlanılır, shard-ların
+    nəticələrini sıra ilə birləşdirmək tək prosesli skanla eyni sıranı verir.
+    deep=True – hissə öz yaddaşına kopyalanır (ayrı shard prosesi bütün master-i saxlamasın).
+    """
+    n = max(1, min(int(n), len(master_df) or 1))
+    bounds = [round(i * len(master_df) / n) for i in range(n + 1)]
+    parts = []
+    for a, b in zip(bounds, bounds[1:]):
+        part = master_df.iloc[a:b].copy(deep=deep)
+        part.attrs = {**master_df.attrs, "shard": (len(parts), n)}
+        master_index.attach(part)
+        parts.append(part)
+    return parts
+
+def _clean(x):
+    if x is None:
+        return None
+    try:
+        if pd.isna(x):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return x.item() if hasattr(x, "item") else x
+
+def match_local(master_df: pd.DataFrame, payload: Dict[str, Any], shard_id: str = "0") -> Dict[str, Any]:
+    """Bir shard-ın cavabı: lokal top hit-lər (score-a görə azalan, top=None → hamısı, master sırası ilə)."""
+    from .matcher import find_matches
+
+    t0 = time.perf_counter()
+    res = find_matches(payload.get("q") or "", payload.get("flag") or "", payload.get("unit") or "", master_df)
+    rows = [
+        [t, int(sc), _clean(pr), _clean(u), _clean(rid)]
+        for (t, sc, pr, u), rid in zip(res["hits"], res["hit_ids"])
+    ]
+    top = payload.get("top")
+    if top:
+        rows = sorted(rows, key=lambda r: -r[1])[: int(top)]
+    stats = {k: v for k, v in res["stats"].items() if k in ("block", "candidates", "fast_path")}
+    stats.update(rows=len(master_df), ms=round((time.perf_counter() - t0) * 1000, 2))
+    return {
+        "shard": shard_id,
+        "canonical": res["canonical"],
+        "unit": res["unit"],
+        "hits": rows,
+        "stats": stats,
+        "vocab_version": res.get("vocab_version"),
+    }
+
+def rows_local(master_df: pd.DataFrame, ids: Sequence[int], shard_id: str = "0") -> Dict[str, Any]:
+    """Bu shard-da olan id-lərin sətirləri (mətn, tip, qiymət, vahid)."""
+    have = master_df.index.intersection(pd.Index([int(i) for i in ids]))
+    cols = [config.MASTER_TEXT_COL, config.MASTER_FLAG_COL, config.PRICE_COL, config.UNIT_COL]
+    rows = [[_clean(rid), *(_clean(x) for x in vals)] for rid, *vals in master_df.loc[have, cols].itertuples(index=True, name=None)]
+    return {"shard": shard_id, "rows": rows}
+
+def info_local(master_df: pd.DataFrame, shard_id: str = "0") -> Dict[str, Any]:
+    """Shard-ın master kimliyi: mənbə faylı (yol, mtime, ölçü), hissə, vocab versiyası."""
+    attrs = master_df.attrs
+    return {
+        "shard": shard_id,
+        "rows": len(master_df),
+        "part": list(attrs.get("shard") or ()),
+        "vocab_version": attrs.get("vocab_version"),
+        "source": attrs.get("source"),
+    }
+
+def handle(master_df: pd.DataFrame, payload: Dict[str, Any], shard_id: str = "0") -> Dict[str, Any]:
+    op = payload.get("op")
+    if op == "rows":
+        return rows_local(master_df, payload.get("ids") or (), shard_id)
+    if op == "info":
+        return info_local(master_df, shard_id)
+    return match_local(master_df, payload, shard_id)
+
+# ---------------------------------------------------------
+# Shard-lar (eyni interfeys: .name, .match(payload, timeout))
+# ---------------------------------------------------------
+class LocalShard:
+    """Prosesdaxili shard – test və tək maşında thread-lərlə paralel skan üçün."""
+
+    def __init__(self, master_df: pd.DataFrame, name: str):
+        self.df, self.name = master_df, name
+
+    def match(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        return handle(self.df, payload, self.name)
+
+    def close(self) -> None:
+        pass
+
+def _send(sock: socket.socket, obj: Any) -> None:
+    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_LEN.pack(len(data)) + data)
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("shard bağlantısı kəsildi")
+        buf.extend(chunk)
+    return bytes(buf)
+
+def _recv(sock: socket.socket) -> Any:
+    (n,) = _LEN.unpack(_recv_exact(sock, _LEN.size))
+    if n > MAX_MESSAGE:
+        raise ValueError(f"mesaj çox böyükdür: {n}")
+    return json.loads(_recv_exact(sock, n).decode("utf-8"))
+
+class RemoteShard:
+    """TCP shard klienti; boş bağlantılar kiçik pool-da təkrar istifadə olunur."""
+
+    def __init__(self, host: str, port: int, name: Optional[str] = None, pool_size: int = 8):
+        self.host, self.port = host, int(port)
+        self.name = name or f"{host}:{port}"
+        self._idle: "queue.LifoQueue[socket.socket]" = queue.LifoQueue(maxsize=pool_size)
+
+    def _conn(self, timeout: Optional[float]) -> socket.socket:
+        try:
+            sock = self._idle.get_nowait()
+        except queue.Empty:
+            sock = socket.create_connection((self.host, self.port), timeout=timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(timeout)
+        return sock
+
+    def match(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        sock = self._conn(timeout)
+        try:
+            _send(sock, payload)
+            resp = _recv(sock)
+        except BaseException:
+            sock.close()  # yarımçıq cavab – bağlantını təkrar istifadə etmirik
+            raise
+        try:
+            self._idle.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+        if "error" in resp:
+            raise RuntimeError(f"shard {self.name}: {resp['error']}")
+        return resp
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+# ---------------------------------------------------------
+# Shard server
+# ---------------------------------------------------------
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        while True:
+            try:
+                payload = _recv(sock)
+            except (ConnectionError, OSError):
+                return
+            try:
+                resp = handle(self.server.master_df, payload, self.server.shard_name)
+            except Exception as e:
+                logger.exception("shard %s xətası", self.server.shard_name)
+                resp = {"error": f"{type(e).__name__}: {e}"}
+            _send(sock, resp)
+
+class ShardServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, master_df: pd.DataFrame, host: str = "127.0.0.1", port: int = 0, name: str = "0"):
+        self.master_df, self.shard_name = master_df, name
+        super().__init__((host, port), _Handler)
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+def spawn_local(master_path: str, n: int, host: str = "127.0.0.1") -> List[tuple]:
+    """
+    N lokal shard prosesi işə salır; [(Popen, RemoteShard), ...] qaytarır.
+    Hər proses master-i oxuyur, öz hissəsini saxlayır, portunu stdout-a yazır.
+    """
+    procs = []
+    for i in range(n):
+        p = subprocess.Popen(
+            [sys.executable, "-m", "azcon_match.sharding", "serve",
+             "--master", str(master_path), "--shards", str(n), "--index", str(i), "--host", host, "--port", "0"],
+            stdout=subprocess.PIPE, text=True,
+        )
+        procs.append(p)
+    out = []
+    for i, p in enumerate(procs):
+        line = p.stdout.readline()  # "READY <port>"
+        if not line.startswith("READY"):
+            for q in procs:
+                q.kill()
+            raise RuntimeError(f"shard {i} başlamadı: {line!r}")
+        out.append((p, RemoteShard(host, int(line.split()[1]), name=f"shard{i}")))
+    return out
+
+# ---------------------------------------------------------
+# Coordinator
+# ---------------------------------------------------------
+class ShardUnavailable(RuntimeError):
+    """Bütün shard-lardan cavab alınmadı (sətir sorğusu qismən nəticə ilə işləyə bilməz)."""
+
+class Coordinator:
+    """
+    Sorğunu bütün shard-lara paralel göndərir, `timeout` saniyə gözləyir və
+    cavab verənlərin hit-lərini birləşdirir. Gecikən/xətalı shard nəticəni
+    dayandırmır: stats["partial"]=True və stats["shards"]-da statusu yazılır.
+
+    Təsdiqlənmiş matçlar scatter-dən əvvəl burada həll olunur (shard-lar id-lərin
+    yalnız bir hissəsini görür): sətirlər rows() ilə shard-lardan yığılır.
+
+    api.find_matches master_df yerinə Coordinator qəbul edir (is_sharded).
+    """
+
+    is_sharded = True
+
+    def __init__(self, shards: Sequence, timeout: float = 5.0, top: Optional[int] = None, catalog: str = ""):
+        self.shards = list(shards)
+        self.timeout = timeout
+        self.top = top
+        self.attrs: Dict[str, Any] = {"catalog": catalog}  # confirmed.catalog_of üçün (DataFrame.attrs kimi)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.shards)) * 4, thread_name_prefix="azcon-shard")
+
+    def _gather(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Bütün shard-ların cavabı (shard sırası ilə); biri cavab vermirsə ShardUnavailable."""
+        futs = [self._pool.submit(s.match, payload, self.timeout) for s in self.shards]
+        done, _ = wait(futs, timeout=self.timeout)
+        out = []
+        for fut, shard in zip(futs, self.shards):
+            if fut not in done or fut.exception() is not None:
+                fut.cancel()
+                raise ShardUnavailable(f"shard {shard.name}: {'timeout' if fut not in done else fut.exception()}")
+            out.append(fut.result())
+        return out
+
+    def identity(self) -> List[Dict[str, Any]]:
+        """Hər shard-ın master kimliyi (info_local) – shard master-i yenidən yüklənəndə dəyişir."""
+        return self._gather({"op": "info"})
+
+    def rows(self, ids: Sequence[int]) -> pd.DataFrame:
+        """
+        id-lərin master sətirləri (index = row id, sütunlar master-dəki kimi), id sırası ilə;
+        olmayan id-lər nəticədə yoxdur. Hər hansı shard cavab vermirsə ShardUnavailable –
+        natamam sətirlərlə təsdiqi "dəyişib" kimi etibarsız saymaq olmaz.
+        """
+        ids = [int(i) for i in ids]
+        got: Dict[int, list] = {}
+        for reply in self._gather({"op": "rows", "ids": ids}):
+            for rid, *vals in reply["rows"]:
+                got[int(rid)] = vals
+        cols = [config.MASTER_TEXT_COL, config.MASTER_FLAG_COL, config.PRICE_COL, config.UNIT_COL]
+        present = [i for i in ids if i in got]
+        return pd.DataFrame([got[i] for i in present], index=pd.Index(present, dtype="int64"), columns=cols)
+
+    def _confirmed(self, cq, t0: float) -> Optional[Dict[str, Any]]:
+        from . import confirmed
+
+        if not confirmed.active():
+            return None
+        ids = confirmed.lookup(cq, self)
+        if not ids:
+            return None
+        try:
+            rows = self.rows(ids)
+        except ShardUnavailable as e:
+            logger.warning("təsdiqlənmiş sətirlər alınmadı, scatter ilə davam: %s", e)
+            return None
+        if len(rows) != len(ids):
+            return None
+        hits = [(t, 100, math.nan if pr is None else pr, u) for t, _, pr, u in rows.itertuples(index=False, name=None)]
+        priced_idx = [i for i, (_, sc, pr, _) in enumerate(hits) if sc >= config.PRICE_AVG_MIN_SCORE and pr == pr]
+        priced = [hits[i] for i in priced_idx]
+        stats = {"vocab_version": cq.vocab_version, "block": "confirmed", "fast_path": "confirmed",
+                 "candidates": len(hits), "shards": [], "partial": False,
+                 "ms": round((time.perf_counter() - t0) * 1000, 2)}
+        metrics.QUERY_SECONDS.observe(time.perf_counter() - t0, path="confirmed")
+        return {
+            "raw": cq.raw, "canonical": cq.canon, "unit": cq.unit or "?",
+            "hits": hits, "hit_ids": list(rows.index),
+            "priced_hits": priced, "priced_ids": [int(rows.index[i]) for i in priced_idx],
+            "prices": [pr for _, _, pr, _ in priced],
+            "vocab_version": cq.vocab_version, "stats": stats,
+        }
+
+    def find_matches(self, q_raw, q_flag: str = "", q_unit: str = "") -> Dict[str, Any]:
+        from .query import ensure
+
+        t0 = time.perf_counter()
+        cq = ensure(q_raw, q_flag, q_unit)
+        if (res := self._confirmed(cq, t0)) is not None:
+            return res
+        raw = getattr(q_raw, "raw", q_raw)  # CompiledQuery də qəbul olunur
+        payload = {"q": raw if isinstance(raw, str) else "", "flag": q_flag, "unit": q_unit, "top": self.top}
+        futs = {self._pool.submit(s.match, payload, self.timeout): s for s in self.shards}
+        done, _ = wait(futs, timeout=self.timeout)
+
+        replies: List[Optional[Dict[str, Any]]] = []
+        shard_stats: List[Dict[str, Any]] = []
+        for fut, shard in futs.items():
+            st: Dict[str, Any] = {"shard": shard.name}
+            if fut not in done:
+                fut.cancel()
+                st["status"] = "timeout"
+                replies.append(None)
+                metrics.MATCHER_ERRORS.inc(type="ShardTimeout")
+            elif fut.exception() is not None:
+                st.update(status="error", error=f"{type(fut.exception()).__name__}: {fut.exception()}")
+                replies.append(None)
+                metrics.MATCHER_ERRORS.inc(type=type(fut.exception()).__name__)
+            else:
+                r = fut.result()
+                st.update(status="ok", hits=len(r["hits"]), **r.get("stats", {}))
+                replies.append(r)
+            shard_stats.append(st)
+        return self._merge(q_raw, replies, shard_stats, t0)
+
+    def _merge(self, q_raw, replies, shard_stats, t0) -> Dict[str, Any]:
+        ok = [r for r in replies if r is not None]
+        partial = len(ok) < len(replies)
+        # exact "only" rejimi qlobal olmalıdır: bir shard-da exact varsa, qalanların fuzzy hit-ləri atılır
+        exact = [r for r in ok if r.get("stats", {}).get("fast_path") == "exact"]
+        if exact and config.EXACT_MODE == "only":
+            ok = exact
+        rows = [h for r in ok for h in r["hits"]]
+        if self.top:
+            rows = sorted(rows, key=lambda h: -h[1])[: self.top]  # sort sabitdir – bərabər skorlarda master sırası
+
+        hits = [(t, sc, math.nan if pr is None else pr, u) for t, sc, pr, u, _ in rows]
+        ids = [rid for *_, rid in rows]
+        priced_idx = [i for i, (_, sc, pr, _) in enumerate(hits) if sc >= config.PRICE_AVG_MIN_SCORE and pr == pr]
+        priced = [hits[i] for i in priced_idx]
+        versions = sorted({r.get("vocab_version") for r in ok if r.get("vocab_version")})
+        first = ok[0] if ok else {}
+        stats = {
+            "vocab_version": versions[0] if len(versions) == 1 else versions,
+            "block": "sharded",
+            "candidates": sum(s.get("candidates", 0) for s in shard_stats),
+            "shards": shard_stats,
+            "partial": partial,
+            "ms": round((time.perf_counter() - t0) * 1000, 2),
+        }
+        if exact:
+            stats["fast_path"] = "exact"
+        metrics.QUERY_SECONDS.observe(time.perf_counter() - t0, path="sharded")
+        return {
+            "raw": getattr(q_raw, "raw", q_raw),
+            "canonical": first.get("canonical", ""),
+            "unit": first.get("unit", "?"),
+            "hits": hits, "hit_ids": ids,
+            "priced_hits": priced, "priced_ids": [ids[i] for i in priced_idx],
+            "prices": [pr for _, _, pr, _ in priced],
+            "vocab_version": stats["vocab_version"],
+            "stats": stats,
+        }
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for s in self.shards:
+            s.close()
+
+def local(master_df: pd.DataFrame, n: int, **kw) -> Coordinator:
+    """Prosesdaxili n shard (LocalShard) üzərində coordinator."""
+    return Coordinator([LocalShard(p, f"shard{i}") for i, p in enumerate(partition(master_df, n))], **kw)
+
+def remote(addresses: Sequence[str], **kw) -> Coordinator:
+    """"host:port" siyahısından coordinator."""
+    shards = []
+    for a in addresses:
+        host, _, port = a.strip().rpartition(":")
+        shards.append(RemoteShard(host or "127.0.0.1", int(port)))
+    return Coordinator(shards, **kw)
+
+# ---------------------------------------------------------
+# CLI:  python -m azcon_match.sharding serve --master data/master_db.xlsx --shards 4 --index 0 --port 7701
+# ---------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="AzCon master shard server")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("serve")
+    s.add_argument("--master", default=None)
+    s.add_argument("--shards", type=int, default=1)
+    s.add_argument("--index", type=int, default=0)
+    s.add_argument("--host", default="127.0.0.1")
+    s.add_argument("--port", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    import contextlib
+    from .data_loader import load_master
+
+    with contextlib.redirect_stdout(sys.stderr):  # stdout yalnız READY sətri üçündür
+        df = load_master(args.master)
+    part = partition(df, args.shards, deep=True)[args.index]
+    del df
+    srv = ShardServer(part, args.host, args.port, name=f"shard{args.index}")
+    print(f"READY {srv.port}", flush=True)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+
+if __name__ == "__main__":
+    main()
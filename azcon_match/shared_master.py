@@ -0,0 +1,271 @@
+# azcon_match/shared_master.py
+# Preprocessed master → one memory-mapped Arrow IPC file shared by all workers.
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import config, index as master_index, metrics, tokens as tokens_mod, vocab as vocab_mod
+
+try:  # POSIX only; on Windows (single dev process) we skip the lock
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_META_KEY = b"azcon_master"
+
+# data_loader.load_master sütunları → Arrow sütunları
+_COLUMNS = {
+    config.MASTER_TEXT_COL: "text",
+    config.MASTER_FLAG_COL: "flag",
+    config.PRICE_COL: "price",
+    config.UNIT_COL: "unit",
+    "canon": "canon",
+    "material": "material",
+}
+
+# ---------------------------------------------------------
+# Yazmaq (bir dəfə, master prosesdə və ya ilk worker-də)
+# ---------------------------------------------------------
+def publish(master_df: pd.DataFrame, path: str | Path, meta: Optional[Dict[str, Any]] = None) -> Path:
+    """
+    Preprocessed master-i Arrow IPC faylına yazır (tmp + os.replace → atomik).
+    tokens sütunu list<dictionary<int32, string>> kimi saxlanılır (tokens.encode – hər token
+    faylda bir dəfə); sətir id-ləri (df.index) row_id-dir.
+    """
+    import pyarrow as pa
+
+    path = Path(path)
+    arrays, names = [pa.array(master_df.index.to_numpy(dtype="int64"))], ["row_id"]
+    for src, dst in _COLUMNS.items():
+        col = master_df[src]
+        if dst == "price":
+            arrays.append(pa.array(pd.to_numeric(col, errors="coerce").to_numpy(dtype="float64"), from_pandas=True))
+        else:
+            arrays.append(pa.array([None if pd.isna(x) else str(x) for x in col], type=pa.string()))
+        names.append(dst)
+    arrays.append(tokens_mod.encode(tokens_mod.decode(master_df["tokens"])))
+    names.append("tokens")
+
+    info = {
+        "vocab_version": master_df.attrs.get("vocab_version"),
+        "rows": len(master_df),
+        "created": time.time(),
+        **(meta or {}),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # index əvvəl yazılır: master faylı görünəndə onun index-i artıq yerindədir
+    publish_index(master_index.get(master_df), index_path(path), stamp=info["created"])
+    table = pa.Table.from_arrays(arrays, names=names).replace_schema_metadata(
+        {_META_KEY: json.dumps(info).encode("utf-8")}
+    )
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+    logger.info("shared master yazıldı: %s (%d sətir)", path, len(master_df))
+    return path
+
+def index_path(path: str | Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".index")
+
+# Index açarları: "<blok>\x1f<açar>" – bir sıralanmış string sütunu (utf-8 bayt sırası),
+# attach-da lüğət qurulmur, açar mmap üzərində binary search ilə tapılır.
+# Blok açarları JSON-dur (numeric: [dəyər, vahid]); exact: canon\x1fflag\x1funit –
+# bir canon-un bütün (flag, unit) cütləri prefiks aralığıdır.
+_SEP = "\x1f"
+
+def _entry_key(block: str, key) -> str:
+    if block == "exact":
+        return _SEP.join(("exact", *key))
+    return block + _SEP + json.dumps(key, ensure_ascii=False)
+
+def publish_index(idx: "master_index.MasterIndex", path: str | Path, stamp: float) -> Path:
+    """
+    MasterIndex-i Arrow faylına yazır: sətir = (açar, mövqelər list<int32>), açara görə sıralanmış.
+    Worker-lər SharedIndex ilə birbaşa mmap-dən oxuyur – index-i yenidən qurmur,
+    nə açar lüğəti, nə də mövqe massivləri prosesə kopyalanır.
+    """
+    import pyarrow as pa
+
+    path = Path(path)
+    entries = sorted(((_entry_key(b, k), pos) for b, k, pos in idx.entries()), key=lambda e: e[0])
+    offsets = np.zeros(len(entries) + 1, dtype=np.int32)
+    np.cumsum([len(pos) for _, pos in entries], out=offsets[1:])
+    values = (np.concatenate([pos for _, pos in entries]).astype(np.int32)
+              if entries else np.empty(0, dtype=np.int32))
+    info = {"n_rows": idx.n_rows, "vocab_version": idx.vocab_version, "generic": sorted(idx.generic), "stamp": stamp}
+    table = pa.Table.from_arrays(
+        [pa.array([k for k, _ in entries], type=pa.string()),
+         pa.ListArray.from_arrays(pa.array(offsets), pa.array(values))],
+        names=["key", "positions"],
+    ).replace_schema_metadata({_META_KEY: json.dumps(info, ensure_ascii=False).encode("utf-8")})
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)  # bir batch – attach-da hər sütun tək buffer-dir
+    os.replace(tmp, path)
+    return path
+
+class SharedIndex:
+    """
+    MasterIndex-in oxuma interfeysi (block / postings / exact_items / no_num) mmap
+    olunmuş sidecar üzərində. Prosesə məxsus yalnız bir neçə numpy view-dur.
+    """
+
+    def __init__(self, table, info: Dict[str, Any]):
+        self.n_rows = info["n_rows"]
+        self.vocab_version = info.get("vocab_version")
+        self.generic = frozenset(info.get("generic") or ())
+        self._table = table  # buffer-lər mmap-ə istinad edir – fayl açıq qalır
+        col = table.column("positions").chunk(0)
+        self._offsets = col.offsets.to_numpy()
+        self._values = col.values.to_numpy(zero_copy_only=True)
+        self._keys = tokens_mod.Utf8Keys(table.column("key").chunk(0))
+        self.no_num = self._at(self._keys.find(_entry_key("no_num", None).encode("utf-8")))
+
+    def _at(self, i: Optional[int]) -> np.ndarray:
+        if i is None:
+            return master_index._EMPTY
+        return self._values[self._offsets[i]:self._offsets[i + 1]]
+
+    def block(self, key: str, value: Any) -> np.ndarray:
+        return self._at(self._keys.find(_entry_key(key, value).encode("utf-8")))
+
+    postings = master_index.MasterIndex.postings
+
+    def exact_items(self, canon: str):
+        prefix = _SEP.join(("exact", canon, "")).encode("utf-8")
+        for i in self._keys.prefix(prefix):
+            flag, unit = self._keys[i][len(prefix):].decode("utf-8").split(_SEP)
+            yield (flag, unit), self._at(i)
+
+    def entries(self):
+        for i in range(len(self._keys)):
+            block, key = self._keys[i].decode("utf-8").split(_SEP, 1)
+            if block == "exact":
+                key = tuple(key.split(_SEP))
+            else:
+                key = json.loads(key)
+                key = tuple(key) if isinstance(key, list) else key  # numeric: (dəyər, vahid)
+            yield block, key, self._at(i)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._table.nbytes)
+
+def attach_index(path: str | Path, stamp: float) -> Optional[SharedIndex]:
+    """Sidecar index (mmap, kopyasız); yoxdursa, köhnə formatdadırsa və ya başqa publish-ə aiddirsə None."""
+    import pyarrow as pa
+
+    path = Path(path)
+    if not path.exists():
+        return None
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    info = json.loads((table.schema.metadata or {}).get(_META_KEY, b"{}"))
+    if info.get("stamp") != stamp or table.schema.names != ["key", "positions"] or table.num_rows == 0:
+        return None
+    return SharedIndex(table, info)
+
+def read_meta(path: str | Path) -> Dict[str, Any]:
+    import pyarrow as pa
+
+    with pa.memory_map(str(path), "r") as src:
+        md = pa.ipc.open_file(src).schema.metadata or {}
+    return json.loads(md.get(_META_KEY, b"{}"))
+
+# ---------------------------------------------------------
+# Qoşulmaq (hər worker, read-only, zero-copy)
+# ---------------------------------------------------------
+def attach(path: str | Path) -> pd.DataFrame:
+    """
+    Faylı mmap edib Arrow-backed DataFrame qaytarır. Bütün sütunlar (tokens daxil –
+    lüğət + int32 id-lər) və sidecar index (açarlar + mövqelər) OS page cache-də
+    paylaşılır, kopyalanmır; matcher tokenləri id formasında müqayisə edir (tokens.py).
+    Sidecar yoxdursa və ya uyğun deyilsə index bu prosesdə qurulur (prosesə məxsus).
+    """
+    import pyarrow as pa
+
+    t0 = time.perf_counter()
+    src = pa.memory_map(str(path), "r")
+    reader = pa.ipc.open_file(src)
+    table = reader.read_all()
+    info = json.loads((table.schema.metadata or {}).get(_META_KEY, b"{}"))
+
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    df = df.set_index("row_id")
+    df.index.name = None
+    df = df.rename(columns={dst: src_col for src_col, dst in _COLUMNS.items()})
+    df.attrs["vocab_version"] = info.get("vocab_version")
+    df.attrs["shared_path"] = str(path)
+    df.attrs["source"] = {k: info.get(k) for k in ("source", "source_mtime", "source_size")}
+    idx = attach_index(index_path(path), info.get("created"))
+    if idx is not None and idx.n_rows == len(df):
+        master_index.register(df, idx)
+    else:  # köhnə format / sidecar yoxdur – lokal qur
+        master_index.attach(df)
+    metrics.MASTER_LOAD_SECONDS.observe(time.perf_counter() - t0, source="shared")
+    metrics.MASTER_ROWS.set(len(df))
+    return df
+
+# ---------------------------------------------------------
+# Deployment helper
+# ---------------------------------------------------------
+@contextmanager
+def _file_lock(path: Path):
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+def _source_meta(source: Path) -> Dict[str, Any]:
+    st = os.stat(source)
+    return {"source": str(source), "source_mtime": st.st_mtime, "source_size": st.st_size}
+
+def is_fresh(path: str | Path, source: str | Path) -> bool:
+    path = Path(path)
+    if not path.exists():
+        return False
+    try:
+        meta = read_meta(path)
+    except Exception:
+        return False
+    want = _source_meta(Path(source))
+    return (
+        all(meta.get(k) == v for k, v in want.items())
+        and meta.get("vocab_version") == vocab_mod.current().version
+    )
+
+def ensure_published(source: str | Path, path: str | Path) -> Path:
+    """
+    Master Excel-dən shared faylı yalnız lazım olduqda (yoxdur, mənbə və ya vocab
+    dəyişib) qurur. Bir neçə worker eyni anda çağırsa, lock sayəsində yalnız biri
+    preprocess edir, qalanları hazır faylı görür.
+    """
+    source, path = Path(source), Path(path)
+    if is_fresh(path, source):
+        return path
+    with _file_lock(path):
+        if is_fresh(path, source):
+            return path
+        from . import data_loader
+        df = data_loader.load_master(path=str(source))
+        return publish(df, path, meta=_source_meta(source))
@@ -0,0 +1,121 @@
+# azcon_match/tokens.py
+# Master sətirlərinin token dəstləri iki formada olur:
+#   * prosesdaxili master (data_loader.load_master) – hər sətirdə set[str];
+#   * shared master (shared_master.attach) – Arrow list<dictionary<int32, string>>:
+#     tokenlər mmap faylında bir dəfə (sıralanmış lüğət), sətirlərdə yalnız int32 id-lər.
+# Matcher sorğu tokenlərini space(col).ids(...) ilə sütunun formasına çevirir və
+# set əməliyyatlarını həmin formada aparır – shared master-də worker-ə məxsus
+# token obyektləri yaranmır (yalnız skan olunan namizəd sətirləri üçün, müvəqqəti).
+from __future__ import annotations
+
+import bisect
+from typing import FrozenSet, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+def is_encoded(col: pd.Series) -> bool:
+    return isinstance(col.dtype, pd.ArrowDtype)
+
+class Utf8Keys:
+    """Sıralanmış Arrow string massivi üzərində kopyasız, bisect-ə yararlı ardıcıllıq (bytes)."""
+
+    def __init__(self, arr):
+        n = len(arr)
+        bufs = arr.buffers()
+        self._offsets = np.frombuffer(bufs[1], dtype=np.int32, count=n + 1, offset=arr.offset * 4)
+        self._data = memoryview(bufs[2]) if bufs[2] is not None else memoryview(b"")
+        self._n = n
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int) -> bytes:
+        return bytes(self._data[self._offsets[i]:self._offsets[i + 1]])
+
+    def find(self, key: bytes) -> Optional[int]:
+        i = bisect.bisect_left(self, key)
+        return i if i < self._n and self[i] == key else None
+
+    def prefix(self, prefix: bytes) -> range:
+        lo = bisect.bisect_left(self, prefix)
+        hi = lo
+        while hi < self._n and self[hi].startswith(prefix):
+            hi += 1
+        return range(lo, hi)
+
+class PlainSpace:
+    """set[str] sütunu: id = tokenin özü."""
+
+    def ids(self, tokens: Iterable[str]) -> FrozenSet[str]:
+        return tokens if isinstance(tokens, frozenset) else frozenset(tokens)
+
+    def rows(self, col: pd.Series) -> Iterator[set]:
+        return iter(col)
+
+class SharedSpace:
+    """list<dictionary<int32, string>> sütunu: sorğu tokenləri lüğətdə binary search ilə id-yə çevrilir."""
+
+    def __init__(self, dictionary):
+        self._dictionary = dictionary
+        self._keys = Utf8Keys(dictionary)
+
+    def ids(self, tokens: Iterable[str]) -> FrozenSet[int]:
+        """Master-də olmayan tokenlər atılır – onlar heç bir sətirdə yoxdur."""
+        out = []
+        for t in tokens:
+            i = self._keys.find(t.encode("utf-8"))
+            if i is not None:
+                out.append(i)
+        return frozenset(out)
+
+    def rows(self, col: pd.Series) -> Iterator[set]:
+        for chunk in _chunks(col):
+            offsets = chunk.offsets.to_numpy()
+            values = chunk.values.indices.to_numpy(zero_copy_only=False)
+            for i in range(len(chunk)):
+                yield set(values[offsets[i]:offsets[i + 1]].tolist())
+
+def _chunks(col: pd.Series) -> List:
+    return list(col.array.__arrow_array__().chunks)
+
+def _buffer_id(dictionary) -> tuple:
+    data = dictionary.buffers()[2]
+    return (data.address if data is not None else 0, len(dictionary), dictionary.offset)
+
+def space(col: pd.Series):
+    """Sütunun token forması; bir neçə fərqli lüğət (məs. concat) olarsa – decode olunmuş set[str]."""
+    if not is_encoded(col):
+        return PlainSpace()
+    dicts = {_buffer_id(c.values.dictionary): c.values.dictionary for c in _chunks(col) if len(c)}
+    if len(dicts) <= 1:
+        if not dicts:
+            return PlainSpace()
+        return SharedSpace(next(iter(dicts.values())))
+    return _DecodedSpace()
+
+class _DecodedSpace(PlainSpace):
+    def rows(self, col: pd.Series) -> Iterator[set]:
+        return iter(decode(col))
+
+def decode(col: pd.Series) -> pd.Series:
+    """Hər sətir üçün frozenset[str] (prosesə məxsus obyekt sütunu; yalnız yenidən hesablama üçün)."""
+    if not is_encoded(col):
+        return col.astype(object)
+    return pd.Series([frozenset(t or ()) for t in col], index=col.index, dtype=object, name=col.name)
+
+def encode(token_sets: Iterable[Iterable[str]]):
+    """
+    Arrow list<dictionary<int32, string>>: lüğət sıralanmış unikal tokenlərdir
+    (utf-8 bayt sırası – SharedSpace binary search edir), sətirlərdə sıralanmış id-lər.
+    """
+    import pyarrow as pa
+
+    rows = [sorted(t) for t in token_sets]
+    vocab = sorted({t for r in rows for t in r})  # code point sırası = utf-8 bayt sırası
+    pos = {t: i for i, t in enumerate(vocab)}
+    offsets = np.zeros(len(rows) + 1, dtype=np.int32)
+    np.cumsum([len(r) for r in rows], out=offsets[1:])
+    ids = np.fromiter((pos[t] for r in rows for t in r), dtype=np.int32, count=int(offsets[-1]))
+    values = pa.DictionaryArray.from_arrays(pa.array(ids, type=pa.int32()), pa.array(vocab, type=pa.string()))
+    return pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), values)
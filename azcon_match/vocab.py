@@ -0,0 +1,204 @@
+# azcon_match/vocab.py
+# Hot-reloadable vocabulary: vocab.json → immutable CompiledVocab snapshots.
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+VOCAB_PATH = Path(__file__).with_name("vocab.json")
+
+# ---------------------------------------------------------
+# Compiled (immutable) vocabulary
+# ---------------------------------------------------------
+@dataclass(frozen=True)
+class CompiledVocab:
+    version: str
+    syn: Mapping[str, str]
+    generic: FrozenSet[str]
+    critical: FrozenSet[str]
+    phrase_syn: Tuple[Tuple[str, str], ...]
+    loaded_at: float = field(default_factory=time.time, compare=False)
+
+def _version_of(data: Dict[str, Any]) -> str:
+    blob = json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()[:12]
+
+def compile_vocab(data: Dict[str, Any]) -> CompiledVocab:
+    """Build lookup structures from the raw vocab.json content."""
+    from .preprocessing import TRANSLIT, _base_norm
+
+    syn = {_base_norm(k): _base_norm(v) for k, v in data.get("synonyms", {}).items()}
+    syn.update({k.translate(TRANSLIT): v.translate(TRANSLIT) for k, v in list(syn.items()) if k.translate(TRANSLIT) != k})
+    return CompiledVocab(
+        version=_version_of(data),
+        syn=MappingProxyType(syn),
+        generic=frozenset(_base_norm(t) for t in data.get("generic", [])),
+        critical=frozenset(_base_norm(t) for t in data.get("critical", [])),
+        phrase_syn=tuple((k, v) for k, v in syn.items() if " " in k),
+    )
+
+# ---------------------------------------------------------
+# Diff between two snapshots
+# ---------------------------------------------------------
+@dataclass(frozen=True)
+class VocabChange:
+    old: CompiledVocab
+    new: CompiledVocab
+    changed_syn: FrozenSet[str]      # synonym keys added/removed/remapped
+    changed_phrases: FrozenSet[str]  # subset of changed_syn containing spaces
+
+    @property
+    def affects_canon(self) -> bool:
+        """canon() only depends on synonyms; generic/critical only affect filtering."""
+        return bool(self.changed_syn)
+
+    def probe_tokens(self) -> FrozenSet[str]:
+        """
+        Tokens (in the *old* canon space) that a master row must contain for its
+        canon to possibly change. Superset: rows outside it are left untouched.
+        """
+        from .preprocessing import canon
+
+        out = set()
+        for k in self.changed_syn - self.changed_phrases:
+            out.add(k)
+            if k in self.old.syn:
+                out.add(self.old.syn[k])
+        for p in self.changed_phrases:
+            out.update(canon(p, vocab=self.old).split())
+            if p in self.old.syn:
+                out.update(canon(self.old.syn[p], vocab=self.old).split())
+        return frozenset(out)
+
+def diff(old: CompiledVocab, new: CompiledVocab) -> VocabChange:
+    keys = set(old.syn) | set(new.syn)
+    changed = frozenset(k for k in keys if old.syn.get(k) != new.syn.get(k))
+    return VocabChange(old, new, changed, frozenset(k for k in changed if " " in k))
+
+# ---------------------------------------------------------
+# Manager – holds the current snapshot and swaps it atomically
+# ---------------------------------------------------------
+class VocabManager:
+    """
+    current() həmişə tam qurulmuş CompiledVocab qaytarır; reload() yenisini
+    kənarda qurur və tək referens mənimsətməsi ilə dəyişir (atomic swap).
+    watch(interval) aktiv olduqda current() vocab.json-un mtime-ını yoxlayır.
+    """
+
+    _HISTORY = 8  # keep a few old snapshots so stale masters can be diffed
+
+    def __init__(self, path: str | Path = VOCAB_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._current: Optional[CompiledVocab] = None
+        self._history: Dict[str, CompiledVocab] = {}
+        self._listeners: List[Callable[[VocabChange], None]] = []
+        self._mtime: float = 0.0
+        self._watch_interval: Optional[float] = None
+        self._next_check = 0.0
+
+    # -- read side ---------------------------------------------------------
+    def current(self) -> CompiledVocab:
+        cur = self._current
+        if cur is None:
+            return self._load_initial()
+        if self._watch_interval is not None:
+            now = time.monotonic()
+            if now >= self._next_check:
+                self._next_check = now + self._watch_interval
+                self._poll()
+        return self._current
+
+    def get(self, version: str) -> Optional[CompiledVocab]:
+        return self._history.get(version)
+
+    # -- write side --------------------------------------------------------
+    def reload(self, data: Optional[Dict[str, Any]] = None) -> Optional[VocabChange]:
+        """
+        Re-read vocab.json (or use `data`), compile and swap. Returns the change,
+        or None if the content did not change.
+        """
+        with self._lock:
+            if data is None:
+                data, self._mtime = self._read()
+            new = compile_vocab(data)
+            old = self._current
+            if old is not None and old.version == new.version:
+                return None
+            self._remember(new)
+            self._current = new
+        if old is None:
+            return None
+        change = diff(old, new)
+        logger.info("vocab %s → %s (%d synonym keys changed)", old.version, new.version, len(change.changed_syn))
+        for fn in list(self._listeners):
+            try:
+                fn(change)
+            except Exception as e:
+                logger.error("vocab listener xətası: %s", e, exc_info=True)
+        return change
+
+    def watch(self, interval: Optional[float] = 2.0) -> None:
+        """Poll vocab.json every `interval` seconds from current(); None disables."""
+        self._watch_interval = interval
+        self._next_check = 0.0
+
+    def subscribe(self, fn: Callable[[VocabChange], None]) -> None:
+        self._listeners.append(fn)
+
+    def unsubscribe(self, fn: Callable[[VocabChange], None]) -> None:
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    # -- internals ---------------------------------------------------------
+    def _read(self) -> Tuple[Dict[str, Any], float]:
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f), mtime
+
+    def _load_initial(self) -> CompiledVocab:
+        with self._lock:
+            if self._current is None:
+                data, self._mtime = self._read()
+                cur = compile_vocab(data)
+                self._remember(cur)
+                self._current = cur
+            return self._current
+
+    def _poll(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            try:
+                self.reload()
+            except (OSError, ValueError) as e:
+                # yarımçıq yazılmış fayl – köhnə snapshot qalır, növbəti poll-da yenə cəhd
+                logger.warning("vocab.json yenidən yüklənmədi: %s", e)
+
+    def _remember(self, v: CompiledVocab) -> None:
+        self._history[v.version] = v
+        while len(self._history) > self._HISTORY:
+            self._history.pop(next(iter(self._history)))
+
+manager = VocabManager()
+
+def current() -> CompiledVocab:
+    return manager.current()
+
+def reload(data: Optional[Dict[str, Any]] = None) -> Optional[VocabChange]:
+    return manager.reload(data)
+
+if os.environ.get("AZCON_VOCAB_WATCH"):
+    manager.watch(float(os.environ["AZCON_VOCAB_WATCH"]))
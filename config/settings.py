@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -76,7 +77,7 @@ WSGI_APPLICATION = 'config.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('AZCON_DB_PATH') or BASE_DIR / 'db.sqlite3',
     }
 }
 
@@ -129,11 +130,59 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_ROOT = Path(os.environ.get('AZCON_MEDIA_ROOT') or BASE_DIR / 'media')
 # settings.py
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# confirm/ kimi icazə tələb edən view-lar üçün giriş – admin login səhifəsi
+LOGIN_URL = "admin:login"
+
 DATA_DIR = BASE_DIR / "data"
 MASTER_XLSX_PATH = DATA_DIR / "master_db.xlsx"   # <-- səndə olan fayl
+
+# Multi-worker deploy: preprocessed master bir dəfə bu Arrow faylına yazılır,
+# bütün worker-lər onu read-only mmap edir (boşdursa – hər worker öz kopyası).
+AZCON_SHARED_MASTER = os.environ.get("AZCON_SHARED_MASTER") or None
+
+# /metrics çox prosesli deploy-da: hər worker öz metriklərini bu qovluğa yazır,
+# scrape-i cavablayan worker hamısını toplayır. Boşdursa – yalnız cavab verən prosesin
+# metrikləri. Deploy (restart) başlayanda qovluğu təmizləyin.
+AZCON_METRICS_DIR = os.environ.get("AZCON_METRICS_DIR") or None
+AZCON_METRICS_INTERVAL = float(os.environ.get("AZCON_METRICS_INTERVAL", 5.0))
+
+# Async (ASGI) view-lar: prosesdə eyni anda ən çox neçə ağır upload işləsin,
+# neçəsi növbədə gözləsin (artığı 503 alır); tək sorğular ayrıca lane-dədir.
+AZCON_MAX_HEAVY_JOBS = int(os.environ.get("AZCON_MAX_HEAVY_JOBS", 2))
+AZCON_HEAVY_QUEUE    = int(os.environ.get("AZCON_HEAVY_QUEUE", 4))
+AZCON_LIGHT_WORKERS  = int(os.environ.get("AZCON_LIGHT_WORKERS", 4))
+AZCON_LIGHT_QUEUE    = int(os.environ.get("AZCON_LIGHT_QUEUE", 64))
+
+# Adlı master kataloqları (region / il): data/catalogs/<ad>.xlsx avtomatik tapılır,
+# əlavə olaraq AZCON_CATALOGS="baki2024=/yol/a.xlsx,gence2025=/yol/b.xlsx".
+# Sorğu ?catalog=<ad> ilə seçir; boşdursa default master (data/master_db.xlsx).
+AZCON_CATALOG_DIRS = [DATA_DIR / "catalogs"]
+AZCON_CATALOGS = dict(
+    item.split("=", 1) for item in os.environ.get("AZCON_CATALOGS", "").split(",") if "=" in item
+)
+AZCON_CATALOG_MEMORY_MB = int(os.environ.get("AZCON_CATALOG_MEMORY_MB", 2048))
+# Verilibsə kataloqlar Arrow snapshot kimi bu qovluğa yazılıb mmap olunur (worker-lər paylaşır).
+AZCON_CATALOG_SNAPSHOT_DIR = os.environ.get("AZCON_CATALOG_SNAPSHOT_DIR") or None
+
+# Sharded rejim: default master N shard server-ə bölünür
+# (python -m azcon_match.sharding serve --shards N --index i --port P),
+# AZCON_SHARDS="127.0.0.1:7701,127.0.0.1:7702". Boşdursa – tək prosesli matç.
+AZCON_SHARDS = [a for a in os.environ.get("AZCON_SHARDS", "").split(",") if a.strip()]
+AZCON_SHARD_TIMEOUT = float(os.environ.get("AZCON_SHARD_TIMEOUT", 5.0))
+AZCON_SHARD_TOP = int(os.environ["AZCON_SHARD_TOP"]) if os.environ.get("AZCON_SHARD_TOP") else None
+
+# Upload-lar və nəticələr MEDIA_ROOT/uploads|outputs-da məzmun hash-i ilə saxlanılır;
+# eyni fayl eyni master/vocab ilə yenidən yüklənəndə hazır nəticə verilir.
+# Cəm ölçü / yaş limiti aşılanda ən köhnə istifadə olunan fayllar silinir.
+AZCON_UPLOAD_CACHE_MB   = int(os.environ.get("AZCON_UPLOAD_CACHE_MB", 1024))
+AZCON_UPLOAD_CACHE_DAYS = float(os.environ.get("AZCON_UPLOAD_CACHE_DAYS", 7))
+
+# Təsdiqlənmiş matçlar kataloq üzrə prosesə oxunur (hər upload-da yenidən); tək sorğularda
+# başqa worker-in yeni təsdiqi ən gec bu qədər saniyədən sonra görünür.
+AZCON_CONFIRMED_REFRESH = float(os.environ.get("AZCON_CONFIRMED_REFRESH", 30))
@@ -16,9 +16,14 @@ Including another URLconf
 """
 from django.conf import settings
 from django.conf.urls.static import static
+from django.contrib import admin
 from django.urls import path, include
 
+from analyzer.views import metrics_view
+
 urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('analyzer.urls')),
 ]
 
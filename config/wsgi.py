@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# AZCON_SHARED_MASTER: publish the preprocessed master before workers fork
+# (gunicorn --preload); workers then only mmap the shared file.
+from analyzer.masters import preload_shared_master  # noqa: E402
+
+preload_shared_master()